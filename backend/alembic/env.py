@@ -17,8 +17,10 @@ except Exception:
     pass
 
 from sqlmodel import SQLModel
-from app.models.epigram import Epigram
-from app.models.user import User, UserSettings  # noqa
+from app.models.epigram import Epigram, EpigramImpressions, EpigramTombstone  # noqa
+from app.models.user import RefreshToken, User, UserSettings  # noqa
+from app.database_url import database_url_from_env
+from app.online_migrations import MIGRATION_LOCK_TIMEOUT_MS, MIGRATIONS_ONLINE
 
 # Alembic configuration
 config = context.config
@@ -27,40 +29,11 @@ if config.config_file_name is not None:
 
 target_metadata = SQLModel.metadata
 
-# Import utility for resolving environment variables
-try:
-    from env_utils import resolve_env_vars
-except ImportError:
-    # Define inline if import fails
-    def resolve_env_vars(template_string):
-        """Resolve ${VAR} placeholders in string with environment variables"""
-        if not template_string:
-            return template_string
-
-        import re
-
-        pattern = r"\${([^}]+)}"
-
-        def replace_var(match):
-            var_name = match.group(1)
-            return os.getenv(var_name, "")
-
-        return re.sub(pattern, replace_var, template_string)
-
-
-# Read database URL and resolve any variables
-raw_url = os.getenv("DATABASE_URL")
-if not raw_url:
+# Read database URL, stripping a repeated prefix and resolving ${VAR} placeholders
+DATABASE_URL = database_url_from_env()
+if not DATABASE_URL:
     raise RuntimeError("DATABASE_URL is not set")
 
-# Fix common issues with DATABASE_URL
-if raw_url.startswith("DATABASE_URL="):
-    # Remove duplicate prefix if present
-    raw_url = raw_url.replace("DATABASE_URL=", "", 1)
-
-# Resolve any ${VAR} placeholders
-DATABASE_URL = resolve_env_vars(raw_url)
-
 
 def run_migrations_offline() -> None:
     """Run migrations in 'offline' mode."""
@@ -70,6 +43,7 @@ def run_migrations_offline() -> None:
         literal_binds=True,
         compare_type=True,
         compare_server_default=True,
+        transaction_per_migration=MIGRATIONS_ONLINE,
     )
     with context.begin_transaction():
         context.run_migrations()
@@ -92,12 +66,19 @@ def run_migrations_online() -> None:
             directives[:] = []
 
     with connectable.connect() as connection:
+        if MIGRATIONS_ONLINE and connection.dialect.name == "postgresql":
+            # Fail fast rather than queue traffic behind a lock we are waiting for
+            connection.exec_driver_sql(f"SET lock_timeout = {MIGRATION_LOCK_TIMEOUT_MS}")
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=target_metadata,
             compare_type=True,
             compare_server_default=True,
             process_revision_directives=process_revision_directives,
+            # Lets each revision commit on its own, so a failure keeps earlier ones
+            transaction_per_migration=MIGRATIONS_ONLINE,
         )
         with context.begin_transaction():
             context.run_migrations()
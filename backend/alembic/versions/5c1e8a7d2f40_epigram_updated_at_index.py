@@ -0,0 +1,29 @@
+"""epigram updated_at index
+
+Revision ID: 5c1e8a7d2f40
+Revises: 0a291bfb2345
+Create Date: 2026-10-19 09:12:04.118273
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+from app.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5c1e8a7d2f40"
+down_revision: Union[str, Sequence[str], None] = "0a291bfb2345"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """Range scans on updated_at for the corpus store's watermark refresh"""
+    create_index_concurrently("idx_epigrams_updated_at", "epigrams", "updated_at")
+
+
+def downgrade():
+    drop_index_concurrently("idx_epigrams_updated_at")
@@ -0,0 +1,53 @@
+"""epigram tombstones and sync index
+
+Revision ID: 8d4f2b6a9e13
+Revises: 5c1e8a7d2f40
+Create Date: 2026-10-19 10:02:51.604117
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.online_migrations import create_index_concurrently, drop_index_concurrently
+
+
+# revision identifiers, used by Alembic.
+revision: str = "8d4f2b6a9e13"
+down_revision: Union[str, Sequence[str], None] = "5c1e8a7d2f40"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """Tombstones for deleted epigrams, keyset index for GET /api/epigrams/mine/changes"""
+    op.create_table(
+        "epigram_tombstones",
+        sa.Column("epigram_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column(
+            "deleted_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+            comment="Deletion timestamp",
+        ),
+        sa.PrimaryKeyConstraint("epigram_id"),
+    )
+    op.create_index(
+        "idx_epigram_tombstones_user_deleted",
+        "epigram_tombstones",
+        ["user_id", "deleted_at"],
+    )
+    op.create_index("idx_epigram_tombstones_deleted", "epigram_tombstones", ["deleted_at"])
+
+    create_index_concurrently("idx_epigrams_user_updated", "epigrams", "user_id, updated_at, id")
+
+
+def downgrade():
+    drop_index_concurrently("idx_epigrams_user_updated")
+    op.drop_index("idx_epigram_tombstones_deleted", table_name="epigram_tombstones")
+    op.drop_index("idx_epigram_tombstones_user_deleted", table_name="epigram_tombstones")
+    op.drop_table("epigram_tombstones")
@@ -0,0 +1,48 @@
+"""epigram impressions
+
+Revision ID: b7e3d19c4a52
+Revises: 8d4f2b6a9e13
+Create Date: 2026-10-19 11:24:37.902215
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b7e3d19c4a52"
+down_revision: Union[str, Sequence[str], None] = "8d4f2b6a9e13"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """Write-behind impression counters, top-N index for GET /api/epigrams/top"""
+    op.create_table(
+        "epigram_impressions",
+        sa.Column("epigram_id", sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column("impressions", sa.BigInteger(), server_default="0", nullable=False),
+        sa.Column(
+            "last_shown_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+            comment="Time of the flush that last counted an impression",
+        ),
+        sa.PrimaryKeyConstraint("epigram_id"),
+    )
+
+    op.execute(
+        """
+    CREATE INDEX IF NOT EXISTS idx_epigram_impressions_top
+    ON epigram_impressions (impressions DESC, epigram_id);
+    """
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_epigram_impressions_top;")
+    op.drop_table("epigram_impressions")
@@ -0,0 +1,51 @@
+"""refresh tokens
+
+Revision ID: c4f8a1d93e26
+Revises: e2a9c4f71b08
+Create Date: 2026-10-19 16:02:11.418305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c4f8a1d93e26"
+down_revision: Union[str, Sequence[str], None] = "e2a9c4f71b08"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade():
+    """Rotating refresh tokens, looked up by hash on POST /api/auth/refresh"""
+    op.create_table(
+        "refresh_tokens",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("family_id", sa.String(length=32), nullable=False),
+        sa.Column("token_hash", sa.String(length=64), nullable=False),
+        sa.Column(
+            "created_at",
+            sa.DateTime(timezone=True),
+            server_default=sa.text("now()"),
+            nullable=False,
+        ),
+        sa.Column("expires_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("rotated_at", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("revoked_at", sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("uq_refresh_tokens_token_hash", "refresh_tokens", ["token_hash"], unique=True)
+    op.create_index("idx_refresh_tokens_family", "refresh_tokens", ["family_id"])
+    op.create_index("idx_refresh_tokens_user", "refresh_tokens", ["user_id"])
+
+
+def downgrade():
+    op.drop_index("idx_refresh_tokens_user", table_name="refresh_tokens")
+    op.drop_index("idx_refresh_tokens_family", table_name="refresh_tokens")
+    op.drop_index("uq_refresh_tokens_token_hash", table_name="refresh_tokens")
+    op.drop_table("refresh_tokens")
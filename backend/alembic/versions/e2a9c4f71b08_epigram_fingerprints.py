@@ -0,0 +1,116 @@
+"""epigram fingerprints
+
+Revision ID: e2a9c4f71b08
+Revises: b7e3d19c4a52
+Create Date: 2026-10-19 12:41:09.377520
+
+"""
+
+import hashlib
+import unicodedata
+from typing import Optional, Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.online_migrations import create_index_concurrently, drop_index_concurrently, key_ranges
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e2a9c4f71b08"
+down_revision: Union[str, Sequence[str], None] = "b7e3d19c4a52"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+epigrams = sa.table(
+    "epigrams",
+    sa.column("id", sa.Integer),
+    sa.column("text", sa.String),
+    sa.column("author", sa.String),
+    sa.column("fingerprint", sa.String),
+)
+
+
+# app.fingerprint as of this revision, frozen so that later changes to the
+# normalization do not change what this revision writes
+def _normalize(value: Optional[str]) -> str:
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    characters = []
+    for character in decomposed:
+        category = unicodedata.category(character)
+        if character.isalnum():
+            characters.append(character)
+        elif category == "Pd" or category[0] == "Z" or character.isspace():
+            characters.append(" ")
+    return " ".join("".join(characters).split())
+
+
+def _fingerprint(text: str, author: Optional[str]) -> str:
+    key = f"{_normalize(text)}\x1f{_normalize(author)}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def upgrade():
+    """Fingerprint unique index and trigram index for near-duplicate checks on write"""
+    # The batched steps below commit as they go, so a rerun after a failure
+    # finds the column already there
+    if op.get_context().dialect.name == "postgresql":
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        op.execute("ALTER TABLE epigrams ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(32)")
+    else:
+        op.add_column("epigrams", sa.Column("fingerprint", sa.String(length=32), nullable=True))
+
+    # Built while the column is still empty, so the backfill can probe it
+    create_index_concurrently("uq_epigrams_fingerprint", "epigrams", "fingerprint", unique=True)
+
+    # Backfill in ID order; rows that normalize to an earlier row's fingerprint
+    # keep NULL so the unique index holds, and are reported by
+    # `python -m app.cli.near_duplicates`
+    connection = op.get_bind()
+    existing = epigrams.alias("existing")
+    taken = sa.exists().where(existing.c.fingerprint == sa.bindparam("row_fingerprint"))
+    assign = (
+        epigrams.update()
+        .where(
+            epigrams.c.id == sa.bindparam("row_id"),
+            epigrams.c.fingerprint.is_(None),
+            ~taken,
+        )
+        .values(fingerprint=sa.bindparam("row_fingerprint"))
+    )
+    for start, end in key_ranges("epigrams", label="epigrams.fingerprint backfill"):
+        rows = connection.execute(
+            sa.select(epigrams.c.id, epigrams.c.text, epigrams.c.author).where(
+                epigrams.c.id >= start, epigrams.c.id < end, epigrams.c.fingerprint.is_(None)
+            )
+        ).all()
+        # Executed row by row in ID order, so duplicates within the range
+        # see the earlier row's fingerprint
+        updates = [
+            {"row_id": row_id, "row_fingerprint": _fingerprint(text, author)}
+            for row_id, text, author in sorted(rows)
+        ]
+        if updates:
+            connection.execute(assign, updates)
+
+    if op.get_context().dialect.name == "postgresql":
+        # GiST rather than GIN: it can return nearest neighbours by trigram distance
+        create_index_concurrently(
+            "idx_epigrams_text_trgm", "epigrams", "text gist_trgm_ops", using="gist"
+        )
+    # Subsumed by the fingerprint: texts equal ignoring case normalize alike
+    drop_index_concurrently("uq_epigrams_text_author_ci")
+
+
+def downgrade():
+    create_index_concurrently(
+        "uq_epigrams_text_author_ci",
+        "epigrams",
+        "lower(text), coalesce(lower(author), '')",
+        unique=True,
+    )
+    drop_index_concurrently("idx_epigrams_text_trgm")
+    drop_index_concurrently("uq_epigrams_fingerprint")
+    op.drop_column("epigrams", "fingerprint")
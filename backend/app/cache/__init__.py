@@ -0,0 +1,6 @@
+"""
+In-process caches and the plumbing that keeps them coherent across workers.
+
+Every cache in this package subscribes to the invalidation bus so writes
+handled by any uvicorn worker are reflected in all of them.
+"""
@@ -0,0 +1,127 @@
+"""
+Sorted set of approved epigram IDs.
+
+Preloaded during startup warm-up and used to pick random epigrams by primary
+key instead of ``ORDER BY random()`` over the whole table. Invalidation events
+mark individual IDs dirty; they are re-checked in one query in the background
+while readers keep using the current set.
+"""
+
+import asyncio
+import logging
+import random
+from array import array
+from bisect import bisect_left
+from typing import Hashable, List, Optional, Set
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.cache.invalidation import EPIGRAM, invalidation_bus
+from app.cache.single_flight import SingleFlight
+from app.db import async_engine
+from app.metrics import REGISTRY
+from app.models.epigram import Epigram, EpigramStatus
+
+logger = logging.getLogger(__name__)
+
+
+class ApprovedIdSet:
+    """In-memory sorted array of approved epigram IDs."""
+
+    def __init__(self) -> None:
+        self._ids = array("q")
+        self._dirty: Set[int] = set()
+        self._full_reload = False
+        self._refresh_task: Optional[asyncio.Task] = None
+        # Warm-up, resyncs and full refreshes can overlap; they share one query
+        self._loads = SingleFlight("approved_ids_load")
+        self.loaded = False
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    @property
+    def ids(self) -> array:
+        """Current sorted IDs; empty until loaded."""
+        return self._ids
+
+    async def load(self) -> None:
+        """Load every approved ID from the database."""
+        await self._loads.do(None, self._load)
+
+    async def _load(self) -> None:
+        # Changes marked from here on may be missed by the query; they stay queued
+        self._dirty.clear()
+        self._full_reload = False
+        async with AsyncSession(async_engine) as session:
+            result = await session.execute(
+                select(Epigram.id)
+                .where(Epigram.status == EpigramStatus.APPROVED)
+                .order_by(Epigram.id)
+            )
+            self._ids = array("q", result.scalars())
+        self.loaded = True
+
+    def invalidate(self, keys: Optional[Set[Hashable]]) -> None:
+        """Mark IDs (or everything, for None) for re-checking."""
+        if not self.loaded:
+            return
+        if keys is None:
+            self._full_reload = True
+        else:
+            self._dirty.update(int(key) for key in keys)
+        self._schedule_refresh()
+
+    def sample(self, count: int, exclude_id: Optional[int] = None) -> Optional[List[int]]:
+        """Pick up to ``count`` distinct random IDs, or None if the set is not usable."""
+        if not self.loaded or not self._ids:
+            self.misses += 1
+            return None
+        self.hits += 1
+        ids = self._ids
+        picks = random.sample(range(len(ids)), min(count + 1, len(ids)))
+        chosen = [ids[i] for i in picks if ids[i] != exclude_id]
+        return chosen[:count]
+
+    def _schedule_refresh(self) -> None:
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+
+    async def _refresh(self) -> None:
+        while self._dirty or self._full_reload:
+            try:
+                if self._full_reload:
+                    await self.load()
+                    continue
+                dirty, self._dirty = self._dirty, set()
+                async with AsyncSession(async_engine) as session:
+                    result = await session.execute(
+                        select(Epigram.id).where(
+                            Epigram.id.in_(dirty), Epigram.status == EpigramStatus.APPROVED
+                        )
+                    )
+                    approved = set(result.scalars())
+                for epigram_id in dirty:
+                    self._set_member(epigram_id, epigram_id in approved)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Approved ID refresh failed; retrying with a full reload")
+                self._full_reload = True
+                await asyncio.sleep(1.0)
+
+    def _set_member(self, epigram_id: int, present: bool) -> None:
+        ids = self._ids
+        index = bisect_left(ids, epigram_id)
+        found = index < len(ids) and ids[index] == epigram_id
+        if present and not found:
+            ids.insert(index, epigram_id)
+        elif found and not present:
+            del ids[index]
+
+
+approved_ids = ApprovedIdSet()
+invalidation_bus.subscribe(EPIGRAM, approved_ids.invalidate)
+invalidation_bus.on_resync(approved_ids.load)
+REGISTRY.register_cache("approved_ids", approved_ids)
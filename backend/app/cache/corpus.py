@@ -0,0 +1,476 @@
+"""
+Compact in-memory store of approved epigrams.
+
+Holds every field ``EpigramRead`` needs for approved rows in flat arrays
+instead of per-row objects: IDs (sorted), user IDs and timestamps in
+``array`` columns, and text plus author in one contiguous UTF-8 buffer
+addressed by per-row offsets and lengths. That is 44 bytes of columns plus
+the encoded text per row; a million generated epigrams take about 110 MB
+(see ``benchmarks/corpus_memory.py``), against about 500 MB as one dict per
+row, so ``/random/batch`` can be answered without touching Postgres.
+
+The store is kept current three ways:
+
+* ``EPIGRAM`` invalidations re-check the named IDs, which also catches
+  deletions;
+* every ``CORPUS_REFRESH_SECONDS`` rows with ``updated_at`` past the
+  watermark are re-read, picking up writes that bypassed the bus;
+* a resync, or too much dead space in the buffer, triggers a full reload.
+
+Edits append the new text to the buffer and leave the old bytes as dead
+space until the next full reload compacts it.
+"""
+
+import asyncio
+import logging
+import os
+import random
+from array import array
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from typing import Any, Hashable, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.cache.invalidation import EPIGRAM, invalidation_bus
+from app.cache.single_flight import SingleFlight
+from app.db import async_engine
+from app.metrics import REGISTRY, Family
+from app.models.epigram import Epigram, EpigramStatus
+from app.schemas.epigram import EPIGRAM_READ_FIELDS
+
+logger = logging.getLogger(__name__)
+
+CORPUS_STORE_ENABLED = os.getenv("CORPUS_STORE_ENABLED", "true").lower() == "true"
+CORPUS_REFRESH_SECONDS = float(os.getenv("CORPUS_REFRESH_SECONDS", "30"))
+
+# updated_at is stamped when the writing transaction starts, so a row can
+# commit after later stamps were already seen; re-read this far back
+WATERMARK_OVERLAP = timedelta(seconds=60)
+
+# Full reload (which compacts the buffer) once this share of it is dead
+MAX_GARBAGE_SHARE = 0.5
+
+LOAD_BATCH_ROWS = 10_000
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+
+# Columns loaded per row: (id, text, author, user_id, created_at, updated_at, status)
+_COLUMNS = (
+    Epigram.id,
+    Epigram.text,
+    Epigram.author,
+    Epigram.user_id,
+    Epigram.created_at,
+    Epigram.updated_at,
+    Epigram.status,
+)
+
+
+def _to_micros(value: datetime) -> int:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return (value - EPOCH) // MICROSECOND
+
+
+def _from_micros(value: int) -> datetime:
+    return EPOCH + timedelta(microseconds=value)
+
+
+def _raw(column: Any) -> memoryview:
+    """Bytes of an array or typed memoryview, without copying."""
+    return memoryview(column).cast("B")
+
+
+# Per-row columns and their array type codes, in snapshot order
+COLUMN_TYPES = (
+    ("ids", "q"),
+    ("user_ids", "q"),
+    ("created", "q"),
+    ("updated", "q"),
+    ("text_offsets", "Q"),
+    ("text_lengths", "H"),
+    ("author_lengths", "h"),
+)
+
+
+class CorpusColumns:
+    """The flat arrays behind a store; rebuilt and swapped in whole on reload.
+
+    Columns are ``array`` objects, or read-only typed memoryviews over a
+    mapped snapshot until the first change copies them into arrays. Text
+    offsets address ``base`` (the snapshot's text, empty otherwise) followed
+    by ``buffer``, so snapshot text is never copied.
+    """
+
+    __slots__ = tuple(name for name, _ in COLUMN_TYPES) + (
+        "base",
+        "buffer",
+        "garbage",
+        "writable",
+    )
+
+    def __init__(self) -> None:
+        for name, typecode in COLUMN_TYPES:
+            setattr(self, name, array(typecode))
+        # ids are sorted; created/updated are microseconds since the epoch, UTC;
+        # text bytes start at text_offsets[i] and the author follows directly;
+        # author_lengths is -1 for no author
+        self.base = memoryview(b"")
+        self.buffer = bytearray()
+        # Bytes of text no row points at any more
+        self.garbage = 0
+        self.writable = True
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def columns(self) -> List[Any]:
+        return [getattr(self, name) for name, _ in COLUMN_TYPES]
+
+    @property
+    def text_size(self) -> int:
+        return len(self.base) + len(self.buffer)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(column.itemsize * len(column) for column in self.columns) + self.text_size
+
+    def _make_writable(self) -> None:
+        if self.writable:
+            return
+        for name, typecode in COLUMN_TYPES:
+            column = array(typecode)
+            column.frombytes(_raw(getattr(self, name)))
+            setattr(self, name, column)
+        self.writable = True
+
+    def _append_text(self, text: str, author: Optional[str]) -> Tuple[int, int, int]:
+        offset = self.text_size
+        encoded = text.encode()
+        self.buffer += encoded
+        if author is None:
+            return offset, len(encoded), -1
+        encoded_author = author.encode()
+        self.buffer += encoded_author
+        return offset, len(encoded), len(encoded_author)
+
+    def _text(self, start: int, length: int) -> str:
+        if start >= len(self.base):
+            start -= len(self.base)
+            return str(self.buffer[start : start + length], "utf-8")
+        return str(self.base[start : start + length], "utf-8")
+
+    def _row_bytes(self, index: int) -> int:
+        return self.text_lengths[index] + max(self.author_lengths[index], 0)
+
+    def append(self, row: Sequence[Any]) -> None:
+        """Append a row with an ID greater than every stored one."""
+        self._make_writable()
+        epigram_id, text, author, user_id, created_at, updated_at = row[:6]
+        offset, text_length, author_length = self._append_text(text, author)
+        self.ids.append(epigram_id)
+        self.user_ids.append(user_id)
+        self.created.append(_to_micros(created_at))
+        self.updated.append(_to_micros(updated_at))
+        self.text_offsets.append(offset)
+        self.text_lengths.append(text_length)
+        self.author_lengths.append(author_length)
+
+    def upsert(self, row: Sequence[Any]) -> bool:
+        """Insert or replace a row.
+
+        Returns:
+            False if the stored row already had this ``updated_at``, and so
+            was left as it is
+        """
+        epigram_id = row[0]
+        index = bisect_left(self.ids, epigram_id)
+        if index == len(self.ids):
+            self.append(row)
+            return True
+        if self.ids[index] == epigram_id:
+            # Catch-up windows overlap, so rows are often seen again unchanged
+            if self.updated[index] == _to_micros(row[5]):
+                return False
+            self._make_writable()
+            self.garbage += self._row_bytes(index)
+        else:
+            self._make_writable()
+            for column in self.columns:
+                column.insert(index, 0)
+            self.ids[index] = epigram_id
+        _, text, author, user_id, created_at, updated_at = row[:6]
+        offset, text_length, author_length = self._append_text(text, author)
+        self.user_ids[index] = user_id
+        self.created[index] = _to_micros(created_at)
+        self.updated[index] = _to_micros(updated_at)
+        self.text_offsets[index] = offset
+        self.text_lengths[index] = text_length
+        self.author_lengths[index] = author_length
+        return True
+
+    def remove(self, epigram_id: int) -> bool:
+        """Drop a row; returns whether it was there."""
+        index = bisect_left(self.ids, epigram_id)
+        if index == len(self.ids) or self.ids[index] != epigram_id:
+            return False
+        self._make_writable()
+        self.garbage += self._row_bytes(index)
+        for column in self.columns:
+            del column[index]
+        return True
+
+    def compacted(self) -> "CorpusColumns":
+        """Copy with all text in ``buffer``, in row order, and no dead bytes."""
+        compact = CorpusColumns()
+        for name, typecode in COLUMN_TYPES:
+            if name != "text_offsets":
+                getattr(compact, name).frombytes(_raw(getattr(self, name)))
+        base_size = len(self.base)
+        for index in range(len(self)):
+            start = self.text_offsets[index]
+            end = start + self._row_bytes(index)
+            compact.text_offsets.append(len(compact.buffer))
+            if start >= base_size:
+                compact.buffer += self.buffer[start - base_size : end - base_size]
+            else:
+                compact.buffer += self.base[start:end]
+        return compact
+
+    def row(self, index: int) -> Tuple[Any, ...]:
+        """Row tuple in EPIGRAM_READ_FIELDS order."""
+        start = self.text_offsets[index]
+        text_length = self.text_lengths[index]
+        author_length = self.author_lengths[index]
+        values = {
+            "id": self.ids[index],
+            "text": self._text(start, text_length),
+            "author": (
+                None if author_length < 0 else self._text(start + text_length, author_length)
+            ),
+            "user_id": self.user_ids[index],
+            "created_at": _from_micros(self.created[index]),
+            "updated_at": _from_micros(self.updated[index]),
+        }
+        return tuple(values[field] for field in EPIGRAM_READ_FIELDS)
+
+
+class CorpusStore:
+    """Approved epigrams in compact columns, refreshed incrementally."""
+
+    def __init__(self, refresh_interval: float = CORPUS_REFRESH_SECONDS) -> None:
+        self.refresh_interval = refresh_interval
+        self._columns = CorpusColumns()
+        # Highest updated_at seen, in microseconds since the epoch
+        self.watermark = 0
+        self._dirty: Set[int] = set()
+        self._full_reload = False
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._loads = SingleFlight("corpus_load")
+        self.loaded = False
+        # Bumped whenever rows are installed, added, changed or removed, so
+        # row positions are only trusted while it stays the same
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._columns)
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the columns and text buffer."""
+        return self._columns.nbytes
+
+    @property
+    def columns(self) -> CorpusColumns:
+        return self._columns
+
+    def sample(self, count: int, exclude_id: Optional[int] = None) -> Optional[List[tuple]]:
+        """Up to ``count`` distinct random rows, or None if the store is not usable.
+
+        Returns:
+            Row tuples in EPIGRAM_READ_FIELDS order
+        """
+        columns = self._columns
+        if not self.loaded or not len(columns):
+            self.misses += 1
+            return None
+        self.hits += 1
+        picks = random.sample(range(len(columns)), min(count + 1, len(columns)))
+        indexes = [index for index in picks if columns.ids[index] != exclude_id]
+        return [columns.row(index) for index in indexes[:count]]
+
+    def build(self, rows: Iterable[Sequence[Any]]) -> None:
+        """Replace the contents with ``rows``, which must be sorted by ID."""
+        columns = CorpusColumns()
+        for row in rows:
+            columns.append(row)
+        self.install(columns)
+
+    def install(self, columns: CorpusColumns, watermark: Optional[int] = None) -> None:
+        """Swap in new contents; the watermark defaults to their newest updated_at."""
+        self._columns = columns
+        self.watermark = max(columns.updated, default=0) if watermark is None else watermark
+        self.loaded = True
+        self.version += 1
+
+    def apply(self, rows: Iterable[Sequence[Any]], checked_ids: Iterable[int] = ()) -> None:
+        """Apply changed rows (with status) and drop ``checked_ids`` not among them."""
+        columns = self._columns
+        seen = set()
+        changed = False
+        for row in rows:
+            seen.add(row[0])
+            if row[6] == EpigramStatus.APPROVED:
+                changed |= columns.upsert(row)
+            else:
+                changed |= columns.remove(row[0])
+            self.watermark = max(self.watermark, _to_micros(row[5]))
+        for epigram_id in checked_ids:
+            if epigram_id not in seen:
+                changed |= columns.remove(epigram_id)
+                seen.add(epigram_id)
+        if changed:
+            self.version += 1
+        if columns.garbage > columns.text_size * MAX_GARBAGE_SHARE:
+            self._full_reload = True
+            self._wake.set()
+
+    async def load(self) -> None:
+        """Load every approved epigram from the database."""
+        await self._loads.do(None, self._load)
+
+    async def _load(self) -> None:
+        # Changes marked from here on may be missed by the query; they stay queued
+        self._dirty.clear()
+        self._full_reload = False
+        columns = CorpusColumns()
+        async with AsyncSession(async_engine) as session:
+            result = await session.stream(
+                select(*_COLUMNS)
+                .where(Epigram.status == EpigramStatus.APPROVED)
+                .order_by(Epigram.id)
+                .execution_options(yield_per=LOAD_BATCH_ROWS)
+            )
+            async for batch in result.partitions():
+                for row in batch:
+                    columns.append(row)
+        self.install(columns)
+        logger.info(
+            "Corpus store loaded %d epigrams in %.1f MB", len(columns), columns.nbytes / 2**20
+        )
+
+    def invalidate(self, keys: Optional[Set[Hashable]]) -> None:
+        """Re-check IDs, or reload everything for None."""
+        if not self.loaded:
+            return
+        if keys is None:
+            self._full_reload = True
+        else:
+            self._dirty.update(int(key) for key in keys)
+        self._wake.set()
+
+    def resync(self) -> None:
+        self.invalidate(None)
+
+    async def reconcile(self) -> None:
+        """Bring contents installed from a snapshot up to date with the database.
+
+        The watermark only finds rows written since the snapshot, so approved
+        IDs are compared as well: IDs that are gone (deleted, or no longer
+        approved without an ``updated_at`` bump) are dropped, and IDs missing
+        here are fetched along with the rows past the watermark.
+        """
+        async with AsyncSession(async_engine) as session:
+            result = await session.stream_scalars(
+                select(Epigram.id)
+                .where(Epigram.status == EpigramStatus.APPROVED)
+                .order_by(Epigram.id)
+                .execution_options(yield_per=LOAD_BATCH_ROWS * 10)
+            )
+            approved = array("q")
+            async for batch in result.partitions():
+                approved.extend(batch)
+        columns = self._columns
+        if approved.tobytes() != columns.ids.tobytes():
+            current = set(columns.ids)
+            expected = set(approved)
+            removed = False
+            for epigram_id in current - expected:
+                removed |= columns.remove(epigram_id)
+            if removed:
+                self.version += 1
+            self._dirty.update(expected - current)
+        await self.refresh(catch_up=True)
+
+    async def refresh(self, catch_up: bool = False) -> None:
+        """Apply queued changes, and rows past the watermark if ``catch_up``."""
+        if self._full_reload:
+            await self.load()
+            return
+        if self._dirty:
+            dirty, self._dirty = self._dirty, set()
+            async with AsyncSession(async_engine) as session:
+                result = await session.execute(select(*_COLUMNS).where(Epigram.id.in_(dirty)))
+                self.apply(result.tuples().all(), checked_ids=dirty)
+        if catch_up:
+            since = _from_micros(self.watermark) - WATERMARK_OVERLAP
+            async with AsyncSession(async_engine) as session:
+                result = await session.execute(
+                    select(*_COLUMNS).where(Epigram.updated_at >= since)
+                )
+                self.apply(result.tuples().all())
+
+    def start(self) -> None:
+        """Start the background refresh loop; call after the first load."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            catch_up = False
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.refresh_interval)
+            except asyncio.TimeoutError:
+                catch_up = True
+            self._wake.clear()
+            try:
+                await self.refresh(catch_up)
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Corpus refresh failed; retrying with a full reload")
+                self._full_reload = True
+                self._wake.set()
+                await asyncio.sleep(1.0)
+
+    def collect(self) -> List[Family]:
+        rows = Family("corpus_store_rows", "gauge", "Approved epigrams held in memory")
+        rows.add(len(self._columns))
+        size = Family("corpus_store_bytes", "gauge", "Memory held by the corpus store columns")
+        size.add(self._columns.nbytes)
+        garbage = Family(
+            "corpus_store_garbage_bytes", "gauge", "Dead text bytes awaiting a reload"
+        )
+        garbage.add(self._columns.garbage)
+        return [rows, size, garbage]
+
+
+corpus_store = CorpusStore()
+invalidation_bus.subscribe(EPIGRAM, corpus_store.invalidate)
+invalidation_bus.on_resync(corpus_store.resync)
+REGISTRY.register_cache("corpus_store", corpus_store)
+REGISTRY.register_collector(corpus_store.collect)
@@ -0,0 +1,173 @@
+"""
+Binary snapshots of the corpus store, for fast cold starts.
+
+A snapshot holds the store's columns exactly as they sit in memory, so a
+worker can ``mmap`` it read-only and use the sections in place: nothing is
+parsed or copied, and workers on one host share the file's page cache. The
+worker then catches up from the database by watermark (see
+``CorpusStore.reconcile``) instead of loading every row.
+
+Layout, little-endian, sections 8-byte aligned::
+
+    header   magic, format version, row count, watermark, file size
+    index    (offset, length) of each section
+    ids, user_ids, created, updated     int64 per row
+    text_offsets                        uint64 per row, into the text section
+    text_lengths, author_lengths        uint16 / int16 per row (-1: no author)
+    text                                UTF-8 text, each author right after its text
+
+Snapshots are written to a temporary file and renamed over the old one, so
+workers that mapped the previous file keep a valid mapping.
+"""
+
+import logging
+import mmap
+import os
+import struct
+import sys
+import time
+from typing import Tuple
+
+from app.cache.corpus import COLUMN_TYPES, CorpusColumns, CorpusStore
+
+logger = logging.getLogger(__name__)
+
+CORPUS_SNAPSHOT_PATH = os.getenv("CORPUS_SNAPSHOT_PATH")
+
+MAGIC = b"ISITCORP"
+FORMAT_VERSION = 1
+
+SECTIONS = tuple(name for name, _ in COLUMN_TYPES) + ("text",)
+
+# magic, version, (padding), rows, watermark, file size
+HEADER = struct.Struct("<8sH6xQqQ")
+SECTION = struct.Struct("<QQ")
+ALIGNMENT = 8
+
+
+class SnapshotError(Exception):
+    """The snapshot file is missing, truncated or in another format."""
+
+
+def _aligned(offset: int) -> int:
+    return -(-offset // ALIGNMENT) * ALIGNMENT
+
+
+def write_snapshot(path: str, columns: CorpusColumns, watermark: int) -> int:
+    """Write ``columns`` to ``path`` atomically.
+
+    Args:
+        path: Destination file
+        columns: Store contents; compacted first if they have dead or mapped text
+        watermark: Newest updated_at covered, in microseconds since the epoch
+
+    Returns:
+        Size of the written file in bytes
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("Snapshots are little-endian; this platform is not")
+    if columns.base or columns.garbage:
+        columns = columns.compacted()
+
+    sections = [getattr(columns, name) for name in SECTIONS[:-1]] + [columns.buffer]
+    index = []
+    offset = _aligned(HEADER.size + SECTION.size * len(sections))
+    for section in sections:
+        length = memoryview(section).nbytes
+        index.append((offset, length))
+        offset = _aligned(offset + length)
+    size = offset
+
+    temporary = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as snapshot:
+            snapshot.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(columns), watermark, size))
+            for section_offset, length in index:
+                snapshot.write(SECTION.pack(section_offset, length))
+            for section, (section_offset, _) in zip(sections, index):
+                snapshot.write(b"\0" * (section_offset - snapshot.tell()))
+                snapshot.write(section)
+            snapshot.write(b"\0" * (size - snapshot.tell()))
+            snapshot.flush()
+            os.fsync(snapshot.fileno())
+        os.replace(temporary, path)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+    return size
+
+
+def read_snapshot(path: str) -> Tuple[CorpusColumns, int]:
+    """Map a snapshot read-only.
+
+    Returns:
+        Tuple of (columns backed by the mapping, watermark)
+
+    Raises:
+        SnapshotError: If the file cannot be used
+    """
+    if sys.byteorder != "little":
+        raise SnapshotError("Snapshots are little-endian; this platform is not")
+    try:
+        with open(path, "rb") as snapshot:
+            mapping = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError) as e:
+        raise SnapshotError(f"Cannot map {path}: {e}") from e
+
+    view = memoryview(mapping)
+    index_end = HEADER.size + SECTION.size * len(SECTIONS)
+    if len(view) < index_end:
+        raise SnapshotError(f"{path} is too short for a snapshot header")
+    magic, version, rows, watermark, size = HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError(f"{path} is not a corpus snapshot")
+    if version != FORMAT_VERSION:
+        raise SnapshotError(f"{path} has format version {version}, expected {FORMAT_VERSION}")
+    if size != len(view):
+        raise SnapshotError(f"{path} is {len(view)} bytes, header says {size}")
+
+    columns = CorpusColumns()
+    typecodes = dict(COLUMN_TYPES)
+    for position, name in enumerate(SECTIONS):
+        offset, length = SECTION.unpack_from(view, HEADER.size + SECTION.size * position)
+        if offset + length > size:
+            raise SnapshotError(f"{path}: section {name} runs past the end of the file")
+        section = view[offset : offset + length]
+        if name == "text":
+            columns.base = section
+            continue
+        try:
+            typed = section.cast(typecodes[name])
+        except TypeError as e:
+            raise SnapshotError(f"{path}: section {name} is misaligned") from e
+        if len(typed) != rows:
+            raise SnapshotError(f"{path}: section {name} has {len(typed)} rows, expected {rows}")
+        setattr(columns, name, typed)
+    columns.writable = False
+    return columns, watermark
+
+
+async def start_from_snapshot(store: CorpusStore, path: str) -> bool:
+    """Install the snapshot at ``path`` into ``store`` and catch up from the database.
+
+    Returns:
+        False if there is no usable snapshot, so the caller should load from scratch
+    """
+    started = time.perf_counter()
+    try:
+        columns, watermark = read_snapshot(path)
+    except SnapshotError as e:
+        logger.warning("Corpus snapshot not used: %s", e)
+        return False
+    store.install(columns, watermark)
+    mapped = time.perf_counter()
+    await store.reconcile()
+    logger.info(
+        "Corpus store started from %s: %d epigrams mapped in %.1f ms, caught up in %.1f ms",
+        path,
+        len(columns),
+        (mapped - started) * 1000,
+        (time.perf_counter() - mapped) * 1000,
+    )
+    return True
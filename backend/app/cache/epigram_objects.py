@@ -0,0 +1,86 @@
+"""
+Approved epigrams by ID.
+
+A bounded LRU of response-ready epigram dicts with a TTL, used by the
+multi-get endpoint. IDs that are missing or not approved are cached as
+negatives so repeated lookups of them stay off the database too. Entries are
+dropped on ``EPIGRAM`` invalidation; the TTL only bounds how long an entry
+can outlive a notification lost during a listener reconnect.
+"""
+
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+from app.cache.invalidation import EPIGRAM, invalidation_bus
+from app.metrics import REGISTRY
+
+EPIGRAM_CACHE_SIZE = int(os.getenv("EPIGRAM_CACHE_SIZE", "10000"))
+EPIGRAM_CACHE_TTL = float(os.getenv("EPIGRAM_CACHE_TTL_SECONDS", "300"))
+
+
+class EpigramObjectCache:
+    """Bounded LRU of ``id -> epigram dict`` (None for not visible) with a TTL."""
+
+    def __init__(self, max_size: int = EPIGRAM_CACHE_SIZE, ttl: float = EPIGRAM_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        # id -> (expires_at, epigram or None)
+        self._entries: "OrderedDict[int, Tuple[float, Optional[dict]]]" = OrderedDict()
+        # Bumped on every invalidation, so in-flight loads can tell they are stale
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_many(self, ids: Iterable[int]) -> Tuple[Dict[int, Optional[dict]], List[int]]:
+        """Look up IDs.
+
+        Returns:
+            Tuple of (cached entries, None meaning not visible; IDs to load)
+        """
+        now = time.monotonic()
+        found: Dict[int, Optional[dict]] = {}
+        missing: List[int] = []
+        for epigram_id in ids:
+            entry = self._entries.get(epigram_id)
+            if entry is None or entry[0] <= now:
+                missing.append(epigram_id)
+                continue
+            self._entries.move_to_end(epigram_id)
+            found[epigram_id] = entry[1]
+        self.hits += len(found)
+        self.misses += len(missing)
+        return found, missing
+
+    def set_many(self, entries: Dict[int, Optional[dict]], generation: int) -> None:
+        """Store loaded entries, unless they were loaded before the latest invalidation."""
+        if generation != self.generation:
+            return
+        expires_at = time.monotonic() + self.ttl
+        for epigram_id, epigram in entries.items():
+            self._entries[epigram_id] = (expires_at, epigram)
+            self._entries.move_to_end(epigram_id)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Set[Hashable]]) -> None:
+        """Drop the given epigram IDs, or everything for None."""
+        self.generation += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            self._entries.pop(int(key), None)
+
+    def clear(self) -> None:
+        self.invalidate(None)
+
+
+epigram_objects = EpigramObjectCache()
+invalidation_bus.subscribe(EPIGRAM, epigram_objects.invalidate)
+invalidation_bus.on_resync(epigram_objects.clear)
+REGISTRY.register_cache("epigram_objects", epigram_objects)
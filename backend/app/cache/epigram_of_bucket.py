@@ -0,0 +1,83 @@
+"""
+Rendered "epigram of the bucket" responses.
+
+Each time bucket's pick is deterministic, so the serialized body and its
+ETag are computed once per worker and bucket. Any epigram change clears the
+memo, since the picked epigram may have been edited, rejected or deleted.
+
+The pick is a rendezvous (highest random weight) choice: every approved ID
+is scored with a hash of the bucket and the ID, and the highest score wins.
+Scores do not depend on how many epigrams are approved, so approving or
+removing other epigrams mid-bucket keeps the pick, and the copies proxies
+hold until the bucket ends stay in agreement with the origin. It changes
+only when the picked epigram is removed, or when a newly approved one
+outscores it.
+"""
+
+import hashlib
+import os
+from typing import Dict, Hashable, Iterable, Optional, Set, Tuple
+
+from app.cache.invalidation import EPIGRAM, invalidation_bus
+from app.metrics import REGISTRY
+
+# Shared by all workers so they pick the same epigram for a bucket
+BUCKET_SEED = os.getenv("EPIGRAM_BUCKET_SEED", "is-it")
+
+
+def bucket_pick(interval_minutes: int, bucket: int, ids: Iterable[int]) -> Optional[int]:
+    """ID with the highest rendezvous score for a time bucket, identical across processes.
+
+    Returns:
+        The picked ID, or None if ``ids`` is empty
+    """
+    # Keyed once per bucket; each ID then costs one short hash
+    key = hashlib.blake2b(
+        f"{BUCKET_SEED}:{interval_minutes}:{bucket}".encode(), digest_size=32
+    ).digest()
+    best_id, best_score = None, b""
+    for epigram_id in ids:
+        score = hashlib.blake2b(
+            int(epigram_id).to_bytes(8, "big", signed=True), digest_size=8, key=key
+        ).digest()
+        if score > best_score:
+            best_id, best_score = epigram_id, score
+    return best_id
+
+
+class EpigramOfBucketCache:
+    """Current bucket's (ETag, body) per interval."""
+
+    def __init__(self) -> None:
+        # interval -> (bucket, etag, body)
+        self._entries: Dict[int, Tuple[int, str, bytes]] = {}
+        # Bumped on invalidation, so renders that raced a change are not stored
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, interval_minutes: int, bucket: int) -> Optional[Tuple[str, bytes]]:
+        entry = self._entries.get(interval_minutes)
+        if entry is None or entry[0] != bucket:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry[1], entry[2]
+
+    def set(self, interval_minutes: int, bucket: int, body: bytes, generation: int) -> str:
+        """Store a rendered body unless it raced an invalidation; return its ETag."""
+        # Weak: the gzip, brotli and identity encodings share it
+        etag = f'W/"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        if generation == self.generation:
+            self._entries[interval_minutes] = (bucket, etag, body)
+        return etag
+
+    def invalidate(self, _keys: Optional[Set[Hashable]] = None) -> None:
+        self.generation += 1
+        self._entries.clear()
+
+
+epigram_of_bucket = EpigramOfBucketCache()
+invalidation_bus.subscribe(EPIGRAM, epigram_of_bucket.invalidate)
+invalidation_bus.on_resync(epigram_of_bucket.invalidate)
+REGISTRY.register_cache("epigram_of_bucket", epigram_of_bucket)
@@ -0,0 +1,253 @@
+"""
+Cross-worker cache invalidation over Postgres LISTEN/NOTIFY.
+
+Services call :func:`publish` next to their writes. Events are collected on
+the session and sent as one ``pg_notify`` inside the committing transaction,
+so Postgres delivers them only if the commit succeeds. The committing worker
+applies them locally right after commit; every other worker receives them on
+its dedicated ``LISTEN`` connection, coalesces them in short batches and
+applies them. After a reconnect each worker runs a full resync, because
+notifications sent while it was disconnected are lost.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+import socket
+import uuid
+from typing import Callable, Dict, Hashable, List, Optional, Set
+
+import asyncpg
+import orjson
+from sqlalchemy import event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db import ASYNC_DATABASE_URL
+from app.metrics import REGISTRY, Family
+
+logger = logging.getLogger(__name__)
+
+# Topics published by the services
+EPIGRAM = "epigram"
+USER = "user"
+SETTINGS = "settings"
+
+CHANNEL = os.getenv("CACHE_INVALIDATION_CHANNEL", "cache_invalidation")
+BATCH_WINDOW_SECONDS = float(os.getenv("CACHE_INVALIDATION_BATCH_MS", "50")) / 1000
+KEEPALIVE_SECONDS = 30.0
+
+# Postgres rejects NOTIFY payloads of 8000 bytes or more
+MAX_PAYLOAD_BYTES = 7900
+
+# Identifies this worker so it can skip its own notifications
+ORIGIN = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+_SESSION_KEY = "cache_invalidation_events"
+
+# topic -> keys to drop, or None to drop everything cached for the topic
+Events = Dict[str, Optional[Set[Hashable]]]
+Handler = Callable[[Optional[Set[Hashable]]], None]
+
+
+def merge_events(target: Events, topic: str, keys: Optional[Set[Hashable]]) -> None:
+    """Merge keys for a topic into an event batch, widening to the whole topic on None."""
+    if topic in target and target[topic] is None:
+        return
+    if keys is None:
+        target[topic] = None
+    else:
+        target.setdefault(topic, set()).update(keys)
+
+
+def encode_events(events: Events) -> str:
+    """Encode a batch compactly, collapsing to topic-wide flushes if it is too large."""
+    body = {
+        topic: None if keys is None else sorted(keys, key=str)
+        for topic, keys in events.items()
+    }
+    payload = orjson.dumps({"o": ORIGIN, "e": body})
+    if len(payload) > MAX_PAYLOAD_BYTES:
+        payload = orjson.dumps({"o": ORIGIN, "e": {topic: None for topic in events}})
+    return payload.decode()
+
+
+class InvalidationBus:
+    """Routes invalidation events to in-process cache handlers."""
+
+    def __init__(self, channel: str = CHANNEL, batch_window: float = BATCH_WINDOW_SECONDS):
+        self.channel = channel
+        self.batch_window = batch_window
+        self._handlers: Dict[str, List[Handler]] = {}
+        self._resync_handlers: List[Callable] = []
+        self._pending: Events = {}
+        self._wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+        self.received = 0
+        self.applied_batches = 0
+        self.resyncs = 0
+
+    def subscribe(self, topic: str, handler: Handler) -> None:
+        """Register a handler called with the invalidated keys (None means all)."""
+        self._handlers.setdefault(topic, []).append(handler)
+
+    def on_resync(self, handler: Callable) -> None:
+        """Register a sync or async callable that rebuilds or drops a cache entirely."""
+        self._resync_handlers.append(handler)
+
+    def apply(self, events: Events) -> None:
+        """Apply an event batch to this worker's caches."""
+        for topic, keys in events.items():
+            for handler in self._handlers.get(topic, ()):
+                try:
+                    handler(keys)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Invalidation handler failed for topic %s", topic)
+        self.applied_batches += 1
+
+    async def resync(self) -> None:
+        """Run every resync handler, e.g. after missing notifications."""
+        self.resyncs += 1
+        for handler in self._resync_handlers:
+            try:
+                result = handler()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Cache resync handler %r failed", handler)
+
+    async def start(self) -> None:
+        """Start listening if the database supports LISTEN/NOTIFY."""
+        url = make_url(ASYNC_DATABASE_URL)
+        if url.get_backend_name() != "postgresql" or self._tasks:
+            return
+        dsn = url.set(drivername="postgresql").render_as_string(hide_password=False)
+        self._tasks = [
+            asyncio.create_task(self._listen(dsn), name="invalidation-listen"),
+            asyncio.create_task(self._drain(), name="invalidation-drain"),
+        ]
+
+    async def stop(self) -> None:
+        """Stop the listener and apply anything still pending."""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._pending:
+            pending, self._pending = self._pending, {}
+            self.apply(pending)
+
+    def _on_notify(self, _connection, _pid, _channel, payload: str) -> None:
+        try:
+            message = orjson.loads(payload)
+        except orjson.JSONDecodeError:
+            logger.warning("Ignoring malformed invalidation payload")
+            return
+        if message.get("o") == ORIGIN:
+            return
+        self.received += 1
+        for topic, keys in message.get("e", {}).items():
+            merge_events(self._pending, topic, None if keys is None else set(keys))
+        self._wakeup.set()
+
+    async def _drain(self) -> None:
+        """Apply received events in batches, coalescing bursts within the batch window."""
+        while True:
+            await self._wakeup.wait()
+            await asyncio.sleep(self.batch_window)
+            self._wakeup.clear()
+            pending, self._pending = self._pending, {}
+            if pending:
+                self.apply(pending)
+
+    async def _listen(self, dsn: str) -> None:
+        """Hold one LISTEN connection, reconnecting with backoff and resyncing after gaps."""
+        backoff = 0.5
+        connected_before = False
+        while True:
+            try:
+                connection = await asyncpg.connect(dsn)
+            except (OSError, asyncpg.PostgresError) as exc:
+                logger.warning("Invalidation listener cannot connect: %s", exc)
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, 30.0)
+                continue
+
+            lost = asyncio.Event()
+            connection.add_termination_listener(lambda _conn, lost=lost: lost.set())
+            try:
+                await connection.add_listener(self.channel, self._on_notify)
+                if connected_before:
+                    logger.info("Invalidation listener reconnected, resyncing caches")
+                    await self.resync()
+                connected_before = True
+                backoff = 0.5
+                while not lost.is_set():
+                    try:
+                        await asyncio.wait_for(lost.wait(), timeout=KEEPALIVE_SECONDS)
+                    except asyncio.TimeoutError:
+                        # Detect half-open connections that never report termination
+                        await connection.execute("SELECT 1")
+            except (OSError, asyncpg.PostgresError, asyncpg.InterfaceError) as exc:
+                logger.warning("Invalidation listener lost its connection: %s", exc)
+            finally:
+                if not connection.is_closed():
+                    connection.terminate()
+
+
+invalidation_bus = InvalidationBus()
+
+
+def _collect_bus_metrics() -> List[Family]:
+    families = []
+    for name, value, documentation in (
+        ("cache_invalidation_received", invalidation_bus.received, "Notifications received"),
+        ("cache_invalidation_batches", invalidation_bus.applied_batches, "Event batches applied"),
+        ("cache_invalidation_resyncs", invalidation_bus.resyncs, "Full resyncs after reconnects"),
+    ):
+        family = Family(name, "counter", documentation)
+        family.add(value, suffix="_total")
+        families.append(family)
+    return families
+
+
+REGISTRY.register_collector(_collect_bus_metrics)
+
+
+def publish(session: AsyncSession, topic: str, key: Optional[Hashable] = None) -> None:
+    """Queue an invalidation event to be sent when the session commits.
+
+    Args:
+        session: Session performing the write
+        topic: Cache topic, e.g. ``EPIGRAM``
+        key: Affected key, or None to invalidate the whole topic
+    """
+    events = session.sync_session.info.setdefault(_SESSION_KEY, {})
+    merge_events(events, topic, None if key is None else {key})
+
+
+@event.listens_for(Session, "before_commit")
+def _notify_before_commit(session: Session) -> None:
+    """Send pending events inside the transaction; Postgres delivers them on commit."""
+    events = session.info.get(_SESSION_KEY)
+    if events and session.get_bind().dialect.name == "postgresql":
+        session.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": invalidation_bus.channel, "payload": encode_events(events)},
+        )
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_after_commit(session: Session) -> None:
+    """Apply this worker's own events once the write is durable."""
+    events = session.info.pop(_SESSION_KEY, None)
+    if events:
+        invalidation_bus.apply(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    """Drop events for writes that never happened."""
+    session.info.pop(_SESSION_KEY, None)
@@ -0,0 +1,98 @@
+"""
+Single-flight coalescing for identical concurrent reads.
+
+The first caller for a key starts the work as its own task; callers arriving
+while it runs await the same task and share its result or exception. The
+work only runs on behalf of its callers: if every caller is cancelled it is
+cancelled too, while a single caller going away leaves it running for the
+others.
+
+Shared results are handed to several requests, so loaders must not use a
+request's session; they open their own and return plain rows or detached
+objects. After a write, ``forget`` makes new callers start a fresh flight
+instead of joining one that may have read the old data.
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Set, TypeVar
+
+from app.metrics import REGISTRY
+
+T = TypeVar("T")
+
+SINGLE_FLIGHT_CALLS = REGISTRY.counter(
+    "single_flight_calls",
+    "Calls through single-flight groups, by whether they ran the work or joined it",
+    ("group", "role"),
+)
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """A named group of in-flight calls keyed by their arguments.
+
+    Args:
+        name: Group name used as the metric label
+    """
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._leaders = SINGLE_FLIGHT_CALLS.labels(name, "leader")
+        self._coalesced = SINGLE_FLIGHT_CALLS.labels(name, "coalesced")
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[T]], *args: Any) -> T:
+        """Run ``fn(*args)``, or join the call already running for ``key``.
+
+        Args:
+            key: Identifies identical calls
+            fn: Coroutine function doing the work
+            *args: Arguments for ``fn``
+
+        Returns:
+            The shared result
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.get_running_loop().create_task(fn(*args)))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _task: self._drop(key, flight))
+            self._leaders.inc()
+        else:
+            self._coalesced.inc()
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Nobody is left to use the result; stop the work and let
+                # later callers start over rather than join a cancelled task
+                self._drop(key, flight)
+                flight.task.cancel()
+
+    def forget(self, keys: Optional[Set[Hashable]] = None) -> None:
+        """Detach in-flight calls for ``keys`` (all for None) so new callers start afresh.
+
+        Callers already waiting still receive the detached call's result.
+        """
+        if keys is None:
+            self._flights.clear()
+            return
+        for key in keys:
+            self._flights.pop(key, None)
+
+    def _drop(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
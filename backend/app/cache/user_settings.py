@@ -0,0 +1,75 @@
+"""
+Per-user settings cache.
+
+Holds validated ``UserSettingsRead`` snapshots in a bounded LRU. Writes go
+through the service, which stores the committed row here after the commit,
+and every other worker drops the entry when the ``SETTINGS`` invalidation
+arrives. Reads that raced with an invalidation are not stored.
+"""
+
+import os
+from collections import OrderedDict
+from typing import Hashable, Optional, Set
+
+from app.cache.invalidation import SETTINGS, invalidation_bus
+from app.metrics import REGISTRY
+from app.schemas.user import UserSettingsRead
+
+USER_SETTINGS_CACHE_SIZE = int(os.getenv("USER_SETTINGS_CACHE_SIZE", "10000"))
+
+
+class UserSettingsCache:
+    """Bounded LRU of settings snapshots keyed by user ID."""
+
+    def __init__(self, max_size: int = USER_SETTINGS_CACHE_SIZE) -> None:
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, UserSettingsRead]" = OrderedDict()
+        # Bumped on every invalidation, so in-flight loads can tell they are stale
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: int) -> Optional[UserSettingsRead]:
+        settings = self._entries.get(user_id)
+        if settings is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(user_id)
+        self.hits += 1
+        return settings
+
+    def set(self, settings: UserSettingsRead, generation: Optional[int] = None) -> None:
+        """Store a snapshot, unless it was loaded before the latest invalidation.
+
+        Args:
+            settings: Committed settings
+            generation: ``generation`` observed before loading, for read-through
+                callers; write-through callers omit it
+        """
+        if generation is not None and generation != self.generation:
+            return
+        self._entries[settings.user_id] = settings
+        self._entries.move_to_end(settings.user_id)
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, keys: Optional[Set[Hashable]]) -> None:
+        """Drop the given user IDs, or everything for None."""
+        self.generation += 1
+        if keys is None:
+            self._entries.clear()
+            return
+        for key in keys:
+            self._entries.pop(int(key), None)
+
+    def clear(self) -> None:
+        self.invalidate(None)
+
+
+user_settings_cache = UserSettingsCache()
+invalidation_bus.subscribe(SETTINGS, user_settings_cache.invalidate)
+invalidation_bus.on_resync(user_settings_cache.clear)
+REGISTRY.register_cache("user_settings", user_settings_cache)
@@ -0,0 +1,343 @@
+"""
+Weighted random selection over the corpus store.
+
+``RANDOM_WEIGHTING`` names one or more weight functions (comma-separated;
+their weights multiply), e.g. ``recency,system`` to favour new submissions
+and show the seeded ``system`` epigrams less. Empty keeps ``/random/batch``
+uniform.
+
+Weights are turned into a Vose alias table: two arrays over the approved
+rows from which each draw takes one uniform column and one coin flip, so a
+draw is O(1) whatever the weights. Building the table is O(n) and runs in a
+thread, off the event loop, on a copy of the store's integer columns. It is
+rebuilt in the background whenever the store has changed since the last
+build (checked every ``RANDOM_WEIGHT_REBUILD_SECONDS``), and at least every
+``RANDOM_WEIGHT_MAX_AGE_SECONDS`` so time-based weights keep up with the
+clock. Between rebuilds a drawn ID is looked up in the current store, so
+removed epigrams are skipped; new ones are drawn after the next rebuild.
+
+Further weight functions register with :func:`register_weight`.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import random
+import time
+from array import array
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.cache.corpus import CorpusStore, corpus_store
+from app.db import async_engine
+from app.metrics import REGISTRY, Family
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+RANDOM_WEIGHTING = [
+    name.strip() for name in os.getenv("RANDOM_WEIGHTING", "").split(",") if name.strip()
+]
+RANDOM_WEIGHT_REBUILD_SECONDS = float(os.getenv("RANDOM_WEIGHT_REBUILD_SECONDS", "30"))
+RANDOM_WEIGHT_MAX_AGE_SECONDS = float(os.getenv("RANDOM_WEIGHT_MAX_AGE_SECONDS", "600"))
+RANDOM_RECENCY_HALF_LIFE_DAYS = float(os.getenv("RANDOM_RECENCY_HALF_LIFE_DAYS", "30"))
+# Weight an epigram decays towards, so old ones still come up
+RANDOM_RECENCY_FLOOR = float(os.getenv("RANDOM_RECENCY_FLOOR", "0.1"))
+RANDOM_SYSTEM_USERNAME = os.getenv("RANDOM_SYSTEM_USERNAME", "system")
+RANDOM_SYSTEM_WEIGHT = float(os.getenv("RANDOM_SYSTEM_WEIGHT", "0.25"))
+
+# Draws per requested row before topping up with uniform picks, for weights
+# concentrated on fewer rows than were asked for
+MAX_DRAWS_PER_ROW = 20
+
+# Poll interval until the first table is built
+STARTUP_POLL_SECONDS = 1.0
+
+MICROS_PER_DAY = 86_400_000_000
+
+WEIGHTED_SAMPLER_BUILD_SECONDS = REGISTRY.histogram(
+    "weighted_sampler_build_duration_seconds", "Alias table build duration"
+)
+
+
+class AliasTable:
+    """Vose alias table for O(1) draws from a discrete distribution.
+
+    Args:
+        weights: Non-negative weight per outcome, not all zero
+
+    Raises:
+        ValueError: If there are no outcomes or the weights are unusable
+    """
+
+    __slots__ = ("probability", "alias")
+
+    def __init__(self, weights: Sequence[float]) -> None:
+        size = len(weights)
+        total = math.fsum(weights)
+        if not size or not total > 0 or not math.isfinite(total):
+            raise ValueError("weights must be finite, non-negative and not all zero")
+        if min(weights) < 0:
+            raise ValueError("weights must be non-negative")
+        scaled = array("d", (weight * size / total for weight in weights))
+        self.probability = array("d", bytes(8 * size))
+        self.alias = array("q", bytes(8 * size))
+        small = [index for index, value in enumerate(scaled) if value < 1.0]
+        large = [index for index, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] = (scaled[more] + scaled[less]) - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1 up to rounding error
+        for index in large + small:
+            self.probability[index] = 1.0
+
+    def __len__(self) -> int:
+        return len(self.probability)
+
+    def draw(self, rng: random.Random = random) -> int:
+        """Index of one outcome, drawn with probability proportional to its weight."""
+        column = int(rng.random() * len(self.probability))
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+class RowFacts(NamedTuple):
+    """What weight functions see: per-row columns, copied from the store."""
+
+    ids: array
+    user_ids: array
+    # Microseconds since the epoch, UTC
+    created: array
+    updated: array
+    # Build time, microseconds since the epoch
+    now: int
+    # ID of the RANDOM_SYSTEM_USERNAME user, None if there is none
+    system_user_id: Optional[int]
+
+
+# Weight per row, in row order
+WeightFunction = Callable[[RowFacts], Iterable[float]]
+
+WEIGHT_FUNCTIONS: Dict[str, WeightFunction] = {}
+
+
+def register_weight(name: str) -> Callable[[WeightFunction], WeightFunction]:
+    """Decorator making a weight function selectable in ``RANDOM_WEIGHTING``."""
+
+    def decorator(function: WeightFunction) -> WeightFunction:
+        WEIGHT_FUNCTIONS[name] = function
+        return function
+
+    return decorator
+
+
+@register_weight("recency")
+def recency_weight(facts: RowFacts) -> Iterable[float]:
+    """Halves every ``RANDOM_RECENCY_HALF_LIFE_DAYS`` of age, down to the floor."""
+    decay = math.log(2) / (RANDOM_RECENCY_HALF_LIFE_DAYS * MICROS_PER_DAY)
+    floor = RANDOM_RECENCY_FLOOR
+    now = facts.now
+    return (
+        floor + (1.0 - floor) * math.exp(-decay * max(now - created, 0))
+        for created in facts.created
+    )
+
+
+@register_weight("system")
+def system_weight(facts: RowFacts) -> Iterable[float]:
+    """``RANDOM_SYSTEM_WEIGHT`` for the seeded system user's epigrams, 1 otherwise."""
+    system_user_id = facts.system_user_id
+    weight = RANDOM_SYSTEM_WEIGHT
+    return (weight if user_id == system_user_id else 1.0 for user_id in facts.user_ids)
+
+
+def _copy(column) -> array:
+    copied = array(column.typecode if isinstance(column, array) else column.format)
+    copied.frombytes(memoryview(column).cast("B"))
+    return copied
+
+
+class _Built(NamedTuple):
+    table: AliasTable
+    # Epigram ID of each outcome
+    ids: array
+    # Store version the table was built from
+    version: int
+    built_at: float
+
+
+class WeightedSampler:
+    """Weighted draws of approved epigrams from a corpus store.
+
+    Args:
+        store: Store to draw rows from
+        weighting: Names of registered weight functions, multiplied together
+        rebuild_interval: Seconds between checks for changes to the store
+        max_age: Seconds after which the table is rebuilt regardless
+    """
+
+    def __init__(
+        self,
+        store: CorpusStore,
+        weighting: Sequence[str] = tuple(RANDOM_WEIGHTING),
+        rebuild_interval: float = RANDOM_WEIGHT_REBUILD_SECONDS,
+        max_age: float = RANDOM_WEIGHT_MAX_AGE_SECONDS,
+    ) -> None:
+        self.store = store
+        self.weighting = tuple(weighting)
+        self.rebuild_interval = rebuild_interval
+        self.max_age = max_age
+        self._built: Optional[_Built] = None
+        self._system_user_id: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.weighting)
+
+    def _functions(self) -> List[WeightFunction]:
+        unknown = [name for name in self.weighting if name not in WEIGHT_FUNCTIONS]
+        if unknown:
+            raise ValueError(
+                f"Unknown RANDOM_WEIGHTING {', '.join(unknown)}; "
+                f"available: {', '.join(sorted(WEIGHT_FUNCTIONS))}"
+            )
+        return [WEIGHT_FUNCTIONS[name] for name in self.weighting]
+
+    def sample(self, count: int, exclude_id: Optional[int] = None) -> Optional[List[tuple]]:
+        """Up to ``count`` distinct weighted rows, or None until a table is built.
+
+        Returns:
+            Row tuples in EPIGRAM_READ_FIELDS order
+        """
+        built = self._built
+        columns = self.store.columns
+        if built is None or not self.store.loaded or not len(columns):
+            self.misses += 1
+            return None
+        self.hits += 1
+        # Positions still match the store's rows until it changes
+        current = built.version == self.store.version
+        picked = set()
+        indexes = []
+        for _ in range(count * MAX_DRAWS_PER_ROW):
+            if len(indexes) == count:
+                break
+            position = built.table.draw()
+            epigram_id = built.ids[position]
+            if epigram_id == exclude_id or epigram_id in picked:
+                continue
+            index = position if current else bisect_left(columns.ids, epigram_id)
+            # Checked on the fast path too, so a missed version bump can only
+            # cost a draw, never return another row
+            if index >= len(columns.ids) or columns.ids[index] != epigram_id:
+                continue
+            picked.add(epigram_id)
+            indexes.append(index)
+        rows = [columns.row(index) for index in indexes]
+        if len(rows) < count:
+            for row in self.store.sample(count + len(picked), exclude_id) or ():
+                if len(rows) == count:
+                    break
+                if row[0] not in picked:
+                    rows.append(row)
+        return rows
+
+    async def rebuild(self) -> None:
+        """Build a table from the store's current rows and swap it in."""
+        functions = self._functions()
+        if self._system_user_id is None:
+            async with AsyncSession(async_engine) as session:
+                self._system_user_id = (
+                    await session.execute(
+                        select(User.id).where(User.username == RANDOM_SYSTEM_USERNAME)
+                    )
+                ).scalar_one_or_none()
+
+        version = self.store.version
+        columns = self.store.columns
+        # Copied here, on the loop, so the thread never sees a half-applied change
+        facts = RowFacts(
+            _copy(columns.ids),
+            _copy(columns.user_ids),
+            _copy(columns.created),
+            _copy(columns.updated),
+            int(time.time() * 1_000_000),
+            self._system_user_id,
+        )
+        if not len(facts.ids):
+            self._built = None
+            return
+        started = time.perf_counter()
+        table = await asyncio.to_thread(_build_table, functions, facts)
+        WEIGHTED_SAMPLER_BUILD_SECONDS.observe(time.perf_counter() - started)
+        self._built = _Built(table, facts.ids, version, time.monotonic())
+
+    def _stale(self) -> bool:
+        built = self._built
+        return (
+            built is None
+            or built.version != self.store.version
+            or time.monotonic() - built.built_at >= self.max_age
+        )
+
+    def start(self) -> None:
+        """Check the configured weighting and start the background rebuild loop.
+
+        Raises:
+            ValueError: If ``weighting`` names an unregistered function
+        """
+        if not self.enabled:
+            return
+        self._functions()
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            if self.store.loaded and self._stale():
+                try:
+                    await self.rebuild()
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Alias table rebuild failed; keeping the previous table")
+            await asyncio.sleep(
+                STARTUP_POLL_SECONDS if self._built is None else self.rebuild_interval
+            )
+
+    def collect(self) -> List[Family]:
+        built = self._built
+        rows = Family("weighted_sampler_rows", "gauge", "Epigrams in the alias table")
+        rows.add(len(built.table) if built else 0)
+        age = Family("weighted_sampler_age_seconds", "gauge", "Age of the alias table")
+        age.add(time.monotonic() - built.built_at if built else 0)
+        return [rows, age]
+
+
+def _build_table(functions: Sequence[WeightFunction], facts: RowFacts) -> AliasTable:
+    weights = array("d", [1.0]) * len(facts.ids)
+    for function in functions:
+        for index, weight in enumerate(function(facts)):
+            weights[index] *= weight
+    return AliasTable(weights)
+
+
+weighted_sampler = WeightedSampler(corpus_store)
+REGISTRY.register_cache("weighted_sampler", weighted_sampler)
+REGISTRY.register_collector(weighted_sampler.collect)
@@ -0,0 +1,158 @@
+"""
+Pick Argon2 parameters that verify within a time budget on this machine.
+
+Run it where the API runs (same container image and CPU limits), since
+the answer depends on the CPU the workers actually get. Memory is tried
+from ``--max-memory-mib`` down, halving until the minimum number of passes
+fits the budget. At that memory the time cost is raised as far as the
+budget allows. The result goes to stdout as ``ARGON2_*`` lines, and with
+``--write`` into an env file. Hashes with other parameters are upgraded on
+each user's next login.
+
+Usage:
+    python -m app.cli.argon2_calibrate [--target-ms 100] [--max-memory-mib 64]
+        [--parallelism 1] [--write .env]
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from typing import Dict, NamedTuple
+
+from passlib.hash import argon2
+
+# OWASP's floor for Argon2id: 19 MiB, 2 passes, 1 lane
+MIN_MEMORY_KIB = 19 * 1024
+MIN_TIME_COST = 2
+
+CALIBRATION_PASSWORD = "calibration-Passw0rd!"
+
+
+class Parameters(NamedTuple):
+    memory_kib: int
+    time_cost: int
+    parallelism: int
+
+
+def measure(parameters: Parameters, samples: int) -> float:
+    """Median seconds to verify a password hashed with ``parameters``."""
+    hasher = argon2.using(
+        memory_cost=parameters.memory_kib,
+        rounds=parameters.time_cost,
+        parallelism=parameters.parallelism,
+    )
+    hashed = hasher.hash(CALIBRATION_PASSWORD)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        hasher.verify(CALIBRATION_PASSWORD, hashed)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings)
+
+
+def calibrate(
+    target: float, max_memory_kib: int, parallelism: int, samples: int
+) -> Parameters:
+    """Most memory, then most passes, whose median verify time is within ``target``."""
+    memory_kib = max_memory_kib
+    while True:
+        parameters = Parameters(memory_kib, MIN_TIME_COST, parallelism)
+        elapsed = measure(parameters, samples)
+        report(parameters, elapsed, target)
+        if elapsed <= target or memory_kib == MIN_MEMORY_KIB:
+            break
+        memory_kib = max(memory_kib // 2, MIN_MEMORY_KIB)
+    if elapsed > target:
+        print(
+            f"warning: even the minimum parameters take {elapsed * 1000:.0f} ms",
+            file=sys.stderr,
+        )
+        return parameters
+
+    # Cost is linear in passes, so estimate the count and step back if needed
+    per_pass = elapsed / MIN_TIME_COST
+    time_cost = max(MIN_TIME_COST, int(target / per_pass))
+    while time_cost > MIN_TIME_COST:
+        candidate = parameters._replace(time_cost=time_cost)
+        elapsed = measure(candidate, samples)
+        report(candidate, elapsed, target)
+        if elapsed <= target:
+            return candidate
+        time_cost -= 1
+    return parameters
+
+
+def report(parameters: Parameters, elapsed: float, target: float) -> None:
+    verdict = "ok" if elapsed <= target else "over"
+    print(
+        f"  m={parameters.memory_kib:>7} KiB  t={parameters.time_cost:<3} "
+        f"p={parameters.parallelism}  {elapsed * 1000:7.1f} ms  {verdict}",
+        file=sys.stderr,
+    )
+
+
+def as_env(parameters: Parameters) -> Dict[str, str]:
+    return {
+        "ARGON2_MEMORY_KIB": str(parameters.memory_kib),
+        "ARGON2_TIME_COST": str(parameters.time_cost),
+        "ARGON2_PARALLELISM": str(parameters.parallelism),
+    }
+
+
+def write_env(path: str, values: Dict[str, str]) -> None:
+    """Set ``values`` in an env file, replacing existing assignments in place."""
+    lines = []
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as handle:
+            lines = handle.read().splitlines()
+    remaining = dict(values)
+    for index, line in enumerate(lines):
+        key = line.split("=", 1)[0].strip()
+        if "=" in line and key in remaining:
+            lines[index] = f"{key}={remaining.pop(key)}"
+    lines.extend(f"{key}={value}" for key, value in remaining.items())
+    with open(path, "w", encoding="utf-8") as handle:
+        handle.write("\n".join(lines) + "\n")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Calibrate Argon2 parameters for this machine.")
+    parser.add_argument(
+        "--target-ms", type=float, default=100, help="Verify time budget per login (ms)"
+    )
+    parser.add_argument(
+        "--max-memory-mib", type=int, default=64, help="Memory per hash to start from (MiB)"
+    )
+    parser.add_argument(
+        "--parallelism",
+        type=int,
+        default=1,
+        help="Lanes per hash; more than the CPUs a worker gets only adds overhead",
+    )
+    parser.add_argument("--samples", type=int, default=5, help="Verifications per measurement")
+    parser.add_argument("--write", metavar="ENV_FILE", help="Write the result into this env file")
+    args = parser.parse_args()
+
+    cpus = len(os.sched_getaffinity(0)) if hasattr(os, "sched_getaffinity") else os.cpu_count()
+    print(
+        f"Calibrating for {args.target_ms:.0f} ms on {cpus} CPUs "
+        f"({argon2.get_backend()} backend)",
+        file=sys.stderr,
+    )
+    max_memory_kib = max(args.max_memory_mib * 1024, MIN_MEMORY_KIB)
+    parameters = calibrate(
+        args.target_ms / 1000, max_memory_kib, max(args.parallelism, 1), max(args.samples, 1)
+    )
+    values = as_env(parameters)
+    for key, value in values.items():
+        print(f"{key}={value}")
+    if args.write:
+        write_env(args.write, values)
+        print(f"Wrote {', '.join(values)} to {args.write}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,65 @@
+"""
+Export or inspect a binary corpus snapshot.
+
+Run ``export`` periodically (e.g. from cron or before rolling out new
+workers) to a path on the shared volume named by ``CORPUS_SNAPSHOT_PATH``;
+workers map it at startup and only catch up on what changed since.
+
+Usage:
+    python -m app.cli.corpus_snapshot export /var/lib/is-it/corpus.snapshot
+    python -m app.cli.corpus_snapshot info /var/lib/is-it/corpus.snapshot
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from datetime import datetime, timezone
+
+from app.cache.corpus import CorpusStore
+from app.cache.corpus_snapshot import FORMAT_VERSION, SnapshotError, read_snapshot, write_snapshot
+from app.db import async_engine
+
+
+async def export(path: str) -> int:
+    started = time.perf_counter()
+    store = CorpusStore()
+    try:
+        await store.load()
+    finally:
+        await async_engine.dispose()
+    size = write_snapshot(path, store.columns, store.watermark)
+    print(
+        f"Wrote {len(store)} epigrams ({size / 2**20:.1f} MB) to {path} "
+        f"in {time.perf_counter() - started:.1f}s"
+    )
+    return 0
+
+
+def info(path: str) -> int:
+    try:
+        columns, watermark = read_snapshot(path)
+    except SnapshotError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"format version  {FORMAT_VERSION}")
+    print(f"epigrams        {len(columns)}")
+    print(f"size            {columns.nbytes / 2**20:.1f} MB")
+    updated = datetime.fromtimestamp(watermark / 1_000_000, timezone.utc)
+    print(f"watermark       {updated.isoformat()}")
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Export or inspect a corpus snapshot.")
+    parser.add_argument("command", choices=("export", "info"))
+    parser.add_argument("path", help="Snapshot file")
+    args = parser.parse_args()
+
+    if args.command == "export":
+        return asyncio.run(export(args.path))
+    return info(args.path)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+"""
+Apply Alembic migrations only when the database is behind.
+
+Reading ``alembic_version`` and the script heads is cheap; importing the full
+migration environment (models, metadata, env.py) is not. Container starts
+that are already at head skip the latter entirely.
+
+``--lock-report`` applies nothing: it renders each pending revision as SQL
+(offline mode) and lists the lock every statement takes on which table,
+with the table's current size, so revisions that would block traffic on a
+large table are caught before they run.
+
+Usage:
+    python -m app.cli.migrate [--check | --lock-report]
+"""
+
+import argparse
+import io
+import re
+import sys
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from dotenv import load_dotenv
+from sqlalchemy import create_engine, pool, text
+
+from app.database_url import database_url_from_env
+from app.online_migrations import ONLINE_MARKER
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+ALEMBIC_INI = BACKEND_DIR / "alembic.ini"
+
+
+def pending_revisions(config: Config, database_url: str) -> bool:
+    """Return True if the database revision differs from the script heads."""
+    heads = set(ScriptDirectory.from_config(config).get_heads())
+    engine = create_engine(database_url, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            current = set(MigrationContext.configure(connection).get_current_heads())
+    finally:
+        engine.dispose()
+    return current != heads
+
+
+class LockImpact(NamedTuple):
+    """What one migration statement does to concurrent traffic."""
+
+    lock: str
+    # "none", "writes" or "reads and writes"
+    blocks: str
+    # Whether the lock is held for a scan or rewrite of the whole table
+    full_table: bool
+    note: str
+
+
+_TABLE = r"(?:ONLY\s+)?\"?(\w+)\"?"
+# (pattern, impact); first match wins, matched against the upper-cased statement
+LOCK_RULES: Tuple[Tuple[str, LockImpact], ...] = (
+    (
+        rf"^CREATE (?:UNIQUE )?INDEX CONCURRENTLY .*? ON {_TABLE}",
+        LockImpact("SHARE UPDATE EXCLUSIVE", "none", True, "concurrent build"),
+    ),
+    (
+        rf"^CREATE (?:UNIQUE )?INDEX .*? ON {_TABLE}",
+        LockImpact("SHARE", "writes", True, "index build"),
+    ),
+    (r"^DROP INDEX CONCURRENTLY", LockImpact("SHARE UPDATE EXCLUSIVE", "none", False, "")),
+    (r"^DROP INDEX", LockImpact("ACCESS EXCLUSIVE", "reads and writes", False, "brief")),
+    (
+        rf"^ALTER TABLE {_TABLE} VALIDATE CONSTRAINT",
+        LockImpact("SHARE UPDATE EXCLUSIVE", "none", True, "validation scan"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT .* FOREIGN KEY .* NOT VALID",
+        LockImpact("SHARE ROW EXCLUSIVE", "writes", False, "brief"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT .* NOT VALID",
+        LockImpact("ACCESS EXCLUSIVE", "reads and writes", False, "brief"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT .* FOREIGN KEY",
+        LockImpact("SHARE ROW EXCLUSIVE", "writes", True, "validates every row"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ADD CONSTRAINT",
+        LockImpact("ACCESS EXCLUSIVE", "reads and writes", True, "validates every row"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ALTER COLUMN \S+ (?:SET DATA )?TYPE",
+        LockImpact("ACCESS EXCLUSIVE", "reads and writes", True, "type change may rewrite"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ALTER COLUMN \S+ SET NOT NULL",
+        LockImpact("ACCESS EXCLUSIVE", "reads and writes", True, "scans for NULLs"),
+    ),
+    (
+        rf"^ALTER TABLE {_TABLE} ADD (?:COLUMN )?.*DEFAULT .*"
+        r"(?:RANDOM|CLOCK_TIMESTAMP|GEN_RANDOM_UUID|UUID_GENERATE|NEXTVAL)\(",
+        LockImpact("ACCESS EXCLUSIVE", "reads and writes", True, "volatile default rewrites"),
+    ),
+    (rf"^ALTER TABLE {_TABLE}", LockImpact("ACCESS EXCLUSIVE", "reads and writes", False, "brief")),
+    (rf"^DROP TABLE {_TABLE}", LockImpact("ACCESS EXCLUSIVE", "reads and writes", False, "brief")),
+    (
+        rf"^(?:UPDATE|DELETE FROM) {_TABLE}",
+        LockImpact("ROW EXCLUSIVE", "writes", True, "one transaction holds every matched row"),
+    ),
+    (rf"^INSERT INTO {_TABLE}", LockImpact("ROW EXCLUSIVE", "none", False, "")),
+)
+
+_CREATE_TABLE = re.compile(rf"^CREATE TABLE (?:IF NOT EXISTS )?{_TABLE}")
+
+# Statements with no effect on existing tables' traffic
+_IGNORED = re.compile(
+    r"^(?:BEGIN|COMMIT|CREATE TABLE|CREATE EXTENSION|CREATE SEQUENCE|COMMENT ON)\b"
+    r"|ALEMBIC_VERSION"
+)
+
+
+def classify(statement: str) -> Optional[Tuple[LockImpact, Optional[str]]]:
+    """Lock impact and table of one statement, or None if it does not matter."""
+    normalized = " ".join(statement.split()).upper()
+    if _IGNORED.search(normalized):
+        return None
+    for pattern, impact in LOCK_RULES:
+        match = re.search(pattern, normalized)
+        if match:
+            table = match.group(1).lower() if match.groups() else None
+            return impact, table
+    return LockImpact("unknown", "unknown", False, "review by hand"), None
+
+
+def split_statements(sql: str) -> List[str]:
+    """Statements and comments of an offline migration script, in order."""
+    statements, current = [], []
+    for line in sql.splitlines():
+        if not current and (not line.strip() or line.startswith("-- Running upgrade")):
+            continue
+        current.append(line)
+        if line.rstrip().endswith(";"):
+            statements.append("\n".join(current).strip().rstrip(";").strip())
+            current = []
+    return statements
+
+
+def table_sizes(database_url: str) -> Dict[str, Tuple[int, int]]:
+    """Estimated (rows, bytes) per table, from the planner statistics."""
+    engine = create_engine(database_url, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            if connection.dialect.name != "postgresql":
+                return {}
+            result = connection.execute(
+                text(
+                    "SELECT relname, greatest(reltuples, 0)::bigint, pg_total_relation_size(oid) "
+                    "FROM pg_class WHERE relkind = 'r' "
+                    "AND relnamespace = 'public'::regnamespace"
+                )
+            )
+            return {name: (rows, size) for name, rows, size in result}
+    finally:
+        engine.dispose()
+
+
+def _size(sizes: Dict[str, Tuple[int, int]], table: Optional[str]) -> str:
+    if table not in sizes:
+        return ""
+    rows, size = sizes[table]
+    return f"~{rows:,} rows, {size / 2**20:,.0f} MB"
+
+
+def report_revision(sql: str, sizes: Dict[str, Tuple[int, int]]) -> List[str]:
+    """Report lines for one rendered revision, worst impact last."""
+    lines = []
+    worst = None
+    batched = False
+    validated = set()
+    # Tables created by this revision are empty and unused while it runs
+    created = set()
+    for statement in split_statements(sql):
+        new_table = _CREATE_TABLE.match(" ".join(statement.split()).upper())
+        if new_table:
+            created.add(new_table.group(1).lower())
+        if statement.startswith(ONLINE_MARKER):
+            batched = True
+            lines.append(f"    {'ROW EXCLUSIVE':<22} {statement[len(ONLINE_MARKER):].strip()}")
+            lines.append(f"    {'':<22}   short transactions")
+            continue
+        classified = classify(statement)
+        if classified is None:
+            continue
+        impact, table = classified
+        if table in created:
+            continue
+        if batched and impact.lock == "ROW EXCLUSIVE":
+            # Rendered as one statement, runs as short key-range batches
+            impact = impact._replace(blocks="none", full_table=False, note="batched")
+        if "VALIDATE CONSTRAINT" in statement.upper() and table:
+            validated.add(table)
+        if "SET NOT NULL" in statement.upper() and table in validated:
+            impact = impact._replace(full_table=False, note="brief, uses validated check")
+        batched = False
+        summary = " ".join(statement.split())
+        if len(summary) > 72:
+            summary = summary[:69] + "..."
+        details = "; ".join(part for part in (impact.note, _size(sizes, table)) if part)
+        lines.append(f"    {impact.lock:<22} {summary}")
+        if details:
+            lines.append(f"    {'':<22}   {details}")
+        if impact.blocks != "none" and impact.full_table:
+            rows = sizes.get(table, (0, 0))[0]
+            if worst is None or rows > worst[0]:
+                worst = (rows, f"blocks {impact.blocks} on {table} for a full-table operation")
+    lines.append(f"    => {worst[1] if worst else 'no long blocking locks'}")
+    return lines
+
+
+def lock_report(config: Config, database_url: str) -> int:
+    """Print the lock impact of each pending revision; apply nothing."""
+    engine = create_engine(database_url, poolclass=pool.NullPool)
+    try:
+        with engine.connect() as connection:
+            current = MigrationContext.configure(connection).get_current_heads()
+    finally:
+        engine.dispose()
+    script = ScriptDirectory.from_config(config)
+    lower = current[0] if current else "base"
+    pending = list(reversed(list(script.iterate_revisions("heads", lower))))
+    if not pending:
+        print("Database is at head, nothing pending")
+        return 0
+    sizes = table_sizes(database_url)
+
+    for revision in pending:
+        down = revision.down_revision or "base"
+        print(f"{down} -> {revision.revision}  {revision.doc}")
+        buffer = io.StringIO()
+        try:
+            command.upgrade(
+                Config(str(ALEMBIC_INI), output_buffer=buffer),
+                f"{down}:{revision.revision}",
+                sql=True,
+            )
+        except Exception as e:  # pylint: disable=broad-except
+            print(f"    cannot render offline ({type(e).__name__}: {e}); review by hand")
+            continue
+        print("\n".join(report_revision(buffer.getvalue(), sizes)))
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Upgrade the database to head if needed.")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument(
+        "--check", action="store_true", help="Exit 1 if migrations are pending, do not apply"
+    )
+    modes.add_argument(
+        "--lock-report",
+        action="store_true",
+        help="Print the locks each pending revision would take, do not apply",
+    )
+    args = parser.parse_args()
+
+    load_dotenv()
+    database_url = database_url_from_env()
+    if not database_url:
+        print("DATABASE_URL is not set", file=sys.stderr)
+        return 2
+
+    config = Config(str(ALEMBIC_INI))
+    if args.lock_report:
+        return lock_report(config, database_url)
+    if not pending_revisions(config, database_url):
+        print("Database is at head, skipping migrations")
+        return 0
+    if args.check:
+        print("Migrations are pending")
+        return 1
+
+    command.upgrade(config, "head")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
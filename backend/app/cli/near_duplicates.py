@@ -0,0 +1,213 @@
+"""
+Report clusters of duplicate and near-duplicate epigrams already stored.
+
+Writes are checked as they happen (see ``EpigramService.find_duplicate``);
+this finds what predates the checks or slipped past them. Two epigrams are
+linked when their text and author normalize alike (``app.fingerprint``) or,
+on Postgres, when their texts are trigram neighbours at or above the
+similarity threshold with the same normalized author. Linked epigrams are
+reported as clusters, largest first. Nothing is modified.
+
+Neighbours come from the trigram GiST index, ``--neighbours`` per epigram,
+scanned in ID batches, so the run is linear in the table size.
+
+Usage:
+    python -m app.cli.near_duplicates [--threshold 0.8] [--neighbours 5] [--json]
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Tuple
+
+from sqlalchemy import func, true
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from sqlmodel import select
+
+from app.db import async_engine
+from app.fingerprint import NEAR_DUPLICATE_SIMILARITY, fingerprint
+from app.models.epigram import Epigram
+
+BATCH_ROWS = 1000
+
+
+class Clusters:
+    """Union-find over epigram IDs."""
+
+    def __init__(self) -> None:
+        self._parent: Dict[int, int] = {}
+
+    def _root(self, epigram_id: int) -> int:
+        parent = self._parent
+        parent.setdefault(epigram_id, epigram_id)
+        root = epigram_id
+        while parent[root] != root:
+            root = parent[root]
+        # Path compression
+        while parent[epigram_id] != root:
+            parent[epigram_id], epigram_id = root, parent[epigram_id]
+        return root
+
+    def link(self, first: int, second: int) -> None:
+        first_root, second_root = self._root(first), self._root(second)
+        if first_root != second_root:
+            # Lowest ID as root, so the oldest epigram leads its cluster
+            low, high = sorted((first_root, second_root))
+            self._parent[high] = low
+
+    def groups(self) -> List[List[int]]:
+        members = defaultdict(list)
+        for epigram_id in self._parent:
+            members[self._root(epigram_id)].append(epigram_id)
+        return sorted(
+            (sorted(group) for group in members.values() if len(group) > 1),
+            key=lambda group: (-len(group), group[0]),
+        )
+
+
+async def link_fingerprints(session: AsyncSession, clusters: Clusters) -> Tuple[int, int]:
+    """Link epigrams sharing a fingerprint.
+
+    Returns:
+        Tuple of (epigrams scanned, stored fingerprints missing or out of date)
+    """
+    first_with: Dict[str, int] = {}
+    scanned = stale = 0
+    result = await session.stream(
+        select(Epigram.id, Epigram.text, Epigram.author, Epigram.fingerprint)
+        .order_by(Epigram.id)
+        .execution_options(yield_per=BATCH_ROWS * 10)
+    )
+    async for batch in result.partitions():
+        for epigram_id, text, author, stored in batch:
+            scanned += 1
+            value = fingerprint(text, author)
+            if stored != value:
+                stale += 1
+            if value in first_with:
+                clusters.link(first_with[value], epigram_id)
+            else:
+                first_with[value] = epigram_id
+    return scanned, stale
+
+
+async def link_similar(
+    session: AsyncSession, clusters: Clusters, threshold: float, neighbours: int
+) -> int:
+    """Link each epigram to its nearest trigram neighbours by the same author.
+
+    Returns:
+        Number of similar pairs found
+    """
+    other = aliased(Epigram)
+    nearest = (
+        select(other.id, other.text)
+        .where(other.id != Epigram.id, other.author_key == Epigram.author_key)
+        .order_by(other.text.op("<->")(Epigram.text))
+        .limit(neighbours)
+        .lateral("nearest")
+    )
+    similarity = func.similarity(Epigram.text, nearest.c.text)
+    pairs = 0
+    after = 0
+    while True:
+        upto = (
+            await session.execute(
+                select(Epigram.id)
+                .where(Epigram.id > after)
+                .order_by(Epigram.id)
+                .offset(BATCH_ROWS - 1)
+                .limit(1)
+            )
+        ).scalar_one_or_none()
+        stmt = (
+            select(Epigram.id, nearest.c.id)
+            .join(nearest, true())
+            .where(Epigram.id > after, similarity >= threshold)
+        )
+        if upto is not None:
+            stmt = stmt.where(Epigram.id <= upto)
+        for epigram_id, neighbour_id in await session.execute(stmt):
+            pairs += 1
+            clusters.link(epigram_id, neighbour_id)
+        if upto is None:
+            return pairs
+        after = upto
+
+
+async def describe(session: AsyncSession, groups: List[List[int]]) -> List[List[dict]]:
+    """Text and author of each clustered epigram."""
+    ids = [epigram_id for group in groups for epigram_id in group]
+    found = {}
+    for start in range(0, len(ids), BATCH_ROWS):
+        result = await session.execute(
+            select(Epigram.id, Epigram.text, Epigram.author, Epigram.user_id).where(
+                Epigram.id.in_(ids[start : start + BATCH_ROWS])
+            )
+        )
+        for epigram_id, text, author, user_id in result:
+            found[epigram_id] = {
+                "id": epigram_id,
+                "text": text,
+                "author": author,
+                "user_id": user_id,
+            }
+    return [[found[epigram_id] for epigram_id in group] for group in groups]
+
+
+def print_report(clusters: Iterable[List[dict]]) -> None:
+    for number, cluster in enumerate(clusters, 1):
+        print(f"cluster {number}: {len(cluster)} epigrams")
+        for epigram in cluster:
+            author = f" ({epigram['author']})" if epigram["author"] else ""
+            print(f"  {epigram['id']:>10}  user {epigram['user_id']:<8} {epigram['text']}{author}")
+
+
+async def report(threshold: float, neighbours: int, as_json: bool) -> int:
+    started = time.perf_counter()
+    clusters = Clusters()
+    try:
+        async with AsyncSession(async_engine) as session:
+            scanned, stale = await link_fingerprints(session, clusters)
+            pairs = 0
+            if threshold > 0 and session.get_bind().dialect.name == "postgresql":
+                pairs = await link_similar(session, clusters, threshold, neighbours)
+            described = await describe(session, clusters.groups())
+    finally:
+        await async_engine.dispose()
+
+    if as_json:
+        print(json.dumps({"clusters": described, "scanned": scanned, "stale": stale}))
+    else:
+        print_report(described)
+        print(
+            f"{len(described)} clusters over {scanned} epigrams "
+            f"({pairs} similar pairs, {stale} missing or outdated fingerprints) "
+            f"in {time.perf_counter() - started:.1f}s",
+            file=sys.stderr,
+        )
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Report duplicate and near-duplicate epigrams.")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=NEAR_DUPLICATE_SIMILARITY,
+        help="Trigram similarity for near-duplicates (0 for fingerprint matches only)",
+    )
+    parser.add_argument(
+        "--neighbours", type=int, default=5, help="Nearest texts compared per epigram"
+    )
+    parser.add_argument("--json", action="store_true", help="Print the clusters as JSON")
+    args = parser.parse_args()
+    return asyncio.run(report(args.threshold, args.neighbours, args.json))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+"""
+Mint a signed ``X-Profile`` header value for profiling one endpoint.
+
+Usage:
+    python -m app.cli.profile_token /api/epigrams/mine [--ttl 300]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+from dotenv import load_dotenv
+
+from app.middleware.profiling import MAX_TOKEN_TTL_SECONDS, sign_profile_token
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Create a signed profiling header value.")
+    parser.add_argument("path", help="Request path, e.g. /api/epigrams/mine")
+    parser.add_argument("--ttl", type=int, default=300, help="Seconds the token stays valid")
+    args = parser.parse_args()
+
+    load_dotenv()
+    secret = os.getenv("PROFILE_SECRET")
+    if not secret:
+        print("PROFILE_SECRET is not set", file=sys.stderr)
+        return 2
+    if not 0 < args.ttl <= MAX_TOKEN_TTL_SECONDS:
+        print(f"--ttl must be between 1 and {MAX_TOKEN_TTL_SECONDS}", file=sys.stderr)
+        return 2
+
+    token = sign_profile_token(secret, args.path, int(time.time()) + args.ttl)
+    print(f"X-Profile: {token}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
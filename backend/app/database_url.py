@@ -0,0 +1,36 @@
+"""
+DATABASE_URL as read by the app, Alembic and the CLIs.
+
+Kept free of heavy imports so ``app.cli.migrate`` can use it without
+loading the engine or the models.
+"""
+
+import os
+import re
+from typing import Optional
+
+_PLACEHOLDER = re.compile(r"\${([^}]+)}")
+
+
+def resolve_env_vars(template_string: Optional[str]) -> Optional[str]:
+    """Replace ``${VAR}`` placeholders with environment variable values.
+
+    Unset variables resolve to an empty string.
+    """
+    if not template_string:
+        return template_string
+    return _PLACEHOLDER.sub(lambda match: os.getenv(match.group(1), ""), template_string)
+
+
+def database_url_from_env() -> Optional[str]:
+    """DATABASE_URL with common deployment mistakes fixed, or None if unset.
+
+    A value that repeats its own ``DATABASE_URL=`` prefix (as some env-file
+    tooling produces) is stripped, and ``${VAR}`` placeholders are resolved.
+    """
+    raw_url = os.getenv("DATABASE_URL")
+    if not raw_url:
+        return None
+    if raw_url.startswith("DATABASE_URL="):
+        raw_url = raw_url.replace("DATABASE_URL=", "", 1)
+    return resolve_env_vars(raw_url)
@@ -1,13 +1,17 @@
 """Database configuration and session management."""
 
+import asyncio
 import os
 from typing import AsyncIterator
 
 from dotenv import load_dotenv
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
+from app.database_url import database_url_from_env
+from app.metrics import REGISTRY, Family
+
 load_dotenv()
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = database_url_from_env()
 if not DATABASE_URL:
     raise RuntimeError(
         "DATABASE_URL is not set. Create a .env file with DATABASE_URL=<url>"
@@ -23,16 +27,50 @@ elif DATABASE_URL.startswith("postgresql+psycopg://"):
 else:
     ASYNC_DATABASE_URL = DATABASE_URL
 
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Connections opened eagerly at startup so first requests skip the connect cost
+DB_POOL_MIN = min(int(os.getenv("DB_POOL_MIN", str(DB_POOL_SIZE))), DB_POOL_SIZE)
+
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     echo=False,
     pool_pre_ping=True,
-    pool_size=5,
-    max_overflow=10,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
     future=True,
 )
 
 
+def _collect_pool_metrics():
+    """Connection pool gauges read at scrape time."""
+    pool = async_engine.pool
+    for name, reader, documentation in (
+        ("db_pool_size", "size", "Configured pool size"),
+        ("db_pool_checked_out", "checkedout", "Connections currently checked out"),
+        ("db_pool_checked_in", "checkedin", "Idle connections in the pool"),
+        ("db_pool_overflow", "overflow", "Connections opened beyond pool_size"),
+    ):
+        method = getattr(pool, reader, None)
+        if method is not None:
+            family = Family(name, "gauge", documentation)
+            family.add(method())
+            yield family
+
+
+REGISTRY.register_collector(_collect_pool_metrics)
+
+
+async def warm_pool(connections: int = DB_POOL_MIN) -> None:
+    """Open connections concurrently and return them to the pool."""
+
+    async def _open_one() -> None:
+        async with async_engine.connect() as conn:
+            await conn.exec_driver_sql("SELECT 1")
+
+    await asyncio.gather(*(_open_one() for _ in range(connections)))
+
+
 async def get_async_session() -> AsyncIterator[AsyncSession]:
     """FastAPI dependency for async session."""
     session = AsyncSession(async_engine, expire_on_commit=False)
@@ -8,24 +8,18 @@ and user authentication in protected API endpoints using HTTP-only cookies.
 from typing import Optional
 
 from fastapi import Depends, HTTPException, status, Request
-from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db import get_async_session
 from app.models.user import User
 from app.services.auth import verify_token
 from app.services.user import UserService
 
 
-async def get_current_user(
-    request: Request,
-    db: AsyncSession = Depends(get_async_session),
-) -> User:
+async def get_current_user(request: Request) -> User:
     """
     Dependency to get the current authenticated user from HTTP-only cookie.
 
     Args:
         request: FastAPI request object to access cookies
-        db: Async database session
 
     Returns:
         User: The authenticated user object
@@ -49,8 +43,8 @@ async def get_current_user(
     if username is None:
         raise credentials_exception
 
-    # Get user from database
-    user = await UserService.get_user_by_username(db, username)
+    # Get user from database, sharing the query with concurrent requests
+    user = await UserService.get_user_by_username_coalesced(username)
     if user is None:
         raise credentials_exception
 
@@ -83,16 +77,12 @@ async def get_current_active_user(current_user: User = Depends(get_current_user)
     return current_user
 
 
-async def get_optional_current_user(
-    request: Request,
-    db: AsyncSession = Depends(get_async_session),
-) -> Optional[User]:
+async def get_optional_current_user(request: Request) -> Optional[User]:
     """
     Dependency to optionally get the current user from HTTP-only cookie.
 
     Args:
         request: FastAPI request object to access cookies
-        db: Async database session
 
     Returns:
         Optional[User]: The authenticated user object or None if not authenticated
@@ -107,8 +97,8 @@ async def get_optional_current_user(
     if username is None:
         return None
 
-    # Get user from database
-    user = await UserService.get_user_by_username(db, username)
+    # Get user from database, sharing the query with concurrent requests
+    user = await UserService.get_user_by_username_coalesced(username)
     if user is None or not user.is_active:
         return None
 
@@ -0,0 +1,51 @@
+"""
+Normalized fingerprints of epigrams, for duplicate detection.
+
+Two submissions that differ only in case, accents, whitespace, quotes or
+punctuation normalize to the same string, and so share a fingerprint.
+Epigrams store the fingerprint of their text and author under a unique
+index, so an exact-after-normalization duplicate is one index probe.
+Looser near-duplicates are found by trigram similarity on Postgres (see
+``EpigramService.find_duplicate``) among epigrams with the same author key,
+a stored hash of the normalized author.
+"""
+
+import hashlib
+import os
+import unicodedata
+from typing import Optional
+
+# Trigram similarity (0-1) from which a submission counts as a near-duplicate
+# of an existing epigram by the same author; 0 turns the check off
+NEAR_DUPLICATE_SIMILARITY = float(os.getenv("NEAR_DUPLICATE_SIMILARITY", "0.8"))
+
+
+def normalize(value: Optional[str]) -> str:
+    """Lowercase, unaccented, alphanumeric words separated by single spaces.
+
+    Quotes, apostrophes and other punctuation are dropped; dashes and
+    whitespace separate words.
+    """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value.casefold())
+    characters = []
+    for character in decomposed:
+        category = unicodedata.category(character)
+        if character.isalnum():
+            characters.append(character)
+        elif category == "Pd" or category[0] == "Z" or character.isspace():
+            characters.append(" ")
+        # Combining marks, quotes and other punctuation or symbols are dropped
+    return " ".join("".join(characters).split())
+
+
+def fingerprint(text: str, author: Optional[str]) -> str:
+    """32 hex characters identifying the normalized text and author."""
+    key = f"{normalize(text)}\x1f{normalize(author)}"
+    return hashlib.blake2b(key.encode(), digest_size=16).hexdigest()
+
+
+def author_key(author: Optional[str]) -> str:
+    """16 hex characters identifying the normalized author."""
+    return hashlib.blake2b(normalize(author).encode(), digest_size=8).hexdigest()
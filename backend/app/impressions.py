@@ -0,0 +1,222 @@
+"""
+Write-behind impression counters for displayed epigrams.
+
+Every ``/random/batch`` response counts one impression per epigram it
+returns. Counting happens in memory, per worker; a background loop flushes
+the buffered increments every ``IMPRESSION_FLUSH_SECONDS`` as one batched
+upsert into ``epigram_impressions`` (``impressions = impressions + n``), so a
+busy minute costs a handful of statements rather than a write per response.
+Workers add to the same rows, so nothing needs coordinating between them.
+
+Loss bounds, both configurable:
+
+* a worker that dies without shutting down loses at most one flush interval
+  of its counts; a normal shutdown flushes what is buffered;
+* at most ``IMPRESSION_MAX_PENDING`` distinct epigrams are buffered. Reaching
+  it triggers an early flush; while the database is unreachable, counts for
+  epigrams not already buffered are dropped (``impressions_dropped_total``)
+  instead of growing the buffer.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db import async_engine
+from app.metrics import REGISTRY, Family
+from app.models.epigram import EpigramImpressions
+
+logger = logging.getLogger(__name__)
+
+IMPRESSIONS_ENABLED = os.getenv("IMPRESSIONS_ENABLED", "true").lower() == "true"
+IMPRESSION_FLUSH_SECONDS = float(os.getenv("IMPRESSION_FLUSH_SECONDS", "10"))
+IMPRESSION_MAX_PENDING = int(os.getenv("IMPRESSION_MAX_PENDING", "50000"))
+
+# Rows per upsert statement, well under the driver's bind parameter limit
+FLUSH_CHUNK_SIZE = 1000
+
+IMPRESSIONS_RECORDED = REGISTRY.counter(
+    "impressions_recorded", "Epigram impressions counted in memory"
+)
+IMPRESSIONS_FLUSHED = REGISTRY.counter(
+    "impressions_flushed", "Epigram impressions written to the database"
+)
+IMPRESSIONS_DROPPED = REGISTRY.counter(
+    "impressions_dropped", "Epigram impressions dropped because the buffer was full"
+)
+IMPRESSION_FLUSHES = REGISTRY.counter(
+    "impression_flushes", "Impression counter flushes by outcome", ("result",)
+)
+IMPRESSION_FLUSH_DURATION = REGISTRY.histogram(
+    "impression_flush_duration_seconds", "Impression counter flush duration"
+)
+
+
+class ImpressionCounter:
+    """Per-worker buffer of impression increments with a periodic flush.
+
+    Args:
+        flush_interval: Seconds between flushes
+        max_pending: Distinct epigrams buffered before counts are dropped
+        enabled: Whether ``record`` counts anything
+    """
+
+    def __init__(
+        self,
+        flush_interval: float = IMPRESSION_FLUSH_SECONDS,
+        max_pending: int = IMPRESSION_MAX_PENDING,
+        enabled: bool = IMPRESSIONS_ENABLED,
+    ) -> None:
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._pending: Dict[int, int] = {}
+        self._wake = asyncio.Event()
+        self._lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def record(self, epigram_ids: Iterable[int]) -> None:
+        """Count one impression for each ID; never touches the database."""
+        if not self.enabled:
+            return
+        pending = self._pending
+        recorded = dropped = 0
+        for epigram_id in epigram_ids:
+            if epigram_id in pending:
+                pending[epigram_id] += 1
+            elif len(pending) < self.max_pending:
+                pending[epigram_id] = 1
+            else:
+                dropped += 1
+                continue
+            recorded += 1
+        IMPRESSIONS_RECORDED.inc(recorded)
+        if dropped:
+            IMPRESSIONS_DROPPED.inc(dropped)
+        if len(pending) >= self.max_pending:
+            self._wake.set()
+
+    async def flush(self) -> int:
+        """Write the buffered increments and clear them.
+
+        On failure the increments go back into the buffer, within
+        ``max_pending``, for the next flush.
+
+        Returns:
+            Number of impressions written
+        """
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            started = time.perf_counter()
+            try:
+                await self._write(batch)
+            except Exception:
+                IMPRESSION_FLUSHES.labels("failed").inc()
+                self._restore(batch)
+                raise
+            finally:
+                IMPRESSION_FLUSH_DURATION.observe(time.perf_counter() - started)
+            IMPRESSION_FLUSHES.labels("succeeded").inc()
+            written = sum(batch.values())
+            IMPRESSIONS_FLUSHED.inc(written)
+            return written
+
+    async def _write(self, batch: Dict[int, int]) -> None:
+        now = datetime.now(timezone.utc)
+        # Ascending ID order, so concurrent flushes from other workers lock
+        # rows in the same order and cannot deadlock
+        items = sorted(batch.items())
+        async with AsyncSession(async_engine) as session:
+            insert = (
+                pg_insert
+                if session.get_bind().dialect.name == "postgresql"
+                else sqlite_insert
+            )
+            for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+                stmt = insert(EpigramImpressions).values(
+                    [
+                        {"epigram_id": epigram_id, "impressions": count, "last_shown_at": now}
+                        for epigram_id, count in items[start : start + FLUSH_CHUNK_SIZE]
+                    ]
+                )
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=[EpigramImpressions.epigram_id],
+                    set_={
+                        "impressions": EpigramImpressions.impressions
+                        + stmt.excluded.impressions,
+                        "last_shown_at": stmt.excluded.last_shown_at,
+                    },
+                )
+                await session.execute(stmt)
+            await session.commit()
+
+    def _restore(self, batch: Dict[int, int]) -> None:
+        """Merge a failed batch back in, dropping what does not fit."""
+        pending = self._pending
+        dropped = 0
+        for epigram_id, count in batch.items():
+            if epigram_id in pending:
+                pending[epigram_id] += count
+            elif len(pending) < self.max_pending:
+                pending[epigram_id] = count
+            else:
+                dropped += count
+        if dropped:
+            IMPRESSIONS_DROPPED.inc(dropped)
+            logger.warning("Impression buffer full, dropped %d impressions", dropped)
+
+    def start(self) -> None:
+        """Start the background flush loop."""
+        if self.enabled and (self._task is None or self._task.done()):
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the flush loop and write what is still buffered."""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Final impression flush failed, %d epigrams lost", len(self))
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Impression flush failed; retrying next interval")
+                # A full buffer wakes the loop straight away; do not spin on it
+                await asyncio.sleep(self.flush_interval)
+
+    def collect(self) -> List[Family]:
+        pending = Family(
+            "impressions_pending_epigrams", "gauge", "Epigrams with unflushed impressions"
+        )
+        pending.add(len(self._pending))
+        return [pending]
+
+
+impressions = ImpressionCounter()
+REGISTRY.register_collector(impressions.collect)
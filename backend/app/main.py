@@ -1,19 +1,111 @@
 """FastAPI application factory and configuration."""
 
+import asyncio
+import logging
 import os
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from app.routers import epigram as epigram_router
 from app.routers import auth as auth_router
 from app.routers import user_settings as user_settings_router
-from app.db import async_engine
+from app.cache.approved_ids import approved_ids
+from app.cache.corpus import CORPUS_STORE_ENABLED, corpus_store
+from app.cache.corpus_snapshot import CORPUS_SNAPSHOT_PATH, start_from_snapshot
+from app.cache.invalidation import invalidation_bus
+from app.cache.weighted_sampling import weighted_sampler
+from app.db import DB_MAX_OVERFLOW, DB_POOL_SIZE, async_engine, warm_pool
+from app.impressions import impressions
+from app.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REGISTRY, multiprocess_writer
+from app.post_commit import task_runner
+from app.middleware import (
+    CompressionMiddleware,
+    ConcurrencyLimitMiddleware,
+    MetricsMiddleware,
+    ProfilingMiddleware,
+    QueryStatsMiddleware,
+    compression_stats,
+)
+from app.responses import FastJSONResponse
+from app.services.epigram import EpigramService
+from app.services.refresh_token import RefreshTokenService
+
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+TOMBSTONE_COMPACT_SECONDS = 3600
+
+
+async def warm_up(app: FastAPI) -> None:
+    """Open the minimum pool connections and preload hot caches, then mark ready."""
+    delay = 0.5
+    while True:
+        try:
+            await warm_pool()
+            await approved_ids.load()
+            if CORPUS_STORE_ENABLED:
+                if not (
+                    CORPUS_SNAPSHOT_PATH
+                    and await start_from_snapshot(corpus_store, CORPUS_SNAPSHOT_PATH)
+                ):
+                    await corpus_store.load()
+                corpus_store.start()
+            break
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Warm-up failed, retrying in %.1fs", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30.0)
+    app.state.ready = True
+
+
+async def compact_tombstones_periodically() -> None:
+    """Drop tombstones past the sync retention window and expired refresh tokens, hourly."""
+    while True:
+        await asyncio.sleep(TOMBSTONE_COMPACT_SECONDS)
+        try:
+            async with AsyncSession(async_engine) as session:
+                removed = await EpigramService(session).compact_tombstones()
+            if removed:
+                logger.info("Compacted %d epigram tombstones", removed)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Tombstone compaction failed")
+        try:
+            async with AsyncSession(async_engine) as session:
+                purged = await RefreshTokenService.purge_expired(session)
+            if purged:
+                logger.info("Purged %d expired refresh tokens", purged)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Refresh token purge failed")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Manage application lifespan."""
+    app.state.ready = False
+    await invalidation_bus.start()
+    await multiprocess_writer.start()
+    task_runner.start()
+    impressions.start()
+    if CORPUS_STORE_ENABLED:
+        weighted_sampler.start()
+    # Warm up in the background so /health answers while /ready reports progress
+    warm_up_task = asyncio.create_task(warm_up(app))
+    compaction_task = asyncio.create_task(compact_tombstones_periodically())
     yield
+    warm_up_task.cancel()
+    compaction_task.cancel()
+    # Side effects of committed writes still need the database and the bus
+    await task_runner.stop()
+    await impressions.stop()
+    await weighted_sampler.stop()
+    await corpus_store.stop()
+    await multiprocess_writer.stop()
+    await invalidation_bus.stop()
     await async_engine.dispose()
 
 
@@ -23,6 +115,7 @@ def create_app() -> FastAPI:
         title="Is It", 
         docs_url="/docs", 
         openapi_url="/openapi.json",
+        default_response_class=FastJSONResponse,
         lifespan=lifespan
     )
 
@@ -36,12 +129,61 @@ def create_app() -> FastAPI:
         allow_methods=["GET", "POST", "DELETE", "PUT"],
         allow_headers=["*"],
     )
+    application.add_middleware(
+        CompressionMiddleware,
+        minimum_size=int(os.getenv("COMPRESSION_MIN_SIZE", "1024")),
+        gzip_level=int(os.getenv("COMPRESSION_GZIP_LEVEL", "6")),
+        brotli_quality=int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4")),
+    )
+    application.add_middleware(
+        QueryStatsMiddleware,
+        expose_headers=os.getenv("SQL_STATS_HEADERS", "false").lower() == "true",
+    )
+    profile_dir = os.getenv("PROFILE_DIR")
+    if profile_dir:
+        application.add_middleware(
+            ProfilingMiddleware,
+            directory=profile_dir,
+            secret=os.getenv("PROFILE_SECRET") or None,
+            sample_rate=float(os.getenv("PROFILE_SAMPLE_RATE", "0")),
+            interval=float(os.getenv("PROFILE_INTERVAL_MS", "1")) / 1000,
+        )
+    # Defaults to the pool's capacity so requests queue here, not inside the pool
+    concurrency_limit = int(os.getenv("CONCURRENCY_LIMIT", str(DB_POOL_SIZE + DB_MAX_OVERFLOW)))
+    if concurrency_limit > 0:
+        application.add_middleware(
+            ConcurrencyLimitMiddleware,
+            limit=concurrency_limit,
+            queue_size=int(os.getenv("CONCURRENCY_QUEUE_SIZE", str(concurrency_limit * 2))),
+            max_wait=float(os.getenv("CONCURRENCY_MAX_WAIT_MS", "1000")) / 1000,
+        )
+    # Outermost, so recorded latency includes compression and CORS handling
+    application.add_middleware(MetricsMiddleware)
 
     @application.get("/health")
     async def health_check():
         """Health check endpoint."""
         return {"status": "healthy"}
 
+    @application.get("/ready")
+    async def readiness_check(request: Request):
+        """Readiness endpoint, not ready until startup warm-up has completed."""
+        if not getattr(request.app.state, "ready", False):
+            return FastJSONResponse(
+                {"status": "starting"}, status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            )
+        return {"status": "ready"}
+
+    @application.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        """Prometheus metrics, aggregated across workers when multi-process."""
+        return PlainTextResponse(REGISTRY.render(), media_type=METRICS_CONTENT_TYPE)
+
+    @application.get("/stats/compression")
+    async def compression_report():
+        """Per-route compression ratio and CPU time, for tuning the size threshold."""
+        return {"routes": compression_stats.snapshot()}
+
     api_router.include_router(epigram_router.router)
     api_router.include_router(auth_router.router)
     api_router.include_router(user_settings_router.router)
@@ -0,0 +1,391 @@
+"""
+Minimal Prometheus-format metrics.
+
+Metric children are created once per label combination and then updated with
+plain integer/float arithmetic. Everything runs on the event loop thread, so
+no locks are needed and recording a sample allocates nothing.
+
+With ``METRICS_MULTIPROC_DIR`` set, each worker periodically writes its
+samples to ``<dir>/<pid>.json`` and ``/metrics`` sums counters and histograms
+across all files. Gauges are reported per worker with a ``pid`` label.
+"""
+
+import asyncio
+import logging
+import math
+import os
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import orjson
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+MULTIPROC_DIR = os.getenv("METRICS_MULTIPROC_DIR")
+WRITE_INTERVAL_SECONDS = float(os.getenv("METRICS_WRITE_INTERVAL_SECONDS", "5"))
+
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1.0, 2.5, 5.0, 10.0
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+# (sample name, labels, value)
+Sample = Tuple[str, Labels, float]
+
+
+class Family:
+    """A metric family ready for exposition."""
+
+    __slots__ = ("name", "type", "documentation", "samples")
+
+    def __init__(self, name: str, metric_type: str, documentation: str) -> None:
+        self.name = name
+        self.type = metric_type
+        self.documentation = documentation
+        self.samples: List[Sample] = []
+
+    def add(self, value: float, labels: Labels = (), suffix: str = "") -> None:
+        """Append a sample."""
+        self.samples.append((self.name + suffix, labels, value))
+
+
+class _CounterChild:
+    __slots__ = ("value",)
+
+    def __init__(self) -> None:
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+
+class _HistogramChild:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Sequence[float]) -> None:
+        self.upper_bounds = upper_bounds
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class _Metric:
+    """Shared label handling; children are cached per label values."""
+
+    metric_type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values) -> object:
+        """Return the child for the given label values, creating it on first use."""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self) -> object:
+        raise NotImplementedError
+
+    def _label_pairs(self, key: Tuple[str, ...]) -> Labels:
+        return tuple(zip(self.labelnames, key))
+
+
+class Counter(_Metric):
+    """Monotonic counter."""
+
+    metric_type = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """Increment the unlabelled counter."""
+        self.labels().inc(amount)
+
+    def collect(self) -> Family:
+        family = Family(self.name, self.metric_type, self.documentation)
+        for key, child in self._children.items():
+            family.add(child.value, self._label_pairs(key), "_total")
+        return family
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram."""
+
+    metric_type = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.upper_bounds = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.upper_bounds)
+
+    def observe(self, value: float) -> None:
+        """Observe a value on the unlabelled histogram."""
+        self.labels().observe(value)
+
+    def collect(self) -> Family:
+        family = Family(self.name, self.metric_type, self.documentation)
+        for key, child in self._children.items():
+            labels = self._label_pairs(key)
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else repr(bound)
+                family.add(cumulative, labels + (("le", le),), "_bucket")
+            family.add(child.sum, labels, "_sum")
+            family.add(child.count, labels, "_count")
+        return family
+
+
+class Registry:
+    """Holds metrics and callback collectors and renders the exposition format."""
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._caches: Dict[str, object] = {}
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, documentation, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        metric = Histogram(name, documentation, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """Register a callable producing families at scrape time (e.g. gauges)."""
+        self._collectors.append(collector)
+
+    def register_cache(self, name: str, cache: object) -> None:
+        """Expose ``hits``/``misses`` attributes of a cache as counters and a ratio."""
+        self._caches[name] = cache
+
+    def collect(self) -> List[Family]:
+        families = [metric.collect() for metric in self._metrics]
+        for collector in self._collectors:
+            try:
+                families.extend(collector())
+            except Exception:  # pylint: disable=broad-except
+                logger.exception("Metrics collector %r failed", collector)
+        families.extend(self._collect_caches())
+        return families
+
+    def _collect_caches(self) -> List[Family]:
+        hits = Family("cache_hits", "counter", "Cache lookups served from memory")
+        misses = Family("cache_misses", "counter", "Cache lookups that fell through")
+        for name, cache in self._caches.items():
+            labels = (("cache", name),)
+            hits.add(getattr(cache, "hits", 0), labels, "_total")
+            misses.add(getattr(cache, "misses", 0), labels, "_total")
+        return [hits, misses]
+
+    def render(self) -> str:
+        """Render this process's metrics, merged with other workers' if multi-process."""
+        families = self.collect()
+        if MULTIPROC_DIR:
+            families = _merge_with_workers(families, Path(MULTIPROC_DIR))
+        return _expose(families) + _expose_cache_ratios(families)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(str(value))}"' for key, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _expose(families: Iterable[Family]) -> str:
+    lines = []
+    for family in families:
+        if not family.samples:
+            continue
+        lines.append(f"# HELP {family.name} {family.documentation}")
+        lines.append(f"# TYPE {family.name} {family.type}")
+        for name, labels, value in family.samples:
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _expose_cache_ratios(families: Iterable[Family]) -> str:
+    totals: Dict[Labels, List[float]] = {}
+    for family in families:
+        if family.name in ("cache_hits", "cache_misses"):
+            index = 0 if family.name == "cache_hits" else 1
+            for _, labels, value in family.samples:
+                totals.setdefault(labels, [0.0, 0.0])[index] += value
+    lines = [
+        "# HELP cache_hit_ratio Fraction of cache lookups served from memory",
+        "# TYPE cache_hit_ratio gauge",
+    ]
+    for labels, (hit, miss) in totals.items():
+        ratio = hit / (hit + miss) if hit + miss else 0.0
+        lines.append(f"cache_hit_ratio{_format_labels(labels)} {ratio:.4f}")
+    return "\n".join(lines) + "\n" if totals else ""
+
+
+def _snapshot(families: List[Family]) -> bytes:
+    return orjson.dumps(
+        {
+            "time": time.time(),
+            "families": [
+                [
+                    family.name,
+                    family.type,
+                    family.documentation,
+                    [[name, [list(pair) for pair in labels], value]
+                     for name, labels, value in family.samples],
+                ]
+                for family in families
+            ],
+        }
+    )
+
+
+def _merge_with_workers(own: List[Family], directory: Path) -> List[Family]:
+    """Sum counters/histograms across worker snapshots; keep gauges per pid."""
+    pid = str(os.getpid())
+    snapshots = [(pid, time.time(), own)]
+    for path in directory.glob("*.json"):
+        if path.stem == pid:
+            continue
+        try:
+            data = orjson.loads(path.read_bytes())
+        except (OSError, orjson.JSONDecodeError):
+            continue
+        families = []
+        for name, metric_type, documentation, samples in data["families"]:
+            family = Family(name, metric_type, documentation)
+            family.samples = [
+                (sample, tuple(tuple(pair) for pair in labels), value)
+                for sample, labels, value in samples
+            ]
+            families.append(family)
+        snapshots.append((path.stem, data["time"], families))
+
+    stale_before = time.time() - 3 * WRITE_INTERVAL_SECONDS
+    merged: Dict[str, Family] = {}
+    values: Dict[str, Dict[Tuple[str, Labels], float]] = {}
+    for worker_pid, written_at, families in snapshots:
+        for family in families:
+            target = merged.setdefault(
+                family.name, Family(family.name, family.type, family.documentation)
+            )
+            bucket = values.setdefault(family.name, {})
+            for name, labels, value in family.samples:
+                if family.type == "gauge":
+                    if written_at < stale_before:
+                        continue
+                    bucket[(name, labels + (("pid", worker_pid),))] = value
+                else:
+                    key = (name, labels)
+                    bucket[key] = bucket.get(key, 0.0) + value
+    for name, family in merged.items():
+        family.samples = [
+            (sample, labels, value) for (sample, labels), value in values[name].items()
+        ]
+    return list(merged.values())
+
+
+class MultiprocessWriter:
+    """Periodically writes this worker's samples for other workers to aggregate."""
+
+    def __init__(self, registry: "Registry", directory: Optional[str] = MULTIPROC_DIR) -> None:
+        self.registry = registry
+        self.directory = Path(directory) if directory else None
+        self._task: Optional[asyncio.Task] = None
+
+    def write(self) -> None:
+        """Atomically replace this worker's snapshot file."""
+        if self.directory is None:
+            return
+        self.directory.mkdir(parents=True, exist_ok=True)
+        target = self.directory / f"{os.getpid()}.json"
+        temporary = target.with_suffix(".tmp")
+        temporary.write_bytes(_snapshot(self.registry.collect()))
+        os.replace(temporary, target)
+
+    async def start(self) -> None:
+        if self.directory is not None and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="metrics-writer")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        self.write()
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                self.write()
+            except OSError:
+                logger.exception("Could not write metrics snapshot")
+            await asyncio.sleep(WRITE_INTERVAL_SECONDS)
+
+
+REGISTRY = Registry()
+multiprocess_writer = MultiprocessWriter(REGISTRY)
+
+HTTP_REQUEST_DURATION = REGISTRY.histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route template",
+    ("method", "route"),
+)
+HTTP_RESPONSES = REGISTRY.counter(
+    "http_responses",
+    "HTTP responses by route template and status code",
+    ("method", "route", "status"),
+)
+ARGON2_DURATION = REGISTRY.histogram(
+    "argon2_duration_seconds",
+    "Time spent hashing or verifying passwords with Argon2",
+    ("operation",),
+    buckets=(0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0),
+)
+REFRESH_TOKENS = REGISTRY.counter(
+    "refresh_token_requests",
+    "Refresh token uses by outcome",
+    ("result",),
+)
@@ -0,0 +1,22 @@
+"""
+ASGI middleware for the application.
+
+Middleware here is written against the raw ASGI interface rather than
+``BaseHTTPMiddleware`` so streaming responses and background tasks are not
+wrapped in extra tasks and buffers.
+"""
+
+from app.middleware.compression import CompressionMiddleware, compression_stats
+from app.middleware.load_shedding import ConcurrencyLimitMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.profiling import ProfilingMiddleware
+from app.middleware.query_stats import QueryStatsMiddleware
+
+__all__ = [
+    "CompressionMiddleware",
+    "ConcurrencyLimitMiddleware",
+    "MetricsMiddleware",
+    "ProfilingMiddleware",
+    "QueryStatsMiddleware",
+    "compression_stats",
+]
@@ -0,0 +1,354 @@
+"""
+Size-aware gzip/brotli response compression.
+
+Bodies smaller than ``minimum_size`` are sent as-is. Streaming responses are
+buffered only until ``minimum_size`` bytes have arrived, then compressed chunk
+by chunk with a sync flush, so they are never held in memory in full.
+Per-route byte counts and compression CPU time are collected for tuning.
+"""
+
+import logging
+import time
+import zlib
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Dict, List, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import REGISTRY, Family
+from app.middleware.scope import get_header, route_template
+from app.responses import weak_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "application/javascript",
+    "application/xml",
+    "image/svg+xml",
+    "text/",
+)
+
+
+@dataclass
+class RouteCompressionStats:
+    """Counters for one (route, encoding) pair."""
+
+    compressed: int = 0
+    skipped: int = 0
+    bytes_in: int = 0
+    bytes_out: int = 0
+    cpu_ns: int = 0
+
+    @property
+    def ratio(self) -> float:
+        """Compressed size as a fraction of the original size."""
+        return self.bytes_out / self.bytes_in if self.bytes_in else 1.0
+
+
+class CompressionStats:
+    """Per-route compression statistics, keyed by route template and encoding."""
+
+    def __init__(self) -> None:
+        self.routes: Dict[Tuple[str, str], RouteCompressionStats] = {}
+
+    def get(self, route: str, encoding: str) -> RouteCompressionStats:
+        """Return the counters for a route, creating them on first use."""
+        key = (route, encoding)
+        stats = self.routes.get(key)
+        if stats is None:
+            stats = self.routes[key] = RouteCompressionStats()
+        return stats
+
+    def snapshot(self) -> List[dict]:
+        """Return a JSON-friendly view of all counters."""
+        return [
+            {
+                "route": route,
+                "encoding": encoding,
+                "compressed": stats.compressed,
+                "skipped": stats.skipped,
+                "bytes_in": stats.bytes_in,
+                "bytes_out": stats.bytes_out,
+                "ratio": round(stats.ratio, 4),
+                "cpu_ms": round(stats.cpu_ns / 1_000_000, 3),
+                "cpu_us_per_response": (
+                    round(stats.cpu_ns / stats.compressed / 1000, 1) if stats.compressed else 0.0
+                ),
+            }
+            for (route, encoding), stats in sorted(self.routes.items())
+        ]
+
+
+compression_stats = CompressionStats()
+
+
+def _collect_compression() -> List[Family]:
+    bytes_in = Family("http_compression_input_bytes", "counter", "Bytes before compression")
+    bytes_out = Family("http_compression_output_bytes", "counter", "Bytes after compression")
+    cpu = Family("http_compression_cpu_seconds", "counter", "CPU time spent compressing")
+    skipped = Family(
+        "http_compression_skipped", "counter", "Responses below the compression size threshold"
+    )
+    for (route, encoding), stats in compression_stats.routes.items():
+        labels = (("route", route), ("encoding", encoding))
+        bytes_in.add(stats.bytes_in, labels, "_total")
+        bytes_out.add(stats.bytes_out, labels, "_total")
+        cpu.add(stats.cpu_ns / 1e9, labels, "_total")
+        skipped.add(stats.skipped, labels, "_total")
+    return [bytes_in, bytes_out, cpu, skipped]
+
+
+REGISTRY.register_collector(_collect_compression)
+
+
+class _GzipEncoder:
+    name = "gzip"
+
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush()
+
+
+class _BrotliEncoder:
+    name = "br"
+
+    def __init__(self, quality: int):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.process(data) + self._compressor.flush()
+
+    def finish(self, data: bytes = b"") -> bytes:
+        return self._compressor.process(data) + self._compressor.finish()
+
+
+def negotiate_encoding(accept_encoding: Optional[bytes], brotli_enabled: bool) -> Optional[str]:
+    """Pick ``br`` or ``gzip`` from an Accept-Encoding header.
+
+    The acceptable encoding with the highest q-value wins, brotli on a tie.
+    None if neither is acceptable, or the client explicitly weights
+    ``identity`` above both.
+    """
+    if not accept_encoding:
+        return None
+
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.decode("latin-1").lower().split(","):
+        token, *params = part.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[token.strip()] = quality
+
+    wildcard = accepted.get("*", 0.0)
+    candidates = [("br", accepted.get("br", wildcard))] if brotli_enabled else []
+    candidates.append(("gzip", accepted.get("gzip", wildcard)))
+    # max() keeps the first of equal weights, so brotli breaks ties
+    encoding, quality = max(candidates, key=lambda candidate: candidate[1])
+    if quality <= 0 or accepted.get("identity", 0.0) > quality:
+        return None
+    return encoding
+
+
+class CompressionMiddleware:
+    """Compress eligible responses with gzip or brotli.
+
+    Args:
+        app: Inner ASGI application
+        minimum_size: Bodies (or stream prefixes) below this size are not compressed
+        gzip_level: zlib compression level (1-9)
+        brotli_quality: Brotli quality (0-11); brotli is used only if installed
+        stats: Collector for per-route ratios and CPU time
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        stats: CompressionStats = compression_stats,
+    ) -> None:
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.stats = stats
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(
+            get_header(scope, b"accept-encoding"), brotli_enabled=brotli is not None
+        )
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        if encoding == "br":
+            factory: Callable = partial(_BrotliEncoder, self.brotli_quality)
+        else:
+            factory = partial(_GzipEncoder, self.gzip_level)
+
+        responder = _CompressionResponder(
+            scope, send, encoding, factory, self.minimum_size, self.stats
+        )
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Per-request send wrapper implementing the size-aware compression."""
+
+    def __init__(
+        self,
+        scope: Scope,
+        send: Send,
+        encoding: str,
+        encoder_factory: Callable,
+        minimum_size: int,
+        stats: CompressionStats,
+    ) -> None:
+        self.scope = scope
+        self.downstream = send
+        self.encoding = encoding
+        self.encoder_factory = encoder_factory
+        self.minimum_size = minimum_size
+        self.stats = stats
+
+        self.start_message: Optional[Message] = None
+        self.passthrough = False
+        self.streaming = False
+        self.encoder = None
+        self.buffer = bytearray()
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_ns = 0
+
+    async def send(self, message: Message) -> None:
+        message_type = message["type"]
+
+        if message_type == "http.response.start":
+            headers = MutableHeaders(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            if (
+                "content-encoding" in headers
+                or message["status"] in (204, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                self.passthrough = True
+                await self.downstream(message)
+            else:
+                headers.add_vary_header("Accept-Encoding")
+                self.start_message = message
+            return
+
+        if self.passthrough or message_type != "http.response.body":
+            await self._flush_start()
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.streaming:
+            await self._send_compressed(body, more_body)
+            return
+
+        self.buffer.extend(body)
+        if not more_body:
+            # Whole body is known: compress only if it is worth it
+            payload = bytes(self.buffer)
+            if len(payload) < self.minimum_size:
+                self._record_skip()
+                await self._flush_start()
+                await self.downstream({"type": "http.response.body", "body": payload})
+                return
+            self.encoder = self.encoder_factory()
+            compressed = self._encode(payload, final=True)
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            self._set_encoding(headers)
+            headers["Content-Length"] = str(len(compressed))
+            await self._flush_start()
+            await self.downstream({"type": "http.response.body", "body": compressed})
+            self._record()
+            return
+
+        if len(self.buffer) >= self.minimum_size:
+            # Large enough stream: switch to incremental compression
+            self.streaming = True
+            self.encoder = self.encoder_factory()
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            self._set_encoding(headers)
+            if "content-length" in headers:
+                del headers["content-length"]
+            await self._flush_start()
+            payload = bytes(self.buffer)
+            self.buffer.clear()
+            await self._send_compressed(payload, more_body=True)
+
+    def _set_encoding(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+        # The compressed bytes differ from the identity ones, so a strong
+        # validator no longer identifies them
+        etag = headers.get("etag")
+        if etag:
+            headers["ETag"] = weak_etag(etag)
+
+    async def _flush_start(self) -> None:
+        if self.start_message is not None:
+            message, self.start_message = self.start_message, None
+            await self.downstream(message)
+
+    def _encode(self, data: bytes, final: bool) -> bytes:
+        started = time.thread_time_ns()
+        out = self.encoder.finish(data) if final else self.encoder.compress(data)
+        self.cpu_ns += time.thread_time_ns() - started
+        self.bytes_in += len(data)
+        self.bytes_out += len(out)
+        return out
+
+    async def _send_compressed(self, data: bytes, more_body: bool) -> None:
+        out = self._encode(data, final=not more_body)
+        await self.downstream(
+            {"type": "http.response.body", "body": out, "more_body": more_body}
+        )
+        if not more_body:
+            self._record()
+
+    def _record(self) -> None:
+        stats = self.stats.get(route_template(self.scope), self.encoding)
+        stats.compressed += 1
+        stats.bytes_in += self.bytes_in
+        stats.bytes_out += self.bytes_out
+        stats.cpu_ns += self.cpu_ns
+        logger.debug(
+            "compressed %s %s: %d -> %d bytes in %.3f ms",
+            route_template(self.scope),
+            self.encoding,
+            self.bytes_in,
+            self.bytes_out,
+            self.cpu_ns / 1_000_000,
+        )
+
+    def _record_skip(self) -> None:
+        self.stats.get(route_template(self.scope), self.encoding).skipped += 1
@@ -0,0 +1,192 @@
+"""
+Concurrency limiting with priorities and load shedding.
+
+At most ``limit`` requests run at once (by default the database pool's
+capacity, so requests queue here instead of inside SQLAlchemy's pool). Extra
+requests wait in a bounded queue and are admitted highest priority first,
+FIFO within a priority. A request is answered with 503 and ``Retry-After``
+straight away when the queue share for its priority is full or the estimated
+wait exceeds ``max_wait``, and after ``max_wait`` if it is still queued.
+
+The wait estimate follows Little's law: requests ahead in the queue, times
+the recent average time a request holds its slot, divided by the limit.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Deque, List, Optional, Sequence, Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.metrics import REGISTRY, Family
+from app.responses import FastJSONResponse
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+PRIORITY_NAMES = ("high", "normal", "low")
+
+# Share of the wait queue each priority may fill, so low priority sheds first
+QUEUE_SHARE = (1.0, 0.75, 0.5)
+
+# (method or None for any, path prefix or None for any, priority); first match wins
+PriorityRule = Tuple[Optional[str], Optional[str], int]
+DEFAULT_PRIORITY_RULES: Tuple[PriorityRule, ...] = (
+    ("GET", "/api/epigrams/random", PRIORITY_HIGH),
+    ("GET", "/api/epigrams/bucket", PRIORITY_HIGH),
+    ("GET", "/api/auth/me", PRIORITY_HIGH),
+    ("POST", "/api/auth/verify-token", PRIORITY_HIGH),
+    ("OPTIONS", None, PRIORITY_HIGH),
+    ("GET", None, PRIORITY_NORMAL),
+    (None, "/api/auth/", PRIORITY_NORMAL),
+    (None, None, PRIORITY_LOW),
+)
+
+# Probes and monitoring must answer even when the API is saturated
+EXEMPT_PATHS = frozenset({"/health", "/ready", "/metrics", "/stats/compression"})
+
+HTTP_REQUESTS_SHED = REGISTRY.counter(
+    "http_requests_shed",
+    "Requests rejected with 503 by the concurrency limiter",
+    ("priority", "reason"),
+)
+
+
+class ConcurrencyLimitMiddleware:
+    """Bound in-flight requests and shed load once queueing would take too long.
+
+    Args:
+        app: Inner ASGI application
+        limit: Requests allowed to run concurrently
+        queue_size: Requests allowed to wait for a slot
+        max_wait: Longest a request may wait, in seconds
+        rules: Priority rules, see ``DEFAULT_PRIORITY_RULES``
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limit: int,
+        queue_size: int,
+        max_wait: float = 1.0,
+        rules: Sequence[PriorityRule] = DEFAULT_PRIORITY_RULES,
+    ) -> None:
+        self.app = app
+        self.limit = limit
+        self.queue_size = queue_size
+        self.max_wait = max_wait
+        self.rules = tuple(rules)
+        self.in_flight = 0
+        self._queues: List[Deque[asyncio.Future]] = [deque() for _ in PRIORITY_NAMES]
+        # Moving average of how long a request holds its slot
+        self._service_time = 0.05
+        self._shed = [
+            {
+                reason: HTTP_REQUESTS_SHED.labels(name, reason)
+                for reason in ("queue_full", "wait_estimate", "timeout")
+            }
+            for name in PRIORITY_NAMES
+        ]
+        REGISTRY.register_collector(self._collect)
+
+    @property
+    def queued(self) -> int:
+        return sum(len(queue) for queue in self._queues)
+
+    def priority(self, scope: Scope) -> int:
+        method, path = scope["method"], scope["path"]
+        for rule_method, prefix, priority in self.rules:
+            if (rule_method is None or rule_method == method) and (
+                prefix is None or path.startswith(prefix)
+            ):
+                return priority
+        return PRIORITY_LOW
+
+    def estimated_wait(self, ahead: int) -> float:
+        """Seconds until a request with ``ahead`` requests in front of it gets a slot."""
+        return (ahead + 1) * self._service_time / self.limit
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["path"] in EXEMPT_PATHS:
+            await self.app(scope, receive, send)
+            return
+
+        if self.in_flight < self.limit and not self.queued:
+            self.in_flight += 1
+        else:
+            priority = self.priority(scope)
+            ahead = sum(len(queue) for queue in self._queues[: priority + 1])
+            if self.queued >= self.queue_size * QUEUE_SHARE[priority]:
+                await self._reject(scope, receive, send, priority, "queue_full")
+                return
+            if self.estimated_wait(ahead) > self.max_wait:
+                await self._reject(scope, receive, send, priority, "wait_estimate")
+                return
+            if not await self._wait_for_slot(priority):
+                await self._reject(scope, receive, send, priority, "timeout")
+                return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self._service_time += (time.perf_counter() - started - self._service_time) * 0.1
+            self._release()
+
+    async def _wait_for_slot(self, priority: int) -> bool:
+        """Queue until a finishing request hands over its slot; False on timeout."""
+        waiter = asyncio.get_running_loop().create_future()
+        queue = self._queues[priority]
+        queue.append(waiter)
+        try:
+            await asyncio.wait_for(waiter, self.max_wait)
+            return True
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the timeout fired
+            return waiter.done() and not waiter.cancelled()
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the client went away
+                self._release()
+            raise
+        finally:
+            if not waiter.done() or waiter.cancelled():
+                try:
+                    queue.remove(waiter)
+                except ValueError:
+                    pass
+
+    def _release(self) -> None:
+        """Hand the slot to the next waiter, highest priority first, or free it."""
+        for queue in self._queues:
+            while queue:
+                waiter = queue.popleft()
+                if not waiter.done():
+                    waiter.set_result(None)
+                    return
+        self.in_flight -= 1
+
+    async def _reject(
+        self, scope: Scope, receive: Receive, send: Send, priority: int, reason: str
+    ) -> None:
+        self._shed[priority][reason].inc()
+        retry_after = max(1, math.ceil(self.estimated_wait(self.queued)))
+        response = FastJSONResponse(
+            {"detail": "Server is busy, please retry shortly"},
+            status_code=503,
+            headers={"Retry-After": str(retry_after)},
+        )
+        await response(scope, receive, send)
+
+    def _collect(self) -> List[Family]:
+        families = []
+        for name, documentation, value in (
+            ("http_requests_in_flight", "Requests holding a concurrency slot", self.in_flight),
+            ("http_requests_queued", "Requests waiting for a concurrency slot", self.queued),
+        ):
+            family = Family(name, "gauge", documentation)
+            family.add(value)
+            families.append(family)
+        return families
@@ -0,0 +1,52 @@
+"""Per-route latency and status-code recording for the Prometheus endpoint."""
+
+import time
+from typing import Dict, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.metrics import HTTP_REQUEST_DURATION, HTTP_RESPONSES
+from app.middleware.scope import route_template
+
+
+class MetricsMiddleware:
+    """Observe request duration per (method, route template) and count status codes.
+
+    Metric children are resolved once per route and status and cached here,
+    so steady-state recording is a dict lookup and a few integer increments.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._routes: Dict[Tuple[str, str], Tuple[object, Dict[int, object]]] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self._record(scope, status_code, time.perf_counter() - started)
+
+    def _record(self, scope: Scope, status_code: int, elapsed: float) -> None:
+        key = (scope["method"], route_template(scope))
+        entry = self._routes.get(key)
+        if entry is None:
+            entry = self._routes[key] = (HTTP_REQUEST_DURATION.labels(*key), {})
+        duration, statuses = entry
+        duration.observe(elapsed)
+        responses = statuses.get(status_code)
+        if responses is None:
+            responses = statuses[status_code] = HTTP_RESPONSES.labels(*key, status_code)
+        responses.inc()
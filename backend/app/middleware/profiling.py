@@ -0,0 +1,257 @@
+"""
+Opt-in per-request profiling.
+
+A request is profiled when it carries a valid signed ``X-Profile`` header or
+is picked by the sampling rate. A background thread then samples the
+request's task every few milliseconds: while the task runs, its Python stack
+is recorded; while it is suspended, the chain of awaiting coroutines is
+recorded with a ``(waiting)`` leaf, so database and network waits show up
+next to CPU time. The result is written in collapsed-stack format, readable
+by ``flamegraph.pl`` and speedscope.
+
+The middleware is only installed when ``PROFILE_DIR`` is set, and requests
+that are not profiled pay one header lookup.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
+from types import CodeType, FrameType
+from typing import Dict, List, Optional, Tuple
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.scope import get_header, route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b"x-profile"
+# Signed tokens may not be valid for longer than this
+MAX_TOKEN_TTL_SECONDS = 24 * 3600
+
+_SLUG = re.compile(r"[^A-Za-z0-9]+")
+_BACKEND_DIR = str(Path(__file__).resolve().parents[2])
+
+
+def sign_profile_token(secret: str, path: str, expires: int) -> str:
+    """Build an ``X-Profile`` header value for ``path`` valid until ``expires``.
+
+    Args:
+        secret: Shared PROFILE_SECRET
+        path: Request path the token is valid for, e.g. ``/api/epigrams/mine``
+        expires: Unix timestamp after which the token is rejected
+
+    Returns:
+        Header value in the form ``<expires>.<hex signature>``
+    """
+    signature = hmac.new(
+        secret.encode(), f"{expires}:{path}".encode(), hashlib.sha256
+    ).hexdigest()
+    return f"{expires}.{signature}"
+
+
+def verify_profile_token(secret: str, token: str, path: str, now: Optional[float] = None) -> bool:
+    """Check a signed profiling token against the request path and clock."""
+    expires_text, _, signature = token.partition(".")
+    if not expires_text.isdigit() or not signature:
+        return False
+    expires = int(expires_text)
+    now = time.time() if now is None else now
+    if not now <= expires <= now + MAX_TOKEN_TTL_SECONDS:
+        return False
+    expected = sign_profile_token(secret, path, expires).partition(".")[2]
+    return hmac.compare_digest(expected, signature)
+
+
+def _frame_label(code: CodeType, cache: Dict[CodeType, str]) -> str:
+    label = cache.get(code)
+    if label is None:
+        filename = code.co_filename
+        if "site-packages" in filename:
+            filename = filename.split("site-packages" + os.sep, 1)[1]
+        elif filename.startswith(_BACKEND_DIR):
+            filename = filename[len(_BACKEND_DIR) + 1 :]
+        # ';' separates frames in the collapsed format
+        label = f"{code.co_qualname} ({filename}:{code.co_firstlineno})".replace(";", ":")
+        cache[code] = label
+    return label
+
+
+class TaskSampler:
+    """Samples one asyncio task's stack from a background thread.
+
+    Args:
+        task: Task handling the request
+        interval: Seconds between samples
+    """
+
+    def __init__(self, task: asyncio.Task, interval: float) -> None:
+        self.task = task
+        self.interval = interval
+        self.samples: Counter = Counter()
+        self._loop_thread_id = threading.get_ident()
+        self._root_frame = getattr(task.get_coro(), "cr_frame", None)
+        self._labels: Dict[CodeType, str] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Ask the thread to stop; does not wait, so it is safe on the event loop."""
+        self._stop.set()
+
+    def join(self) -> None:
+        """Wait for the sample in progress, if any; call off the event loop."""
+        self._thread.join()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            stack = self._sample()
+            if stack:
+                self.samples[stack] += 1
+
+    def _sample(self) -> Optional[Tuple[str, ...]]:
+        if self.task.done():
+            return None
+        loop = self.task.get_loop()
+        if asyncio.current_task(loop) is self.task:
+            return self._running_stack()
+        return self._waiting_stack()
+
+    def _running_stack(self) -> Optional[Tuple[str, ...]]:
+        frame: Optional[FrameType] = sys._current_frames().get(  # pylint: disable=protected-access
+            self._loop_thread_id
+        )
+        frames: List[FrameType] = []
+        while frame is not None:
+            frames.append(frame)
+            if frame is self._root_frame:
+                break
+            frame = frame.f_back
+        frames.reverse()
+        return tuple(_frame_label(item.f_code, self._labels) for item in frames) or None
+
+    def _waiting_stack(self) -> Optional[Tuple[str, ...]]:
+        labels = []
+        awaitable = self.task.get_coro()
+        while awaitable is not None:
+            frame = getattr(awaitable, "cr_frame", None) or getattr(awaitable, "gi_frame", None)
+            if frame is None:
+                break
+            labels.append(_frame_label(frame.f_code, self._labels))
+            awaitable = getattr(awaitable, "cr_await", None) or getattr(
+                awaitable, "gi_yieldfrom", None
+            )
+        if not labels:
+            return None
+        labels.append("(waiting)")
+        return tuple(labels)
+
+    def collapsed(self) -> str:
+        """Samples in collapsed-stack format, one ``frame;frame count`` line per stack."""
+        return "".join(
+            f"{';'.join(stack)} {count}\n" for stack, count in self.samples.most_common()
+        )
+
+
+class ProfilingMiddleware:
+    """Profile selected requests and write one collapsed-stack file per request.
+
+    Args:
+        app: Inner ASGI application
+        directory: Where profiles are written; created if missing
+        secret: Key for signed ``X-Profile`` headers; header triggers are off without it
+        sample_rate: Fraction of all requests to profile, 0 to disable
+        interval: Seconds between stack samples
+        max_concurrent: Requests profiled at the same time; others run normally
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        directory: str,
+        secret: Optional[str] = None,
+        sample_rate: float = 0.0,
+        interval: float = 0.001,
+        max_concurrent: int = 2,
+    ) -> None:
+        self.app = app
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.secret = secret
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_concurrent = max_concurrent
+        self._active = 0
+
+    def _selected(self, scope: Scope) -> bool:
+        if self.secret:
+            token = get_header(scope, PROFILE_HEADER)
+            if token is not None:
+                return verify_profile_token(self.secret, token.decode("latin-1"), scope["path"])
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if (
+            scope["type"] != "http"
+            or self._active >= self.max_concurrent
+            or not self._selected(scope)
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        self._active += 1
+        sampler = TaskSampler(asyncio.current_task(), self.interval)
+        started = time.perf_counter()
+        sampler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - started
+            # Joined in _write, so the loop never waits for a sample in progress
+            sampler.stop()
+            self._active -= 1
+            asyncio.get_running_loop().run_in_executor(
+                None, self._write, scope, status_code, duration, sampler
+            )
+
+    def _write(self, scope: Scope, status_code: int, duration: float, sampler: TaskSampler) -> None:
+        sampler.join()
+        route = _SLUG.sub("_", route_template(scope)).strip("_") or "root"
+        name = (
+            f"{time.strftime('%Y%m%dT%H%M%S')}-{scope['method']}-{route}-{status_code}-"
+            f"{duration * 1000:.0f}ms-{os.getpid()}.folded"
+        )
+        path = self.directory / name
+        try:
+            path.write_text(sampler.collapsed(), encoding="utf-8")
+        except OSError:
+            logger.exception("Could not write profile %s", path)
+            return
+        logger.info(
+            "Profiled %s %s in %.1fms (%d samples): %s",
+            scope["method"],
+            scope["path"],
+            duration * 1000,
+            sum(sampler.samples.values()),
+            path,
+        )
@@ -0,0 +1,64 @@
+"""Per-request SQL statistics: optional response headers and the access log."""
+
+import logging
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.middleware.scope import route_template
+from app.query_stats import track_queries
+
+access_logger = logging.getLogger("app.access")
+
+
+class QueryStatsMiddleware:
+    """Attach a QueryStats to each request and report it.
+
+    Args:
+        app: Inner ASGI application
+        expose_headers: Add ``X-DB-Query-Count`` and a ``Server-Timing`` entry
+            to responses. The counts cover statements issued before the
+            response starts; the access log line covers the whole request.
+    """
+
+    def __init__(self, app: ASGIApp, expose_headers: bool = False) -> None:
+        self.app = app
+        self.expose_headers = expose_headers
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status_code = 500
+
+        with track_queries() as stats:
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status_code
+                if message["type"] == "http.response.start":
+                    status_code = message["status"]
+                    if self.expose_headers:
+                        headers = MutableHeaders(scope=message)
+                        headers["X-DB-Query-Count"] = str(stats.count)
+                        headers.append(
+                            "Server-Timing",
+                            f'db;dur={stats.total_ms:.1f};desc="{stats.count} queries"',
+                        )
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                access_logger.info(
+                    '%s %s "%s" %d %.1fms db_queries=%d db_ms=%.1f',
+                    scope["method"],
+                    scope["path"],
+                    route_template(scope),
+                    status_code,
+                    (time.perf_counter() - started) * 1000,
+                    stats.count,
+                    stats.total_ms,
+                )
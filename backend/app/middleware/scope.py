@@ -0,0 +1,25 @@
+"""Helpers for reading request details from an ASGI scope."""
+
+from typing import Optional
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+def route_template(scope: dict) -> str:
+    """Return the matched route's path template, e.g. ``/api/epigrams/{epigram_id}``.
+
+    Starlette stores the matched route on the shared scope during routing, so
+    this is only meaningful once the inner app has started handling the request.
+    Unmatched paths collapse into a single label to keep cardinality bounded.
+    """
+    route = scope.get("route")
+    path: Optional[str] = getattr(route, "path", None)
+    return path or UNMATCHED_ROUTE
+
+
+def get_header(scope: dict, name: bytes) -> Optional[bytes]:
+    """Return the first value of a (lower-case) request header, if present."""
+    for key, value in scope.get("headers", ()):
+        if key == name:
+            return value
+    return None
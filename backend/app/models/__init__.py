@@ -5,7 +5,14 @@ This module imports all database models to ensure they are registered
 with SQLModel for Alembic migrations.
 """
 
-from app.models.epigram import Epigram
-from app.models.user import User, UserSettings
+from app.models.epigram import Epigram, EpigramImpressions, EpigramTombstone
+from app.models.user import RefreshToken, User, UserSettings
 
-__all__ = ["Epigram", "User", "UserSettings"]
+__all__ = [
+    "Epigram",
+    "EpigramImpressions",
+    "EpigramTombstone",
+    "RefreshToken",
+    "User",
+    "UserSettings",
+]
@@ -6,7 +6,7 @@ from datetime import datetime
 from enum import IntEnum
 from typing import Optional
 
-from sqlalchemy import CheckConstraint, Column, DateTime, SmallInteger, String
+from sqlalchemy import BigInteger, CheckConstraint, Column, DateTime, Index, SmallInteger, String
 from sqlalchemy.sql import func
 from sqlmodel import Field, SQLModel
 
@@ -25,6 +25,7 @@ class Epigram(SQLModel, table=True):
     __tablename__ = "epigrams"
     __table_args__ = (
         CheckConstraint("status in (0, 1, 2)", name="ck_epigrams_status_range"),
+        Index("uq_epigrams_fingerprint", "fingerprint", unique=True),
     )
 
     id: Optional[int] = Field(default=None, primary_key=True)
@@ -43,6 +44,22 @@ class Epigram(SQLModel, table=True):
         description="Optional author name up to 50 characters",
     )
 
+    # app.fingerprint of text and author. Rows that collided with an older
+    # row when the column was backfilled have none; see app.cli.near_duplicates
+    fingerprint: Optional[str] = Field(
+        default=None,
+        sa_type=String(32),
+        description="Normalized text and author hash for duplicate detection",
+    )
+
+    # app.fingerprint.author_key of author; near-duplicates are only looked
+    # for among epigrams with the same key
+    author_key: Optional[str] = Field(
+        default=None,
+        sa_type=String(16),
+        description="Normalized author hash for near-duplicate detection",
+    )
+
     # Use explicit SmallInteger, default to 1
     status: int = Field(
         sa_column=Column(
@@ -78,3 +95,50 @@ class Epigram(SQLModel, table=True):
             comment="Last update timestamp",
         )
     )
+
+
+class EpigramTombstone(SQLModel, table=True):
+    """Deleted epigram, kept for a while so clients can sync the deletion."""
+
+    __tablename__ = "epigram_tombstones"
+    __table_args__ = (
+        Index("idx_epigram_tombstones_user_deleted", "user_id", "deleted_at"),
+        Index("idx_epigram_tombstones_deleted", "deleted_at"),
+    )
+
+    # ID of the deleted epigram; IDs are never reused
+    epigram_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+
+    user_id: int = Field(description="Owner of the deleted epigram")
+
+    deleted_at: datetime = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            nullable=False,
+            server_default=func.now(),
+            comment="Deletion timestamp",
+        )
+    )
+
+
+class EpigramImpressions(SQLModel, table=True):
+    """How often an epigram has been served, written behind by app.impressions."""
+
+    __tablename__ = "epigram_impressions"
+
+    # No foreign key: flushes may land after the epigram is deleted, and
+    # reads join against approved epigrams anyway
+    epigram_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+
+    impressions: int = Field(
+        sa_column=Column(BigInteger, nullable=False, server_default="0")
+    )
+
+    last_shown_at: datetime = Field(
+        sa_column=Column(
+            DateTime(timezone=True),
+            nullable=False,
+            server_default=func.now(),
+            comment="Time of the flush that last counted an impression",
+        )
+    )
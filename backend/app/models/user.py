@@ -1,5 +1,7 @@
 from datetime import datetime
 from typing import Optional
+from sqlalchemy import Column, DateTime, Index, String
+from sqlalchemy.sql import func
 from sqlmodel import SQLModel, Field
 
 
@@ -22,3 +24,34 @@ class UserSettings(SQLModel, table=True):
     auto_reload_interval_minutes: int = Field(default=5, ge=1, le=240)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class RefreshToken(SQLModel, table=True):
+    """Rotating refresh token; only a keyed hash of the token is stored.
+
+    Each login starts a family. A refresh marks the presented token rotated
+    and issues the next one in the same family, so a rotated token coming
+    back means it was copied, and the whole family is revoked.
+    """
+
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("uq_refresh_tokens_token_hash", "token_hash", unique=True),
+        Index("idx_refresh_tokens_family", "family_id"),
+        Index("idx_refresh_tokens_user", "user_id"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    user_id: int = Field(foreign_key="users.id", ondelete="CASCADE")
+    family_id: str = Field(sa_column=Column(String(32), nullable=False))
+    token_hash: str = Field(sa_column=Column(String(64), nullable=False))
+    created_at: datetime = Field(
+        sa_column=Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    )
+    expires_at: datetime = Field(sa_column=Column(DateTime(timezone=True), nullable=False))
+    rotated_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
+    revoked_at: Optional[datetime] = Field(
+        default=None, sa_column=Column(DateTime(timezone=True), nullable=True)
+    )
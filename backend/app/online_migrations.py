@@ -0,0 +1,256 @@
+"""
+Lock-light migration operations for large tables.
+
+Plain Alembic operations are fine on a small table but hold strong locks for
+as long as they scan or rewrite a big one. These helpers do the same changes
+the way Postgres allows without blocking traffic:
+
+* indexes are built and dropped ``CONCURRENTLY``, outside the migration's
+  transaction (a leftover invalid index from an interrupted build is dropped
+  first);
+* backfills run as short committed batches over primary-key ranges, paced
+  by ``MIGRATION_BATCH_PAUSE_MS`` with progress on stdout;
+* constraints are added ``NOT VALID`` (a brief lock) and validated
+  separately, which scans the table without blocking writes; ``SET NOT
+  NULL`` reuses such a validated check instead of scanning under an
+  exclusive lock.
+
+On other databases the helpers fall back to the plain operation. In offline
+(``--sql``) mode batched steps are rendered as one statement under an
+``-- online:`` comment, which the lock report (``python -m app.cli.migrate
+--lock-report``) recognizes.
+
+``MIGRATIONS_ONLINE=true`` additionally makes ``alembic/env.py`` run each
+revision in its own transaction with ``MIGRATION_LOCK_TIMEOUT_MS``, so a DDL
+statement stuck behind a long query fails instead of queueing every request
+behind it.
+
+Use the helpers in new revisions only; revisions that have already run
+somewhere stay as they shipped. Concurrent and batched steps commit on their
+own, in the middle of the revision, so a failure can leave it partly applied
+with ``alembic_version`` unchanged. Keep every step safe to repeat (the
+index helpers use ``IF NOT EXISTS``; backfills must tolerate rows already
+done) so rerunning the upgrade completes it.
+"""
+
+import os
+import time
+from typing import Any, Dict, Iterator, Optional, Sequence, Tuple
+
+from alembic import op
+from sqlalchemy import text
+
+MIGRATIONS_ONLINE = os.getenv("MIGRATIONS_ONLINE", "false").lower() == "true"
+MIGRATION_LOCK_TIMEOUT_MS = int(os.getenv("MIGRATION_LOCK_TIMEOUT_MS", "5000"))
+MIGRATION_BATCH_ROWS = int(os.getenv("MIGRATION_BATCH_ROWS", "5000"))
+MIGRATION_BATCH_PAUSE = float(os.getenv("MIGRATION_BATCH_PAUSE_MS", "50")) / 1000
+
+# Prefix of the comments offline mode renders for batched steps
+ONLINE_MARKER = "-- online:"
+
+# Seconds between progress lines
+PROGRESS_INTERVAL = 5.0
+
+
+def _is_postgres() -> bool:
+    return op.get_context().dialect.name == "postgresql"
+
+
+def _offline() -> bool:
+    return op.get_context().as_sql
+
+
+def create_index_concurrently(
+    name: str,
+    table: str,
+    columns: str,
+    *,
+    unique: bool = False,
+    using: Optional[str] = None,
+    include: Sequence[str] = (),
+    where: Optional[str] = None,
+) -> None:
+    """Build an index without blocking writes.
+
+    Args:
+        name: Index name
+        table: Table name
+        columns: Column list or expressions, as SQL, e.g. ``"user_id, updated_at"``
+        unique: Whether to build a unique index
+        using: Index method, e.g. ``"gist"``
+        include: Non-key columns stored in the index
+        where: Predicate for a partial index, as SQL
+    """
+    unique_sql = "UNIQUE " if unique else ""
+    using_sql = f" USING {using}" if using else ""
+    include_sql = f" INCLUDE ({', '.join(include)})" if include else ""
+    where_sql = f" WHERE {where}" if where else ""
+    if not _is_postgres():
+        op.execute(
+            f"CREATE {unique_sql}INDEX IF NOT EXISTS {name} "
+            f"ON {table}{using_sql} ({columns}){include_sql}{where_sql}"
+        )
+        return
+    with op.get_context().autocommit_block():
+        if not _offline():
+            # An interrupted concurrent build leaves an invalid index that
+            # IF NOT EXISTS would mistake for a finished one
+            invalid = op.get_bind().execute(
+                text(
+                    "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = indexrelid "
+                    "WHERE relname = :name AND NOT indisvalid"
+                ),
+                {"name": name},
+            ).first()
+            if invalid:
+                op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        op.execute(
+            f"CREATE {unique_sql}INDEX CONCURRENTLY IF NOT EXISTS {name} "
+            f"ON {table}{using_sql} ({columns}){include_sql}{where_sql}"
+        )
+
+
+def drop_index_concurrently(name: str) -> None:
+    """Drop an index without blocking reads or writes."""
+    if not _is_postgres():
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+        return
+    with op.get_context().autocommit_block():
+        op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+
+def key_ranges(
+    table: str,
+    *,
+    key: str = "id",
+    batch_size: int = MIGRATION_BATCH_ROWS,
+    pause: float = MIGRATION_BATCH_PAUSE,
+    label: Optional[str] = None,
+) -> Iterator[Tuple[int, int]]:
+    """Half-open ``[start, end)`` ranges of an integer key, each its own transaction.
+
+    The caller's work for a range commits before the next range is yielded.
+    Rows inserted past the highest key seen at the start are not covered, so
+    application code must already write the new values.
+
+    Yields nothing in offline mode; callers render their step as SQL there.
+    """
+    label = label or f"{table} backfill"
+    if _offline():
+        op.execute(f"{ONLINE_MARKER} batched {label} over {table}.{key}")
+        return
+    connection = op.get_bind()
+    with op.get_context().autocommit_block():
+        low, high = connection.execute(text(f"SELECT min({key}), max({key}) FROM {table}")).one()
+        if low is None:
+            return
+        started = reported = time.monotonic()
+        start = low
+        while start <= high:
+            end = start + batch_size
+            yield start, end
+            start = end
+            now = time.monotonic()
+            if now - reported >= PROGRESS_INTERVAL or start > high:
+                reported = now
+                done = min(start, high + 1) - low
+                print(
+                    f"  {label}: {done / (high - low + 1):6.1%} of {table}.{key} "
+                    f"in {now - started:.0f}s",
+                    flush=True,
+                )
+            if pause and start <= high:
+                time.sleep(pause)
+
+
+def backfill(
+    table: str,
+    assignments: str,
+    *,
+    where: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    key: str = "id",
+    batch_size: int = MIGRATION_BATCH_ROWS,
+    pause: float = MIGRATION_BATCH_PAUSE,
+) -> int:
+    """``UPDATE table SET assignments [WHERE where]`` in committed key-range batches.
+
+    Each batch locks at most ``batch_size`` rows, briefly.
+
+    Args:
+        table: Table name
+        assignments: SET clause, as SQL, e.g. ``"user_id = :system_user_id"``
+        where: Extra row filter, as SQL
+        params: Bind parameters used in ``assignments`` or ``where``
+
+    Returns:
+        Rows updated
+    """
+    params = dict(params or {})
+    condition = f" AND ({where})" if where else ""
+    if _offline():
+        op.execute(f"{ONLINE_MARKER} batched UPDATE of {table} by {key}")
+        op.execute(
+            text(f"UPDATE {table} SET {assignments} WHERE true{condition}").bindparams(**params)
+        )
+        return 0
+    statement = text(
+        f"UPDATE {table} SET {assignments} "
+        f"WHERE {key} >= :batch_start AND {key} < :batch_end{condition}"
+    )
+    connection = op.get_bind()
+    updated = 0
+    for start, end in key_ranges(
+        table, key=key, batch_size=batch_size, pause=pause, label=f"{table} backfill"
+    ):
+        result = connection.execute(statement, {**params, "batch_start": start, "batch_end": end})
+        updated += max(result.rowcount, 0)
+    return updated
+
+
+def add_check_constraint(table: str, name: str, condition: str) -> None:
+    """Add a CHECK constraint, validating existing rows without blocking writes."""
+    if not _is_postgres():
+        op.create_check_constraint(name, table, condition)
+        return
+    op.execute(f"ALTER TABLE {table} ADD CONSTRAINT {name} CHECK ({condition}) NOT VALID")
+    validate_constraint(table, name)
+
+
+def add_foreign_key(
+    table: str,
+    name: str,
+    columns: Sequence[str],
+    referent: str,
+    referent_columns: Sequence[str],
+) -> None:
+    """Add a foreign key, validating existing rows without blocking writes."""
+    if not _is_postgres():
+        op.create_foreign_key(name, table, referent, list(columns), list(referent_columns))
+        return
+    op.execute(
+        f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY ({', '.join(columns)}) "
+        f"REFERENCES {referent} ({', '.join(referent_columns)}) NOT VALID"
+    )
+    validate_constraint(table, name)
+
+
+def validate_constraint(table: str, name: str) -> None:
+    """Validate a NOT VALID constraint in its own transaction."""
+    with op.get_context().autocommit_block():
+        op.execute(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}")
+
+
+def set_not_null(table: str, column: str) -> None:
+    """``SET NOT NULL`` without scanning the table under an exclusive lock.
+
+    Postgres 12+ skips the scan when a validated ``IS NOT NULL`` check
+    exists, so one is added and validated first and dropped afterwards.
+    """
+    if not _is_postgres():
+        op.alter_column(table, column, nullable=False)
+        return
+    check = f"ck_{table}_{column}_not_null"
+    add_check_constraint(table, check, f"{column} IS NOT NULL")
+    op.execute(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL")
+    op.execute(f"ALTER TABLE {table} DROP CONSTRAINT {check}")
@@ -0,0 +1,255 @@
+"""
+Post-commit background tasks for non-critical side effects.
+
+Services call :func:`defer` next to a write. The call is kept on the session
+and handed to the in-process :class:`TaskRunner` only when the transaction
+commits; a rollback drops it. The request returns without waiting for it.
+
+The runner is a fixed pool of asyncio workers over one queue:
+
+* backpressure: ``defer`` waits (up to ``POST_COMMIT_MAX_WAIT_MS``) while the
+  queue is at ``POST_COMMIT_QUEUE_SIZE``, so writers slow down instead of the
+  backlog growing without bound;
+* failures are retried up to ``POST_COMMIT_MAX_ATTEMPTS`` times with capped
+  exponential backoff and full jitter;
+* ``stop`` drains queued and delayed tasks during lifespan shutdown, for at
+  most ``POST_COMMIT_DRAIN_SECONDS``.
+
+Tasks run after the request's session is closed, so they take plain values
+and open their own session when they need the database.
+"""
+
+import asyncio
+import logging
+import os
+import random
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.metrics import REGISTRY, Family
+
+logger = logging.getLogger(__name__)
+
+POST_COMMIT_WORKERS = int(os.getenv("POST_COMMIT_WORKERS", "4"))
+POST_COMMIT_QUEUE_SIZE = int(os.getenv("POST_COMMIT_QUEUE_SIZE", "1000"))
+POST_COMMIT_MAX_WAIT = float(os.getenv("POST_COMMIT_MAX_WAIT_MS", "1000")) / 1000
+POST_COMMIT_MAX_ATTEMPTS = int(os.getenv("POST_COMMIT_MAX_ATTEMPTS", "3"))
+POST_COMMIT_DRAIN_SECONDS = float(os.getenv("POST_COMMIT_DRAIN_SECONDS", "10"))
+
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 5.0
+
+_SESSION_KEY = "post_commit_tasks"
+
+POST_COMMIT_TASKS = REGISTRY.counter(
+    "post_commit_tasks",
+    "Post-commit task runs by outcome",
+    ("task", "result"),
+)
+POST_COMMIT_TASK_SECONDS = REGISTRY.histogram(
+    "post_commit_task_duration_seconds",
+    "Post-commit task attempt duration",
+    ("task",),
+)
+
+
+@dataclass
+class Task:
+    """A deferred call and how often it has been tried."""
+
+    name: str
+    fn: Callable[..., Awaitable[Any]]
+    args: Tuple[Any, ...]
+    attempts: int = 0
+
+
+class TaskRunner:
+    """Bounded pool of asyncio workers running post-commit tasks.
+
+    Args:
+        workers: Tasks run concurrently
+        queue_size: Queue depth at which ``defer`` starts waiting
+        max_attempts: Tries per task, including the first
+    """
+
+    def __init__(
+        self,
+        workers: int = POST_COMMIT_WORKERS,
+        queue_size: int = POST_COMMIT_QUEUE_SIZE,
+        max_attempts: int = POST_COMMIT_MAX_ATTEMPTS,
+    ) -> None:
+        self.workers = workers
+        self.queue_size = queue_size
+        self.max_attempts = max_attempts
+        self._queue: Optional[asyncio.Queue] = None
+        self._space = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+        # Retries waiting for their backoff to pass
+        self._delayed: Dict[asyncio.TimerHandle, Task] = {}
+        self._closed = False
+        self.in_flight = 0
+        REGISTRY.register_collector(self._collect)
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    def start(self) -> None:
+        if self._workers or self._closed:
+            return
+        self._queue = asyncio.Queue()
+        self._workers = [
+            asyncio.get_running_loop().create_task(self._work(), name=f"post-commit-{number}")
+            for number in range(self.workers)
+        ]
+
+    async def wait_for_capacity(self, timeout: float = POST_COMMIT_MAX_WAIT) -> bool:
+        """Wait until the queue is below ``queue_size``; False if it timed out."""
+        deadline = time.monotonic() + timeout
+        while self.depth >= self.queue_size:
+            self._space.clear()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            try:
+                await asyncio.wait_for(self._space.wait(), remaining)
+            except asyncio.TimeoutError:
+                return False
+        return True
+
+    def submit(self, task: Task) -> None:
+        """Queue a task; called once its transaction has committed."""
+        if self._closed:
+            POST_COMMIT_TASKS.labels(task.name, "dropped").inc()
+            logger.warning("Post-commit task %s submitted after shutdown, dropped", task.name)
+            return
+        self.start()
+        self._queue.put_nowait(task)
+
+    async def stop(self, timeout: float = POST_COMMIT_DRAIN_SECONDS) -> None:
+        """Stop accepting tasks, run what is queued or awaiting retry, then stop workers."""
+        self._closed = True
+        if not self._workers:
+            return
+        # Retries run now rather than after their backoff
+        for handle, task in self._delayed.items():
+            handle.cancel()
+            self._queue.put_nowait(task)
+        self._delayed.clear()
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Post-commit drain timed out with %d tasks queued and %d running",
+                self.depth,
+                self.in_flight,
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _work(self) -> None:
+        while True:
+            task = await self._queue.get()
+            if self.depth < self.queue_size:
+                self._space.set()
+            self.in_flight += 1
+            try:
+                await self._run(task)
+            finally:
+                self.in_flight -= 1
+                self._queue.task_done()
+
+    async def _run(self, task: Task) -> None:
+        task.attempts += 1
+        started = time.perf_counter()
+        try:
+            await task.fn(*task.args)
+        except Exception:  # pylint: disable=broad-except
+            if task.attempts < self.max_attempts and not self._closed:
+                POST_COMMIT_TASKS.labels(task.name, "retried").inc()
+                logger.warning(
+                    "Post-commit task %s failed (attempt %d), retrying",
+                    task.name,
+                    task.attempts,
+                    exc_info=True,
+                )
+                self._retry_later(task)
+            else:
+                POST_COMMIT_TASKS.labels(task.name, "failed").inc()
+                logger.exception(
+                    "Post-commit task %s failed after %d attempts", task.name, task.attempts
+                )
+            return
+        finally:
+            POST_COMMIT_TASK_SECONDS.labels(task.name).observe(time.perf_counter() - started)
+        POST_COMMIT_TASKS.labels(task.name, "succeeded").inc()
+
+    def _retry_later(self, task: Task) -> None:
+        # Full jitter: anywhere up to the capped exponential backoff
+        ceiling = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (task.attempts - 1))
+        delay = random.uniform(0, ceiling)
+
+        def requeue() -> None:
+            self._delayed.pop(handle, None)
+            self._queue.put_nowait(task)
+
+        handle = asyncio.get_running_loop().call_later(delay, requeue)
+        self._delayed[handle] = task
+
+    def _collect(self) -> List[Family]:
+        families = []
+        for name, documentation, value in (
+            ("post_commit_queue_depth", "Post-commit tasks waiting for a worker", self.depth),
+            ("post_commit_in_flight", "Post-commit tasks running", self.in_flight),
+            ("post_commit_delayed", "Post-commit tasks waiting to retry", len(self._delayed)),
+        ):
+            family = Family(name, "gauge", documentation)
+            family.add(value)
+            families.append(family)
+        return families
+
+
+task_runner = TaskRunner()
+
+
+async def defer(
+    session: AsyncSession,
+    fn: Callable[..., Awaitable[Any]],
+    *args: Any,
+    name: Optional[str] = None,
+) -> None:
+    """Run ``fn(*args)`` in the background once ``session`` commits.
+
+    Waits first while the runner's queue is full, so a backlog slows writers
+    down. Nothing runs if the transaction rolls back.
+
+    Args:
+        session: Session performing the write
+        fn: Coroutine function to call; must not use ``session``
+        *args: Arguments for ``fn``
+        name: Task name for logs and metrics, defaults to the function name
+    """
+    if not await task_runner.wait_for_capacity():
+        logger.warning("Post-commit queue is full, queueing %s anyway", name or fn.__name__)
+    tasks = session.sync_session.info.setdefault(_SESSION_KEY, [])
+    tasks.append(Task(name or fn.__name__, fn, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_after_commit(session: Session) -> None:
+    """Hand the session's deferred tasks to the runner once the write is durable."""
+    for task in session.info.pop(_SESSION_KEY, ()):
+        task_runner.submit(task)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session: Session) -> None:
+    """Drop tasks for writes that never happened."""
+    session.info.pop(_SESSION_KEY, None)
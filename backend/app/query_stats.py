@@ -0,0 +1,149 @@
+"""
+Per-request SQL statement counts and timings, plus a slow-query log.
+
+Engine cursor events add every statement's duration to the ``QueryStats``
+active in the current context. Stats nest: a request's stats roll up into
+any capture opened around it, which is what the test helpers rely on.
+"""
+
+import logging
+import os
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, ContextManager, Iterator, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from app.db import async_engine
+from app.metrics import REGISTRY
+
+slow_query_logger = logging.getLogger("app.slow_query")
+
+SLOW_QUERY_SECONDS = float(os.getenv("SLOW_QUERY_MS", "200")) / 1000
+
+DB_QUERY_DURATION = REGISTRY.histogram(
+    "db_query_duration_seconds",
+    "SQL statement execution time",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class QueryStats:
+    """Statement count and total database time for a request or capture."""
+
+    count: int = 0
+    total_seconds: float = 0.0
+    parent: Optional["QueryStats"] = None
+    # (statement, parameters) pairs, collected only by capture_queries()
+    statements: Optional[List[Tuple[str, Any]]] = field(default=None, repr=False)
+
+    @property
+    def total_ms(self) -> float:
+        return self.total_seconds * 1000
+
+
+_current_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def current_stats() -> Optional[QueryStats]:
+    """Stats for the active request or capture, if any."""
+    return _current_stats.get()
+
+
+@contextmanager
+def track_queries(collect_statements: bool = False) -> Iterator[QueryStats]:
+    """Attribute statements executed in this context to a new QueryStats."""
+    stats = QueryStats(
+        parent=_current_stats.get(), statements=[] if collect_statements else None
+    )
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def capture_queries() -> ContextManager[QueryStats]:
+    """Track queries and keep the statements and parameters that ran."""
+    return track_queries(collect_statements=True)
+
+
+@contextmanager
+def assert_max_queries(limit: int) -> Iterator[QueryStats]:
+    """Fail if more than ``limit`` statements run inside the block.
+
+    Intended for tests, e.g. around a client call to an endpoint::
+
+        with assert_max_queries(3):
+            await client.get("/api/users/settings")
+    """
+    with capture_queries() as stats:
+        yield stats
+    if stats.count > limit:
+        executed = "\n".join(
+            f"  {index}. {normalize_sql(statement)}"
+            for index, (statement, _) in enumerate(stats.statements, 1)
+        )
+        raise AssertionError(
+            f"Expected at most {limit} queries, {stats.count} were executed:\n{executed}"
+        )
+
+
+def normalize_sql(statement: str) -> str:
+    """Collapse whitespace and replace inline literals with placeholders."""
+    statement = _STRING_LITERAL.sub("?", statement)
+    statement = _NUMBER_LITERAL.sub("?", statement)
+    return _WHITESPACE.sub(" ", statement).strip()
+
+
+def redact_parameters(parameters: Any) -> Any:
+    """Describe parameters by type only, so values never reach the logs."""
+    if isinstance(parameters, dict):
+        return {key: type(value).__name__ for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            return f"<{len(parameters)} parameter sets>"
+        return [type(value).__name__ for value in parameters]
+    return type(parameters).__name__
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _before_cursor_execute(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(async_engine.sync_engine, "after_cursor_execute")
+def _after_cursor_execute(conn, _cursor, statement, parameters, _context, _executemany):
+    elapsed = time.perf_counter() - conn.info["query_started"].pop()
+    DB_QUERY_DURATION.observe(elapsed)
+
+    stats = _current_stats.get()
+    while stats is not None:
+        stats.count += 1
+        stats.total_seconds += elapsed
+        if stats.statements is not None:
+            stats.statements.append((statement, parameters))
+        stats = stats.parent
+
+    if elapsed >= SLOW_QUERY_SECONDS:
+        slow_query_logger.warning(
+            "Slow query (%.1f ms): %s params=%s",
+            elapsed * 1000,
+            normalize_sql(statement),
+            redact_parameters(parameters),
+        )
+
+
+@event.listens_for(async_engine.sync_engine, "handle_error")
+def _handle_error(context) -> None:
+    started = context.connection.info.get("query_started") if context.connection else None
+    if started:
+        started.pop()
@@ -0,0 +1,68 @@
+"""Fast JSON response class, row serialization and conditional request helpers."""
+
+import re
+from typing import Any, Iterable, List, Optional, Sequence
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+# Render UTC offsets as "Z" to match Pydantic's datetime serialization
+ORJSON_OPTIONS = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+# One entity tag in an If-None-Match list; opaque tags may contain commas
+_ENTITY_TAG = re.compile(r'(?:W/)?"[^"]*"')
+
+
+def _default(obj: Any) -> Any:
+    """Fallback encoder for types orjson does not handle natively."""
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Serialize content to JSON bytes with orjson."""
+    return orjson.dumps(content, default=_default, option=ORJSON_OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson.
+
+    Datetimes, dataclasses and enums are encoded natively in Rust,
+    Pydantic models fall back to ``model_dump``.
+    """
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def rows_to_dicts(fields: Sequence[str], rows: Iterable[Sequence[Any]]) -> List[dict]:
+    """Zip column tuples into response dicts without model validation."""
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def weak_etag(etag: str) -> str:
+    """The weak form of an entity tag, e.g. for a re-encoded representation."""
+    return etag if etag.startswith("W/") else f"W/{etag}"
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches ``etag`` (RFC 9110 weak comparison).
+
+    ``*`` matches any current representation; ``W/`` prefixes are ignored on
+    both sides, as If-None-Match always compares weakly.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.removeprefix("W/") == opaque
+        for candidate in _ENTITY_TAG.findall(if_none_match)
+    )
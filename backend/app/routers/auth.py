@@ -7,23 +7,85 @@ This module handles user registration, login, and authentication-related endpoin
 from datetime import timedelta
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status, Response
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_async_session
 from app.deps import get_current_active_user
 from app.models.user import User
-from app.schemas.user import UserCreate, UserLogin, UserRead
-from app.services.auth import ACCESS_TOKEN_EXPIRE_MINUTES, create_access_token
+from app.schemas.user import UserCreate, UserLogin, UserReadWithSettings
+from app.services.auth import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    create_access_token,
+)
+from app.services.refresh_token import RefreshTokenService
 from app.services.user import UserService
+from app.services.user_settings import UserSettingsService
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+INCLUDE_SETTINGS = Query(
+    False, description="Embed the user's settings, saving a GET /api/users/settings"
+)
 
-@router.post("/register", response_model=UserRead, status_code=status.HTTP_201_CREATED)
+# The refresh token is only ever sent to the auth endpoints
+REFRESH_COOKIE = "refresh_token"
+REFRESH_COOKIE_PATH = "/api/auth"
+
+
+def _set_session_cookies(response: Response, username: str, refresh_token: str) -> None:
+    """Set HTTP-only cookies with a new access token and the given refresh token."""
+    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data={"sub": username}, expires_delta=access_token_expires
+    )
+    response.set_cookie(
+        key="access_token",
+        value=access_token,
+        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # Convert to seconds
+        httponly=True,
+        secure=False,  # Set to True in production with HTTPS
+        samesite="lax",
+    )
+    response.set_cookie(
+        key=REFRESH_COOKIE,
+        value=refresh_token,
+        max_age=REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60,
+        path=REFRESH_COOKIE_PATH,
+        httponly=True,
+        secure=False,  # Set to True in production with HTTPS
+        samesite="lax",
+    )
+
+
+def _clear_session_cookies(response: Response) -> None:
+    response.delete_cookie(key="access_token", httponly=True, samesite="lax")
+    response.delete_cookie(
+        key=REFRESH_COOKIE, path=REFRESH_COOKIE_PATH, httponly=True, samesite="lax"
+    )
+
+
+async def _user_response(
+    db: AsyncSession, user: User, include_settings: bool
+) -> UserReadWithSettings:
+    """Build the user payload, with cached settings when requested."""
+    payload = UserReadWithSettings.model_validate(user)
+    if include_settings:
+        payload.settings = await UserSettingsService.get_cached_settings(db, user.id)
+    return payload
+
+
+@router.post(
+    "/register",
+    response_model=UserReadWithSettings,
+    response_model_exclude_none=True,
+    status_code=status.HTTP_201_CREATED,
+)
 async def register_user(
     user_create: UserCreate,
     response: Response,
+    include_settings: bool = INCLUDE_SETTINGS,
     db: AsyncSession = Depends(get_async_session),
 ) -> Any:
     """
@@ -35,10 +97,11 @@ async def register_user(
     Args:
         user_create: User registration data (username, password)
         response: FastAPI response object for setting cookies
+        include_settings: Embed the new user's default settings
         db: Database session
 
     Returns:
-        UserRead: The created user data (without password)
+        UserReadWithSettings: The created user data (without password)
 
     Raises:
         HTTPException: If username already exists
@@ -54,44 +117,35 @@ async def register_user(
     # Create the user
     user = await UserService.create_user(db, user_create)
 
-    # Create access token for auto-login
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
+    # Start a session for auto-login
+    refresh_token = await RefreshTokenService.issue(db, user.id)
+    _set_session_cookies(response, user.username, refresh_token)
 
-    # Set HTTP-only cookie
-    response.set_cookie(
-        key="access_token",
-        value=access_token,
-        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # Convert to seconds
-        httponly=True,
-        secure=False,  # Set to True in production with HTTPS
-        samesite="lax",
-    )
-
-    return user
+    return await _user_response(db, user, include_settings)
 
 
-@router.post("/login", response_model=UserRead)
+@router.post("/login", response_model=UserReadWithSettings, response_model_exclude_none=True)
 async def login_user(
     user_login: UserLogin,
     response: Response,
+    include_settings: bool = INCLUDE_SETTINGS,
     db: AsyncSession = Depends(get_async_session),
 ) -> Any:
     """
     Authenticate user and return user data with JWT token in HTTP-only cookie.
 
     Validates username and password, then sets a JWT access token
-    in an HTTP-only cookie for authenticated API requests.
+    in an HTTP-only cookie for authenticated API requests, and a refresh
+    token cookie for renewing it through /auth/refresh.
 
     Args:
         user_login: User login credentials (username, password)
         response: FastAPI response object for setting cookies
+        include_settings: Embed the user's settings
         db: Database session
 
     Returns:
-        UserRead: User data (without password)
+        UserReadWithSettings: User data (without password)
 
     Raises:
         HTTPException: If credentials are invalid
@@ -105,28 +159,18 @@ async def login_user(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Create access token
-    access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
-    )
-
-    # Set HTTP-only cookie
-    response.set_cookie(
-        key="access_token",
-        value=access_token,
-        max_age=ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # Convert to seconds
-        httponly=True,
-        secure=False,  # Set to True in production with HTTPS
-        samesite="lax",
-    )
+    # Start a session: a short-lived access token and a rotating refresh token
+    refresh_token = await RefreshTokenService.issue(db, user.id)
+    _set_session_cookies(response, user.username, refresh_token)
 
-    return user
+    return await _user_response(db, user, include_settings)
 
 
-@router.get("/me", response_model=UserRead)
+@router.get("/me", response_model=UserReadWithSettings, response_model_exclude_none=True)
 async def get_current_user_info(
+    include_settings: bool = INCLUDE_SETTINGS,
     current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_session),
 ) -> Any:
     """
     Get current user information.
@@ -135,31 +179,105 @@ async def get_current_user_info(
     Requires valid JWT token in Authorization header.
 
     Args:
+        include_settings: Embed the user's settings
         current_user: Current authenticated user from JWT token
+        db: Database session
 
     Returns:
-        UserRead: Current user's profile data
+        UserReadWithSettings: Current user's profile data
     """
-    return current_user
+    return await _user_response(db, current_user, include_settings)
 
 
-@router.post("/logout")
-async def logout_user(response: Response) -> Any:
+@router.post("/refresh", response_model=UserReadWithSettings, response_model_exclude_none=True)
+async def refresh_session(
+    request: Request,
+    response: Response,
+    include_settings: bool = INCLUDE_SETTINGS,
+    db: AsyncSession = Depends(get_async_session),
+) -> Any:
     """
-    Logout user by clearing the HTTP-only cookie.
+    Renew the access token from the refresh token cookie.
 
-    Removes the JWT token cookie from the client browser.
+    The refresh token is rotated: the presented one is spent and a new one
+    is set alongside the new access token. No password is checked, so this
+    is far cheaper than logging in again. Presenting a spent token revokes
+    every token of that login.
 
     Args:
+        request: FastAPI request object to access cookies
+        response: FastAPI response object for setting cookies
+        include_settings: Embed the user's settings
+        db: Database session
+
+    Returns:
+        UserReadWithSettings: User data (without password)
+
+    Raises:
+        HTTPException: If the refresh token is missing, expired, revoked or reused
+    """
+    token = request.cookies.get(REFRESH_COOKIE)
+    rotated = await RefreshTokenService.rotate(db, token) if token else None
+    if rotated is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Session expired",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user, refresh_token = rotated
+    _set_session_cookies(response, user.username, refresh_token)
+    return await _user_response(db, user, include_settings)
+
+
+@router.post("/logout")
+async def logout_user(
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Logout user by revoking the session and clearing the HTTP-only cookies.
+
+    Args:
+        request: FastAPI request object to access cookies
         response: FastAPI response object for clearing cookies
+        db: Database session
 
     Returns:
         dict: Success message
     """
-    response.delete_cookie(key="access_token", httponly=True, samesite="lax")
+    token = request.cookies.get(REFRESH_COOKIE)
+    if token:
+        await RefreshTokenService.revoke(db, token)
+    _clear_session_cookies(response)
     return {"message": "Successfully logged out"}
 
 
+@router.post("/logout-all")
+async def logout_all_sessions(
+    response: Response,
+    current_user: User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_session),
+) -> Any:
+    """
+    Log out everywhere by revoking all of the user's refresh tokens.
+
+    Access tokens already issued stay valid until they expire, at most
+    ACCESS_TOKEN_EXPIRE_MINUTES.
+
+    Args:
+        response: FastAPI response object for clearing cookies
+        current_user: Current authenticated user from JWT token
+        db: Database session
+
+    Returns:
+        dict: Success message and number of refresh tokens revoked
+    """
+    revoked = await RefreshTokenService.revoke_all(db, current_user.id)
+    _clear_session_cookies(response)
+    return {"message": "Logged out of all sessions", "revoked": revoked}
+
+
 @router.post("/verify-token")
 async def verify_user_token(
     current_user: User = Depends(get_current_active_user),
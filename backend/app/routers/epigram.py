@@ -1,17 +1,46 @@
 """API endpoints for epigram operations with async support."""
 
+import time
 from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache.epigram_of_bucket import epigram_of_bucket
 from app.db import get_async_session
-from app.schemas.epigram import EpigramCreate, EpigramRead, EpigramPaginatedResponse
+from app.impressions import impressions
+from app.schemas.epigram import (
+    EPIGRAM_IMPRESSIONS_FIELDS,
+    EPIGRAM_READ_FIELDS,
+    EpigramChangesResponse,
+    EpigramCreate,
+    EpigramImpressionsRead,
+    EpigramRead,
+    EpigramPaginatedResponse,
+)
 from app.deps import get_current_active_user
-from app.services.epigram import EpigramService
+from app.services.epigram import (
+    EpigramService,
+    decode_sync_cursor,
+    encode_sync_cursor,
+)
+from app.models.epigram import Epigram
 from app.models.user import User
+from app.responses import FastJSONResponse, dumps, etag_matches, rows_to_dicts
 
 router = APIRouter(prefix="/epigrams", tags=["Epigrams"])
 
+MAX_IDS_PER_REQUEST = 100
+
+ID_INDEX = EPIGRAM_READ_FIELDS.index("id")
+
+
+def _epigram_response(
+    epigram: Epigram, status_code: int = status.HTTP_200_OK
+) -> FastJSONResponse:
+    """Serialize an ORM epigram without a second round of model validation."""
+    content = {field: getattr(epigram, field) for field in EPIGRAM_READ_FIELDS}
+    return FastJSONResponse(content, status_code=status_code)
+
 
 async def get_epigram_service(
     session: AsyncSession = Depends(get_async_session)
@@ -20,6 +49,38 @@ async def get_epigram_service(
     return EpigramService(session)
 
 
+def _parse_ids(ids: str) -> List[int]:
+    """Parse a comma-separated ID list, dropping duplicates but keeping order."""
+    try:
+        parsed = [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail="ids must be comma-separated integers",
+        ) from e
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > MAX_IDS_PER_REQUEST:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT,
+            detail=f"ids must list between 1 and {MAX_IDS_PER_REQUEST} epigram IDs",
+        )
+    return parsed
+
+
+@router.get("", response_model=List[EpigramRead])
+async def get_epigrams_by_ids(
+    ids: str = Query(..., description="Comma-separated epigram IDs, e.g. 3,17,42"),
+    service: EpigramService = Depends(get_epigram_service),
+):
+    """Get approved epigrams by ID, in request order.
+
+    IDs that do not exist or are not approved are left out, so clients can
+    hydrate a prefetched ID list and drop whatever has gone away.
+    """
+    epigrams = await service.get_approved_by_ids(_parse_ids(ids))
+    return FastJSONResponse(epigrams)
+
+
 @router.get("/random/batch", response_model=List[EpigramRead])
 async def get_random_epigrams_batch(
     count: int = Query(
@@ -31,12 +92,65 @@ async def get_random_epigrams_batch(
     service: EpigramService = Depends(get_epigram_service),
 ):
     """Get multiple random epigrams for client caching (async version)."""
-    epigrams = await service.get_random_approved(count=count, exclude_id=current_id)
-    if not epigrams:
+    rows = await service.get_random_approved(count=count, exclude_id=current_id)
+    if not rows:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="No epigrams available"
         )
-    return epigrams
+    impressions.record(row[ID_INDEX] for row in rows)
+    return FastJSONResponse(rows_to_dicts(EPIGRAM_READ_FIELDS, rows))
+
+
+@router.get("/top", response_model=List[EpigramImpressionsRead])
+async def get_most_shown_epigrams(
+    limit: int = Query(default=10, ge=1, le=100, description="Number of epigrams to return"),
+    service: EpigramService = Depends(get_epigram_service),
+):
+    """Get the approved epigrams served most often by /random/batch.
+
+    Impressions are flushed in batches, so counts lag by up to
+    ``IMPRESSION_FLUSH_SECONDS``.
+    """
+    rows = await service.get_most_shown(limit)
+    return FastJSONResponse(rows_to_dicts(EPIGRAM_IMPRESSIONS_FIELDS, rows))
+
+
+@router.get("/bucket", response_model=EpigramRead)
+async def get_bucket_epigram(
+    request: Request,
+    interval: int = Query(
+        default=5, ge=1, le=240, description="Rotation interval in minutes"
+    ),
+    service: EpigramService = Depends(get_epigram_service),
+):
+    """Get the shared epigram for the current time bucket (publicly cacheable).
+
+    Everyone asking within the same ``interval``-minute bucket gets the same
+    epigram, with ``Cache-Control: public`` expiring at the bucket boundary,
+    so browsers and reverse proxies can serve it until it rotates.
+    """
+    now = time.time()
+    period = interval * 60
+    bucket = int(now // period)
+
+    cached = epigram_of_bucket.get(interval, bucket)
+    if cached is not None:
+        etag, body = cached
+    else:
+        generation = epigram_of_bucket.generation
+        row = await service.get_bucket_epigram(interval, bucket)
+        if row is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND, detail="No epigrams available"
+            )
+        body = dumps(dict(zip(EPIGRAM_READ_FIELDS, row)))
+        etag = epigram_of_bucket.set(interval, bucket, body, generation)
+
+    max_age = max(1, int((bucket + 1) * period - now))
+    headers = {"Cache-Control": f"public, max-age={max_age}", "ETag": etag}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @router.post("/", response_model=EpigramRead, status_code=status.HTTP_201_CREATED)
@@ -48,7 +162,7 @@ async def create_epigram(
     """Create new epigram (authenticated users only)."""
     try:
         epigram = await service.create_epigram(payload, current_user.id)
-        return epigram
+        return _epigram_response(epigram, status_code=status.HTTP_201_CREATED)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
 
@@ -57,25 +171,62 @@ async def create_epigram(
 async def list_my_epigrams(
     page: int = Query(1, ge=1, description="Page number (1-based)"),
     limit: int = Query(10, ge=1, le=100, description="Items per page (max 100)"),
-    service: EpigramService = Depends(get_epigram_service),
     current_user: User = Depends(get_current_active_user),
 ):
     """Get epigrams created by current authenticated user with pagination."""
-    epigrams, total = await service.get_user_epigrams(current_user.id, page=page, limit=limit)
+    rows, total = await EpigramService.get_user_epigrams_coalesced(
+        current_user.id, page=page, limit=limit
+    )
 
     # Calculate pagination metadata
     pages = (total + limit - 1) // limit  # Ceiling division
     has_next = page < pages
     has_prev = page > 1
 
-    return EpigramPaginatedResponse(
-        items=epigrams,
-        total=total,
-        page=page,
-        size=limit,
-        pages=pages,
-        has_next=has_next,
-        has_prev=has_prev,
+    # Same shape as EpigramPaginatedResponse, built without re-validating rows
+    return FastJSONResponse(
+        {
+            "items": rows_to_dicts(EPIGRAM_READ_FIELDS, rows),
+            "total": total,
+            "page": page,
+            "size": limit,
+            "pages": pages,
+            "has_next": has_next,
+            "has_prev": has_prev,
+        }
+    )
+
+
+@router.get("/mine/changes", response_model=EpigramChangesResponse)
+async def sync_my_epigrams(
+    since: Optional[str] = Query(
+        None, description="Cursor from the previous sync; omit for a full sync"
+    ),
+    limit: int = Query(500, ge=1, le=1000, description="Maximum entries in this page"),
+    service: EpigramService = Depends(get_epigram_service),
+    current_user: User = Depends(get_current_active_user),
+):
+    """Get epigrams of the current user created, updated or deleted since a cursor.
+
+    Clients keep the returned cursor with their cached history and send it
+    back to receive only what changed; repeat while ``has_more`` is true.
+    """
+    try:
+        position = decode_sync_cursor(since) if since else None
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_CONTENT, detail="Invalid sync cursor"
+        ) from e
+
+    changes = await service.get_user_changes(current_user.id, position, limit)
+    return FastJSONResponse(
+        {
+            "changed": rows_to_dicts(EPIGRAM_READ_FIELDS, changes.changed),
+            "deleted": changes.deleted,
+            "cursor": encode_sync_cursor(changes.cursor),
+            "has_more": changes.has_more,
+            "reset": changes.reset,
+        }
     )
 
 
@@ -92,7 +243,7 @@ async def update_epigram(
     """Update an existing epigram (owner only)."""
     try:
         epigram = await service.update_epigram(epigram_id, payload, current_user.id)
-        return epigram
+        return _epigram_response(epigram)
     except ValueError as e:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e)) from e
     except PermissionError as e:
@@ -6,7 +6,7 @@ This module handles user-specific settings management for authenticated users.
 
 from typing import Any
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.db import get_async_session
@@ -34,17 +34,9 @@ async def get_user_settings(
         db: Database session
 
     Returns:
-        UserSettingsRead: User's current settings
-
-    Raises:
-        HTTPException: If user settings not found
+        UserSettingsRead: User's current settings, defaults if none were saved
     """
-    settings = await UserSettingsService.get_user_settings(db, current_user.id)
-    if not settings:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User settings not found"
-        )
-    return settings
+    return await UserSettingsService.get_cached_settings(db, current_user.id)
 
 
 @router.put("/settings", response_model=UserSettingsRead)
@@ -66,18 +58,10 @@ async def update_user_settings(
 
     Returns:
         UserSettingsRead: Updated user settings
-
-    Raises:
-        HTTPException: If user settings not found
     """
-    settings = await UserSettingsService.update_user_settings(
+    return await UserSettingsService.update_user_settings(
         db, current_user.id, settings_update
     )
-    if not settings:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User settings not found"
-        )
-    return settings
 
 
 @router.delete("/settings")
@@ -88,8 +72,8 @@ async def delete_user_settings(
     """
     Delete current user's settings (reset to defaults).
 
-    Removes the authenticated user's custom settings.
-    Default settings will be recreated on next access.
+    Overwrites the authenticated user's custom settings with the
+    defaults in a single upsert.
 
     Args:
         current_user: Current authenticated user from JWT token
@@ -97,17 +81,6 @@ async def delete_user_settings(
 
     Returns:
         dict: Success message
-
-    Raises:
-        HTTPException: If user settings not found
     """
-    success = await UserSettingsService.delete_user_settings(db, current_user.id)
-    if not success:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND, detail="User settings not found"
-        )
-
-    # Create default settings
-    await UserSettingsService.create_default_settings(db, current_user.id)
-
+    await UserSettingsService.reset_user_settings(db, current_user.id)
     return {"message": "User settings reset to defaults"}
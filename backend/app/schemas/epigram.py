@@ -35,6 +35,17 @@ class EpigramRead(BaseModel):
     updated_at: datetime = Field(..., description="Last update timestamp")
 
 
+class EpigramImpressionsRead(EpigramRead):
+    """Epigram with how often it has been served."""
+
+    impressions: int = Field(..., description="Times served by /random/batch")
+
+
+# Field order used when serializing epigram rows directly, bypassing validation
+EPIGRAM_READ_FIELDS = tuple(EpigramRead.model_fields)
+EPIGRAM_IMPRESSIONS_FIELDS = tuple(EpigramImpressionsRead.model_fields)
+
+
 class PaginatedResponse(BaseModel, Generic[T]):
     """Generic paginated response."""
 
@@ -51,3 +62,15 @@ class EpigramPaginatedResponse(PaginatedResponse[EpigramRead]):
     """Paginated epigram response."""
 
     # This class inherits all functionality from PaginatedResponse
+
+
+class EpigramChangesResponse(BaseModel):
+    """Changes to the current user's epigrams since a sync cursor."""
+
+    changed: List[EpigramRead] = Field(..., description="Epigrams created or updated")
+    deleted: List[int] = Field(..., description="IDs of deleted epigrams")
+    cursor: str = Field(..., description="Pass as `since` on the next sync")
+    has_more: bool = Field(..., description="Whether to sync again straight away")
+    reset: bool = Field(
+        ..., description="Whether to drop locally cached epigrams before applying this page"
+    )
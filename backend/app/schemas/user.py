@@ -90,6 +90,11 @@ class UserSettingsRead(BaseModel):
         from_attributes = True
 
 
+# User Response with settings embedded, to save the follow-up settings request
+class UserReadWithSettings(UserRead):
+    settings: Optional[UserSettingsRead] = None
+
+
 # JWT Token
 class Token(BaseModel):
     access_token: str
@@ -1,28 +1,69 @@
+import hashlib
+import hmac
 import os
+import secrets
+import time
 from datetime import datetime, timedelta
 from typing import Optional
 
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 
+from app.metrics import ARGON2_DURATION
 
-# Password hashing
-pwd_context = CryptContext(schemes=["argon2"], deprecated="auto")
+
+# Password hashing. The defaults are passlib's; pick values for the target
+# machine with `python -m app.cli.argon2_calibrate`. Stored hashes with other
+# parameters are rehashed on the next successful login.
+ARGON2_MEMORY_KIB = int(os.getenv("ARGON2_MEMORY_KIB", "65536"))
+ARGON2_TIME_COST = int(os.getenv("ARGON2_TIME_COST", "3"))
+ARGON2_PARALLELISM = int(os.getenv("ARGON2_PARALLELISM", "4"))
+
+pwd_context = CryptContext(
+    schemes=["argon2"],
+    deprecated="auto",
+    argon2__memory_cost=ARGON2_MEMORY_KIB,
+    argon2__rounds=ARGON2_TIME_COST,
+    argon2__parallelism=ARGON2_PARALLELISM,
+)
 
 # JWT settings
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-in-production")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "120"))
 
+# Refresh tokens
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+# A rotated token presented again within this many seconds is refused without
+# revoking its family: tabs refreshing at the same moment, not a stolen token
+REFRESH_TOKEN_REUSE_GRACE_SECONDS = int(os.getenv("REFRESH_TOKEN_REUSE_GRACE_SECONDS", "10"))
+
+
+_ARGON2_VERIFY = ARGON2_DURATION.labels("verify")
+_ARGON2_HASH = ARGON2_DURATION.labels("hash")
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a plain password against its hash."""
-    return pwd_context.verify(plain_password, hashed_password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.verify(plain_password, hashed_password)
+    finally:
+        _ARGON2_VERIFY.observe(time.perf_counter() - started)
 
 
 def get_password_hash(password: str) -> str:
     """Hash a password using Argon2."""
-    return pwd_context.hash(password)
+    started = time.perf_counter()
+    try:
+        return pwd_context.hash(password)
+    finally:
+        _ARGON2_HASH.observe(time.perf_counter() - started)
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a stored hash was made with other than the configured parameters."""
+    return pwd_context.needs_update(hashed_password)
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -48,3 +89,18 @@ def verify_token(token: str) -> Optional[str]:
         return username
     except JWTError:
         return None
+
+
+def create_refresh_token() -> str:
+    """Create an opaque refresh token with 256 bits of randomness."""
+    return secrets.token_urlsafe(32)
+
+
+def hash_refresh_token(token: str) -> str:
+    """Keyed SHA-256 of a refresh token, as stored and looked up.
+
+    Refresh tokens are random, not chosen by users, so a fast hash is enough;
+    the key keeps a leaked table from being checked against stolen cookies
+    without the secret.
+    """
+    return hmac.new(SECRET_KEY.encode(), token.encode(), hashlib.sha256).hexdigest()
@@ -1,12 +1,91 @@
 """Service layer for epigram operations."""
 
-from typing import List, Optional, Tuple
-from sqlalchemy import func
+import os
+import random
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from sqlalchemy import BigInteger, any_, bindparam, delete, func, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
-from app.models.epigram import Epigram, EpigramStatus
-from app.schemas.epigram import EpigramCreate
+from app.cache.approved_ids import approved_ids
+from app.cache.corpus import corpus_store
+from app.cache.epigram_objects import epigram_objects
+from app.cache.epigram_of_bucket import bucket_pick
+from app.cache.invalidation import EPIGRAM, invalidation_bus, publish
+from app.cache.single_flight import SingleFlight
+from app.cache.weighted_sampling import weighted_sampler
+from app.db import async_engine
+from app.fingerprint import NEAR_DUPLICATE_SIMILARITY, author_key, fingerprint
+from app.models.epigram import Epigram, EpigramImpressions, EpigramStatus, EpigramTombstone
+from app.responses import rows_to_dicts
+from app.schemas.epigram import EPIGRAM_READ_FIELDS, EpigramCreate
+
+# Columns selected for read paths, in EpigramRead field order
+EPIGRAM_READ_COLUMNS = tuple(getattr(Epigram, field) for field in EPIGRAM_READ_FIELDS)
+
+# Tombstones are kept this long; older sync cursors get a full resync instead
+TOMBSTONE_RETENTION = timedelta(days=int(os.getenv("TOMBSTONE_RETENTION_DAYS", "30")))
+
+# updated_at is stamped when the writing transaction starts, so a write can
+# commit a little after later stamps are visible. Final sync cursors stay this
+# far behind the clock, so such late commits are sent on the next sync.
+SYNC_SETTLE = timedelta(seconds=5)
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+# Position in a user's change feed: (timestamp, epigram ID)
+SyncKey = Tuple[datetime, int]
+
+MAX_EPIGRAM_ID = 2**31 - 1
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def encode_sync_cursor(key: SyncKey) -> str:
+    """Opaque cursor string for a feed position."""
+    timestamp, epigram_id = key
+    return f"{(_utc(timestamp) - EPOCH) // timedelta(microseconds=1)}.{epigram_id}"
+
+
+def decode_sync_cursor(cursor: str) -> SyncKey:
+    """Parse a cursor from ``encode_sync_cursor``.
+
+    Raises:
+        ValueError: If the cursor is malformed
+    """
+    micros, _, epigram_id = cursor.partition(".")
+    key_id = int(epigram_id)
+    # IDs are 32-bit integer columns; larger values would fail in the driver
+    if not 0 <= key_id <= MAX_EPIGRAM_ID:
+        raise ValueError(f"Epigram ID out of range: {key_id}")
+    try:
+        return EPOCH + timedelta(microseconds=int(micros)), key_id
+    except OverflowError as e:
+        raise ValueError(f"Timestamp out of range: {micros}") from e
+
+
+class EpigramChanges(NamedTuple):
+    """One page of a user's change feed."""
+
+    # Row tuples in EPIGRAM_READ_FIELDS order, created or updated since the cursor
+    changed: List[Sequence[Any]]
+    # IDs deleted since the cursor
+    deleted: List[int]
+    cursor: SyncKey
+    has_more: bool
+    # The client must drop what it has cached: first sync, or a cursor
+    # older than the tombstones
+    reset: bool
+
+
+# Identical concurrent /mine page reads share one pair of queries; any epigram
+# write detaches in-flight pages so later readers see it
+user_pages = SingleFlight("user_epigram_pages")
+invalidation_bus.subscribe(EPIGRAM, lambda _keys: user_pages.forget())
 
 
 class EpigramService:
@@ -17,7 +96,7 @@ class EpigramService:
         
     async def get_random_approved(
         self, count: int = 1, exclude_id: Optional[int] = None
-    ) -> List[Epigram]:
+    ) -> List[Sequence[Any]]:
         """Get random approved epigrams.
 
         Args:
@@ -25,19 +104,128 @@ class EpigramService:
             exclude_id: ID to exclude from results
 
         Returns:
-            List of random approved epigrams
+            List of row tuples in EPIGRAM_READ_FIELDS order
         """
-        stmt = select(Epigram).where(Epigram.status == EpigramStatus.APPROVED)
+        # Weighted draws from the alias table when RANDOM_WEIGHTING is set;
+        # uniform until its first build
+        if weighted_sampler.enabled:
+            rows = weighted_sampler.sample(count, exclude_id)
+            if rows is not None:
+                return rows
+
+        # Served from memory once the corpus store is loaded
+        rows = corpus_store.sample(count, exclude_id)
+        if rows is not None:
+            return rows
+
+        # Pick IDs from the preloaded approved set and fetch them by primary key
+        sampled_ids = approved_ids.sample(count, exclude_id)
+        if sampled_ids:
+            stmt = select(*EPIGRAM_READ_COLUMNS).where(
+                Epigram.id.in_(sampled_ids), Epigram.status == EpigramStatus.APPROVED
+            )
+            result = await self.session.execute(stmt)
+            rows = list(result.tuples().all())
+            if rows:
+                random.shuffle(rows)
+                return rows
+
+        # Fall back to a full random scan while the ID set is cold or stale
+        stmt = select(*EPIGRAM_READ_COLUMNS).where(Epigram.status == EpigramStatus.APPROVED)
         if exclude_id is not None:
             stmt = stmt.where(Epigram.id != exclude_id)
             
         stmt = stmt.order_by(func.random()).limit(count)
         result = await self.session.execute(stmt)
-        return list(result.scalars().all())
+        return list(result.tuples().all())
         
+    async def get_bucket_epigram(
+        self, interval_minutes: int, bucket: int
+    ) -> Optional[Sequence[Any]]:
+        """Get the deterministic approved epigram for a time bucket.
+
+        Args:
+            interval_minutes: Bucket length
+            bucket: Bucket number, i.e. epoch seconds // (interval_minutes * 60)
+
+        Returns:
+            Row tuple in EPIGRAM_READ_FIELDS order, or None if nothing is approved
+        """
+        ids = approved_ids.ids
+        if approved_ids.loaded and len(ids):
+            row = await self._get_approved_row(bucket_pick(interval_minutes, bucket, ids))
+            if row is not None:
+                return row
+
+        # Same pick over the stored IDs while the ID set is cold or stale
+        result = await self.session.execute(
+            select(Epigram.id).where(Epigram.status == EpigramStatus.APPROVED)
+        )
+        picked = bucket_pick(interval_minutes, bucket, result.scalars())
+        if picked is None:
+            return None
+        return await self._get_approved_row(picked)
+
+    async def _get_approved_row(self, epigram_id: int) -> Optional[Sequence[Any]]:
+        stmt = select(*EPIGRAM_READ_COLUMNS).where(
+            Epigram.id == epigram_id, Epigram.status == EpigramStatus.APPROVED
+        )
+        return (await self.session.execute(stmt)).tuples().first()
+
+    async def get_approved_by_ids(self, ids: Sequence[int]) -> List[dict]:
+        """Get approved epigrams by ID through the object cache.
+
+        Cache misses are fetched together in one query.
+
+        Args:
+            ids: Epigram IDs, without duplicates
+
+        Returns:
+            Epigram dicts in request order; missing or unapproved IDs are skipped
+        """
+        found, missing = epigram_objects.get_many(ids)
+        if missing:
+            generation = epigram_objects.generation
+            if self.session.get_bind().dialect.name == "postgresql":
+                # One array parameter, so every batch size shares a prepared statement
+                id_filter = Epigram.id == any_(bindparam("ids", missing, type_=ARRAY(BigInteger)))
+            else:
+                id_filter = Epigram.id.in_(missing)
+            stmt = select(*EPIGRAM_READ_COLUMNS).where(
+                id_filter, Epigram.status == EpigramStatus.APPROVED
+            )
+            result = await self.session.execute(stmt)
+            loaded: Dict[int, Optional[dict]] = dict.fromkeys(missing)
+            for epigram in rows_to_dicts(EPIGRAM_READ_FIELDS, result.tuples()):
+                loaded[epigram["id"]] = epigram
+            epigram_objects.set_many(loaded, generation)
+            found.update(loaded)
+        return [found[epigram_id] for epigram_id in ids if found[epigram_id] is not None]
+
+    async def get_most_shown(self, limit: int = 10) -> List[Sequence[Any]]:
+        """Get the approved epigrams with the most impressions.
+
+        Counts come from app.impressions and trail the live totals by up to
+        one flush interval per worker.
+
+        Args:
+            limit: Number of epigrams to return
+
+        Returns:
+            Row tuples in EPIGRAM_READ_FIELDS order followed by the impression count
+        """
+        stmt = (
+            select(*EPIGRAM_READ_COLUMNS, EpigramImpressions.impressions)
+            .join(EpigramImpressions, EpigramImpressions.epigram_id == Epigram.id)
+            .where(Epigram.status == EpigramStatus.APPROVED)
+            .order_by(EpigramImpressions.impressions.desc(), EpigramImpressions.epigram_id)
+            .limit(limit)
+        )
+        return list((await self.session.execute(stmt)).tuples().all())
+
     async def get_user_epigrams(
         self, user_id: int, page: int = 1, limit: int = 10
-    ) -> Tuple[List[Epigram], int]:
+    ) -> Tuple[List[Sequence[Any]], int]:
         """Get epigrams by user ID with pagination.
 
         Args:
@@ -46,7 +234,7 @@ class EpigramService:
             limit: Number of items per page
 
         Returns:
-            Tuple of (epigrams list, total count)
+            Tuple of (row tuples in EPIGRAM_READ_FIELDS order, total count)
         """
         # Get total count
         count_stmt = select(func.count()).where(Epigram.user_id == user_id)
@@ -56,17 +244,106 @@ class EpigramService:
         # Get paginated results
         offset = (page - 1) * limit
         stmt = (
-            select(Epigram)
+            select(*EPIGRAM_READ_COLUMNS)
             .where(Epigram.user_id == user_id)
             .order_by(Epigram.updated_at.desc())
             .offset(offset)
             .limit(limit)
         )
         result = await self.session.execute(stmt)
-        epigrams = list(result.scalars().all())
+        epigrams = list(result.tuples().all())
 
         return epigrams, total
-        
+
+    @staticmethod
+    async def get_user_epigrams_coalesced(
+        user_id: int, page: int = 1, limit: int = 10
+    ) -> Tuple[List[Sequence[Any]], int]:
+        """Like :meth:`get_user_epigrams`, sharing one query between concurrent identical reads.
+
+        Runs on its own short-lived session, so writes not yet committed by
+        the caller are not seen; for the read-only /mine endpoint.
+        """
+        return await user_pages.do(
+            (user_id, page, limit), _load_user_epigrams, user_id, page, limit
+        )
+
+    async def get_user_changes(
+        self, user_id: int, since: Optional[SyncKey], limit: int = 500
+    ) -> EpigramChanges:
+        """Get a user's epigram changes after a feed position.
+
+        Updated rows and tombstones are two keyset streams ordered by
+        (timestamp, id); one page is the first ``limit`` entries of both merged.
+
+        Args:
+            user_id: User ID
+            since: Position returned by the previous call, or None for everything
+            limit: Maximum changed plus deleted entries
+
+        Returns:
+            The page, with the position to pass next time
+        """
+        now = datetime.now(timezone.utc)
+        reset = since is None or _utc(since[0]) < now - TOMBSTONE_RETENTION
+        if reset:
+            since = None
+
+        stmt = select(*EPIGRAM_READ_COLUMNS).where(Epigram.user_id == user_id)
+        if since is not None:
+            stmt = stmt.where(tuple_(Epigram.updated_at, Epigram.id) > tuple_(*since))
+        stmt = stmt.order_by(Epigram.updated_at, Epigram.id).limit(limit + 1)
+        rows = list((await self.session.execute(stmt)).tuples().all())
+
+        tombstones: List[Tuple[int, datetime]] = []
+        if since is not None:
+            stmt = (
+                select(EpigramTombstone.epigram_id, EpigramTombstone.deleted_at)
+                .where(
+                    EpigramTombstone.user_id == user_id,
+                    tuple_(EpigramTombstone.deleted_at, EpigramTombstone.epigram_id)
+                    > tuple_(*since),
+                )
+                .order_by(EpigramTombstone.deleted_at, EpigramTombstone.epigram_id)
+                .limit(limit + 1)
+            )
+            tombstones = list((await self.session.execute(stmt)).tuples().all())
+
+        id_index = EPIGRAM_READ_FIELDS.index("id")
+        updated_index = EPIGRAM_READ_FIELDS.index("updated_at")
+        entries = sorted(
+            [((_utc(row[updated_index]), row[id_index]), row) for row in rows]
+            + [((_utc(deleted_at), epigram_id), None) for epigram_id, deleted_at in tombstones],
+            key=lambda entry: entry[0],
+        )
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        cursor = entries[-1][0] if entries else since or (EPOCH, 0)
+        if not has_more:
+            settled = (now - SYNC_SETTLE, 0)
+            cursor = max(min(cursor, settled), since or (EPOCH, 0))
+        return EpigramChanges(
+            changed=[row for _, row in entries if row is not None],
+            deleted=[key[1] for key, row in entries if row is None],
+            cursor=cursor,
+            has_more=has_more,
+            reset=reset,
+        )
+
+    async def compact_tombstones(self) -> int:
+        """Delete tombstones older than the retention window.
+
+        Returns:
+            Number of tombstones removed
+        """
+        cutoff = datetime.now(timezone.utc) - TOMBSTONE_RETENTION
+        result = await self.session.execute(
+            delete(EpigramTombstone).where(EpigramTombstone.deleted_at < cutoff)
+        )
+        await self.session.commit()
+        return result.rowcount
+
     async def create_epigram(self, payload: EpigramCreate, user_id: int) -> Epigram:
         """Create a new epigram.
 
@@ -87,11 +364,15 @@ class EpigramService:
         epigram = Epigram(
             text=payload.text,
             author=payload.author,
+            fingerprint=fingerprint(payload.text, payload.author),
+            author_key=author_key(payload.author),
             user_id=user_id,
             status=EpigramStatus.APPROVED,
         )
 
         self.session.add(epigram)
+        await self.session.flush()
+        publish(self.session, EPIGRAM, epigram.id)
         await self.session.commit()
         await self.session.refresh(epigram)
         return epigram
@@ -129,8 +410,11 @@ class EpigramService:
 
         epigram.text = payload.text
         epigram.author = payload.author
+        epigram.fingerprint = fingerprint(payload.text, payload.author)
+        epigram.author_key = author_key(payload.author)
 
         self.session.add(epigram)
+        publish(self.session, EPIGRAM, epigram_id)
         await self.session.commit()
         await self.session.refresh(epigram)
         return epigram
@@ -154,12 +438,15 @@ class EpigramService:
             raise PermissionError("You can only delete your own epigrams")
 
         await self.session.delete(epigram)
+        # Lets clients syncing /mine/changes learn about the deletion
+        self.session.add(EpigramTombstone(epigram_id=epigram_id, user_id=epigram.user_id))
+        publish(self.session, EPIGRAM, epigram_id)
         await self.session.commit()
         
     async def find_duplicate(
         self, epigram_text: str, author: Optional[str]
     ) -> Optional[Epigram]:
-        """Find case-insensitive duplicate.
+        """Find a duplicate or near-duplicate.
 
         Args:
             epigram_text: Text to check
@@ -168,20 +455,12 @@ class EpigramService:
         Returns:
             Matching epigram or None
         """
-        # Handle None values safely
-        author_lower = author.lower() if author else ""
-
-        stmt = select(Epigram).where(
-            func.lower(Epigram.text) == epigram_text.lower(),
-            func.coalesce(func.lower(Epigram.author), "") == author_lower,
-        )
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        return await self._find_duplicate(epigram_text, author, None)
 
     async def find_duplicate_excluding(
         self, epigram_text: str, author: Optional[str], exclude_id: int
     ) -> Optional[Epigram]:
-        """Find case-insensitive duplicate excluding a specific ID.
+        """Find a duplicate or near-duplicate excluding a specific ID.
 
         Args:
             epigram_text: Text to check
@@ -191,14 +470,50 @@ class EpigramService:
         Returns:
             Matching epigram or None
         """
-        # Handle None values safely
-        author_lower = author.lower() if author else ""
+        return await self._find_duplicate(epigram_text, author, exclude_id)
 
-        stmt = select(Epigram).where(
-            func.lower(Epigram.text) == epigram_text.lower(),
-            func.coalesce(func.lower(Epigram.author), "") == author_lower,
-            Epigram.id != exclude_id,
+    async def _find_duplicate(
+        self, epigram_text: str, author: Optional[str], exclude_id: Optional[int]
+    ) -> Optional[Epigram]:
+        """Same fingerprint, else the most similar text by the same author.
+
+        The fingerprint is one probe of its unique index. On Postgres the
+        trigram GiST index then returns the nearest text with the same author
+        key at ``NEAR_DUPLICATE_SIMILARITY`` or above; texts by other authors
+        or below the threshold are filtered inside the index scan.
+        """
+        stmt = select(Epigram).where(Epigram.fingerprint == fingerprint(epigram_text, author))
+        if exclude_id is not None:
+            stmt = stmt.where(Epigram.id != exclude_id)
+        existing = (await self.session.execute(stmt)).scalar_one_or_none()
+        if (
+            existing is not None
+            or NEAR_DUPLICATE_SIMILARITY <= 0
+            or self.session.get_bind().dialect.name != "postgresql"
+        ):
+            return existing
+
+        # Threshold of the % operator, for this transaction only
+        threshold = func.set_config(
+            "pg_trgm.similarity_threshold", str(NEAR_DUPLICATE_SIMILARITY), True
         )
-        result = await self.session.execute(stmt)
-        return result.scalar_one_or_none()
+        await self.session.execute(select(threshold))
+        stmt = (
+            select(Epigram)
+            .where(
+                Epigram.author_key == author_key(author),
+                Epigram.text.op("%")(epigram_text),
+            )
+            .order_by(Epigram.text.op("<->")(epigram_text))
+            .limit(1)
+        )
+        if exclude_id is not None:
+            stmt = stmt.where(Epigram.id != exclude_id)
+        return (await self.session.execute(stmt)).scalar_one_or_none()
+
 
+async def _load_user_epigrams(
+    user_id: int, page: int, limit: int
+) -> Tuple[List[Sequence[Any]], int]:
+    async with AsyncSession(async_engine) as session:
+        return await EpigramService(session).get_user_epigrams(user_id, page, limit)
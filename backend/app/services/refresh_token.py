@@ -0,0 +1,169 @@
+import logging
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.metrics import REFRESH_TOKENS
+from app.models.user import RefreshToken, User
+from app.services.auth import (
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    REFRESH_TOKEN_REUSE_GRACE_SECONDS,
+    create_refresh_token,
+    hash_refresh_token,
+)
+
+logger = logging.getLogger(__name__)
+
+REFRESH_TOKEN_LIFETIME = timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS)
+REUSE_GRACE = timedelta(seconds=REFRESH_TOKEN_REUSE_GRACE_SECONDS)
+
+
+def _utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+class RefreshTokenService:
+    """Service for issuing, rotating and revoking refresh tokens."""
+
+    @staticmethod
+    async def issue(db: AsyncSession, user_id: int, family_id: Optional[str] = None) -> str:
+        """Store a new refresh token and return it; only its hash is kept.
+
+        Args:
+            db: Database session
+            user_id: Owner of the token
+            family_id: Family to continue when rotating, a new one when None
+
+        Returns:
+            The refresh token, to be set as a cookie
+        """
+        token = create_refresh_token()
+        db.add(
+            RefreshToken(
+                user_id=user_id,
+                family_id=family_id or uuid.uuid4().hex,
+                token_hash=hash_refresh_token(token),
+                expires_at=datetime.now(timezone.utc) + REFRESH_TOKEN_LIFETIME,
+            )
+        )
+        await db.flush()
+        return token
+
+    @staticmethod
+    async def rotate(db: AsyncSession, token: str) -> Optional[Tuple[User, str]]:
+        """Exchange a refresh token for the next one in its family.
+
+        One indexed lookup finds the token and its user; no password hashing
+        is involved. A token that was already rotated (outside the reuse grace
+        period) has been replayed, so its whole family is revoked and
+        committed before returning.
+
+        Returns:
+            Tuple of (user, new refresh token), or None if the token is not
+            accepted
+        """
+        now = datetime.now(timezone.utc)
+        row = (
+            await db.execute(
+                select(RefreshToken, User)
+                .join(User, User.id == RefreshToken.user_id)
+                .where(RefreshToken.token_hash == hash_refresh_token(token))
+            )
+        ).first()
+        if row is None:
+            REFRESH_TOKENS.labels("unknown").inc()
+            return None
+        stored, user = row
+        if stored.revoked_at is not None:
+            REFRESH_TOKENS.labels("revoked").inc()
+            return None
+        if _utc(stored.expires_at) <= now or not user.is_active:
+            REFRESH_TOKENS.labels("expired").inc()
+            return None
+        if stored.rotated_at is not None:
+            if now - _utc(stored.rotated_at) <= REUSE_GRACE:
+                REFRESH_TOKENS.labels("concurrent").inc()
+                return None
+            await RefreshTokenService.revoke_family(db, stored.family_id)
+            await db.commit()
+            REFRESH_TOKENS.labels("reused").inc()
+            logger.warning(
+                "Rotated refresh token reused for user %s; revoked its family", user.id
+            )
+            return None
+
+        # Only one of two concurrent rotations of the same token wins
+        result = await db.execute(
+            update(RefreshToken)
+            .where(
+                RefreshToken.id == stored.id,
+                RefreshToken.rotated_at.is_(None),
+                RefreshToken.revoked_at.is_(None),
+            )
+            .values(rotated_at=now)
+        )
+        if result.rowcount != 1:
+            REFRESH_TOKENS.labels("concurrent").inc()
+            return None
+        new_token = await RefreshTokenService.issue(db, user.id, stored.family_id)
+        REFRESH_TOKENS.labels("rotated").inc()
+        return user, new_token
+
+    @staticmethod
+    async def revoke_family(db: AsyncSession, family_id: str) -> int:
+        """Revoke every token descended from the same login."""
+        result = await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def revoke(db: AsyncSession, token: str) -> int:
+        """Revoke the session a refresh token belongs to, e.g. on logout.
+
+        Returns:
+            Number of tokens revoked
+        """
+        family_id = (
+            await db.execute(
+                select(RefreshToken.family_id).where(
+                    RefreshToken.token_hash == hash_refresh_token(token)
+                )
+            )
+        ).scalar_one_or_none()
+        if family_id is None:
+            return 0
+        return await RefreshTokenService.revoke_family(db, family_id)
+
+    @staticmethod
+    async def revoke_all(db: AsyncSession, user_id: int) -> int:
+        """Revoke all of a user's sessions.
+
+        Returns:
+            Number of tokens revoked
+        """
+        result = await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.now(timezone.utc))
+        )
+        return result.rowcount
+
+    @staticmethod
+    async def purge_expired(db: AsyncSession) -> int:
+        """Delete expired tokens; rotated ones are kept until then for reuse detection.
+
+        Returns:
+            Number of tokens removed
+        """
+        result = await db.execute(
+            delete(RefreshToken).where(RefreshToken.expires_at < datetime.now(timezone.utc))
+        )
+        await db.commit()
+        return result.rowcount
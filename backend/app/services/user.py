@@ -1,13 +1,43 @@
-from typing import Optional
+import asyncio
+from typing import Any, Dict, Optional
 
+from sqlalchemy import update
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import make_transient_to_detached
 from sqlmodel import select
 
+from app.cache.invalidation import USER, invalidation_bus, publish
+from app.cache.single_flight import SingleFlight
+from app.db import async_engine
 from app.models.user import User
+from app.post_commit import defer
 from app.schemas.user import UserCreate
-from app.services.auth import get_password_hash, verify_password
+from app.services.auth import get_password_hash, password_needs_rehash, verify_password
 from app.services.user_settings import UserSettingsService
 
+user_lookups = SingleFlight("user_by_username")
+invalidation_bus.subscribe(USER, user_lookups.forget)
+
+
+async def _load_user_by_username(username: str) -> Optional[Dict[str, Any]]:
+    # Column values rather than an instance, so no two callers share one object
+    async with AsyncSession(async_engine) as session:
+        user = await UserService.get_user_by_username(session, username)
+        return None if user is None else user.model_dump()
+
+
+async def _rehash_password(user_id: int, username: str, old_hash: str, password: str) -> None:
+    """Replace a hash made with outdated parameters, unless the password changed since."""
+    new_hash = await asyncio.to_thread(get_password_hash, password)
+    async with AsyncSession(async_engine) as session:
+        await session.execute(
+            update(User)
+            .where(User.id == user_id, User.hashed_password == old_hash)
+            .values(hashed_password=new_hash)
+        )
+        publish(session, USER, username)
+        await session.commit()
+
 
 class UserService:
     """Service for user-related database operations."""
@@ -23,6 +53,7 @@ class UserService:
         await db.flush()
         await db.refresh(db_user)
         await UserSettingsService.create_default_settings(db, db_user.id)
+        publish(db, USER, db_user.username)
 
         return db_user
 
@@ -33,6 +64,20 @@ class UserService:
         result = await db.execute(statement)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_user_by_username_coalesced(username: str) -> Optional[User]:
+        """Get user by username, sharing one query between concurrent identical lookups.
+
+        Runs on its own short-lived session. Each caller gets its own detached
+        instance, which does not reflect the caller's uncommitted writes.
+        """
+        values = await user_lookups.do(username, _load_user_by_username, username)
+        if values is None:
+            return None
+        user = User(**values)
+        make_transient_to_detached(user)
+        return user
+
     @staticmethod
     async def get_user_by_id(db: AsyncSession, user_id: int) -> Optional[User]:
         """Get user by ID."""
@@ -48,4 +93,17 @@ class UserService:
         if not user or not verify_password(password, user.hashed_password):
             return None
 
+        # Upgrade the stored hash to the configured Argon2 parameters after the
+        # response, so the login itself pays for one verification only
+        if password_needs_rehash(user.hashed_password):
+            await defer(
+                db,
+                _rehash_password,
+                user.id,
+                user.username,
+                user.hashed_password,
+                password,
+                name="rehash_password",
+            )
+
         return user
@@ -1,22 +1,102 @@
 from datetime import datetime
-from typing import Optional
-
+from sqlalchemy import exists, literal, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlmodel import select
 
+from app.cache.invalidation import SETTINGS, publish
+from app.cache.user_settings import user_settings_cache
 from app.models.user import UserSettings
-from app.schemas.user import UserSettingsCreate, UserSettingsUpdate
+from app.schemas.user import UserSettingsCreate, UserSettingsRead, UserSettingsUpdate
+
+DEFAULT_SETTINGS = UserSettingsCreate().model_dump()
+
+_INSERT_COLUMNS = [
+    "user_id",
+    "auto_reload_enabled",
+    "auto_reload_interval_minutes",
+    "created_at",
+    "updated_at",
+]
+
+
+def _dialect(db: AsyncSession) -> str:
+    return db.get_bind().dialect.name
+
+
+def _upsert(db: AsyncSession, user_id: int, values: dict):
+    """Dialect-specific INSERT of a settings row, ready for an ON CONFLICT clause."""
+    insert = pg_insert if _dialect(db) == "postgresql" else sqlite_insert
+    now = datetime.utcnow()
+    return insert(UserSettings).values(
+        user_id=user_id, created_at=now, updated_at=now, **values
+    )
 
 
 class UserSettingsService:
     """Service for user settings-related database operations."""
 
     @staticmethod
-    async def get_user_settings(db: AsyncSession, user_id: int) -> Optional[UserSettings]:
-        """Get user settings by user ID."""
+    async def get_user_settings(db: AsyncSession, user_id: int) -> UserSettings:
+        """Get user settings by user ID, creating the defaults if the row is missing.
+
+        On Postgres this is one statement: the existing row, or the row inserted
+        by a conditional ``INSERT ... SELECT`` that only runs (and only draws a
+        sequence value) when no row exists.
+        """
+        if _dialect(db) == "postgresql":
+            existing = (
+                select(UserSettings).where(UserSettings.user_id == user_id).cte("existing")
+            )
+            now = datetime.utcnow()
+            defaults = select(
+                literal(user_id),
+                literal(DEFAULT_SETTINGS["auto_reload_enabled"]),
+                literal(DEFAULT_SETTINGS["auto_reload_interval_minutes"]),
+                literal(now),
+                literal(now),
+            ).where(~exists(select(existing.c.id)))
+            inserted = (
+                pg_insert(UserSettings)
+                .from_select(_INSERT_COLUMNS, defaults)
+                .on_conflict_do_nothing(index_elements=[UserSettings.user_id])
+                .returning(*UserSettings.__table__.c)
+                .cte("inserted")
+            )
+            statement = select(UserSettings).from_statement(
+                union_all(select(existing), select(inserted))
+            )
+            db_settings = (await db.execute(statement)).scalar_one_or_none()
+            if db_settings is not None:
+                return db_settings
+            # A concurrent request inserted the row after this statement's snapshot
+        else:
+            statement = select(UserSettings).where(UserSettings.user_id == user_id)
+            db_settings = (await db.execute(statement)).scalar_one_or_none()
+            if db_settings is not None:
+                return db_settings
+            await db.execute(
+                _upsert(db, user_id, DEFAULT_SETTINGS).on_conflict_do_nothing(
+                    index_elements=[UserSettings.user_id]
+                )
+            )
+
         statement = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await db.execute(statement)
-        return result.scalar_one_or_none()
+        return (await db.execute(statement)).scalar_one()
+
+    @staticmethod
+    async def get_cached_settings(db: AsyncSession, user_id: int) -> UserSettingsRead:
+        """Get user settings from the per-user cache, loading them on a miss."""
+        cached = user_settings_cache.get(user_id)
+        if cached is not None:
+            return cached
+
+        generation = user_settings_cache.generation
+        db_settings = await UserSettingsService.get_user_settings(db, user_id)
+        settings = UserSettingsRead.model_validate(db_settings)
+        user_settings_cache.set(settings, generation)
+        return settings
 
     @staticmethod
     async def create_user_settings(
@@ -30,48 +110,32 @@ class UserSettingsService:
         )
 
         db.add(db_settings)
+        publish(db, SETTINGS, user_id)
         await db.commit()
         await db.refresh(db_settings)
+        user_settings_cache.set(UserSettingsRead.model_validate(db_settings))
         return db_settings
 
     @staticmethod
     async def create_default_settings(db: AsyncSession, user_id: int) -> UserSettings:
         """Create default user settings."""
-        db_settings = UserSettings(
-            user_id=user_id, auto_reload_enabled=False, auto_reload_interval_minutes=5
-        )
+        db_settings = UserSettings(user_id=user_id, **DEFAULT_SETTINGS)
 
         db.add(db_settings)
         await db.flush()
         await db.refresh(db_settings)
+        publish(db, SETTINGS, user_id)
         return db_settings
 
     @staticmethod
     async def update_user_settings(
         db: AsyncSession, user_id: int, settings: UserSettingsUpdate
-    ) -> Optional[UserSettings]:
-        """Update user settings."""
-        statement = select(UserSettings).where(UserSettings.user_id == user_id)
-        result = await db.execute(statement)
-        db_settings = result.scalar_one_or_none()
-
-        if not db_settings:
-            return None
-
-        if settings.auto_reload_enabled is not None:
-            db_settings.auto_reload_enabled = settings.auto_reload_enabled
-
-        if settings.auto_reload_interval_minutes is not None:
-            db_settings.auto_reload_interval_minutes = (
-                settings.auto_reload_interval_minutes
-            )
-
-        db_settings.updated_at = datetime.utcnow()
-
-        db.add(db_settings)
-        await db.commit()
-        await db.refresh(db_settings)
-        return db_settings
+    ) -> UserSettings:
+        """Update the provided fields, creating the row with defaults if missing."""
+        changes = settings.model_dump(exclude_none=True)
+        return await UserSettingsService._write_settings(
+            db, user_id, {**DEFAULT_SETTINGS, **changes}, changes
+        )
 
     @staticmethod
     async def delete_user_settings(db: AsyncSession, user_id: int) -> bool:
@@ -84,5 +148,35 @@ class UserSettingsService:
             return False
 
         await db.delete(db_settings)
+        publish(db, SETTINGS, user_id)
         await db.commit()
         return True
+
+    @staticmethod
+    async def reset_user_settings(db: AsyncSession, user_id: int) -> UserSettings:
+        """Reset user settings to defaults, keeping the row in place."""
+        return await UserSettingsService._write_settings(
+            db, user_id, DEFAULT_SETTINGS, DEFAULT_SETTINGS
+        )
+
+    @staticmethod
+    async def _write_settings(
+        db: AsyncSession, user_id: int, insert_values: dict, update_values: dict
+    ) -> UserSettings:
+        """Upsert in one statement, commit, and write the result through to the cache."""
+        upsert = _upsert(db, user_id, insert_values)
+        upsert = upsert.on_conflict_do_update(
+            index_elements=[UserSettings.user_id],
+            set_={**update_values, "updated_at": datetime.utcnow()},
+        ).returning(UserSettings)
+        result = await db.execute(
+            select(UserSettings).from_statement(upsert),
+            execution_options={"populate_existing": True},
+        )
+        db_settings = result.scalar_one()
+        snapshot = UserSettingsRead.model_validate(db_settings)
+
+        publish(db, SETTINGS, user_id)
+        await db.commit()
+        user_settings_cache.set(snapshot)
+        return db_settings
@@ -0,0 +1,72 @@
+"""
+Compare two load benchmark reports produced by ``benchmarks/load.py``.
+
+Prints throughput and latency deltas per scenario and concurrency level and
+exits non-zero if p99 latency regressed beyond ``--max-p99-regression``.
+
+Usage:
+    python benchmarks/compare.py baseline.json candidate.json
+"""
+
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Dict, Tuple
+
+
+def load(path: str) -> Tuple[dict, Dict[Tuple[str, int], dict]]:
+    report = json.loads(Path(path).read_text(encoding="utf-8"))
+    results = {(row["scenario"], row["concurrency"]): row for row in report["results"]}
+    return report["meta"], results
+
+
+def change(before: float, after: float) -> str:
+    if not before:
+        return "n/a"
+    return f"{(after - before) / before * 100:+.1f}%"
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Compare two load benchmark reports.")
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument(
+        "--max-p99-regression",
+        type=float,
+        default=None,
+        help="Fail if any p99 grows by more than this fraction (e.g. 0.2)",
+    )
+    args = parser.parse_args()
+
+    base_meta, base = load(args.baseline)
+    cand_meta, cand = load(args.candidate)
+    print(f"baseline  {base_meta.get('commit')}  {base_meta.get('timestamp')}")
+    print(f"candidate {cand_meta.get('commit')}  {cand_meta.get('timestamp')}")
+    print(f"{'scenario':<10} {'conc':>4} {'rps':>22} {'p50 ms':>22} {'p99 ms':>22} {'err':>6}")
+
+    regressed = False
+    for key in sorted(base.keys() & cand.keys()):
+        before, after = base[key], cand[key]
+        rps_before, rps_after = before["throughput_rps"], after["throughput_rps"]
+        rps = f"{rps_before}->{rps_after} {change(rps_before, rps_after)}"
+        p50_before, p50_after = before["latency_ms"]["p50"], after["latency_ms"]["p50"]
+        p99_before, p99_after = before["latency_ms"]["p99"], after["latency_ms"]["p99"]
+        print(
+            f"{key[0]:<10} {key[1]:>4} {rps:>22} "
+            f"{f'{p50_before}->{p50_after}':>14} {change(p50_before, p50_after):>7} "
+            f"{f'{p99_before}->{p99_after}':>14} {change(p99_before, p99_after):>7} "
+            f"{after['error_rate']:>6}"
+        )
+        if (
+            args.max_p99_regression is not None
+            and p99_before
+            and (p99_after - p99_before) / p99_before > args.max_p99_regression
+        ):
+            regressed = True
+
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,126 @@
+"""
+Memory footprint of the in-memory corpus store.
+
+Fills a ``CorpusStore`` with synthetic approved epigrams (text, authors and
+timestamps as produced by ``benchmarks/datagen.py``) and reports the bytes
+held by its columns, the growth of the process's resident set size, and the
+cost of sampling a ``/random/batch`` worth of rows. It then writes a binary
+snapshot and times mapping it back, the cold-start path of a new worker.
+``--compare-dicts`` also measures the same rows held as one dict per
+epigram, for reference.
+
+No database is needed.
+
+Usage:
+    python benchmarks/corpus_memory.py [--rows 1000000] [--compare-dicts]
+"""
+
+import argparse
+import gc
+import os
+import resource
+import sys
+import tempfile
+import time
+import timeit
+from typing import Iterator
+
+# Add backend directory to sys.path so the app package can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# The store module builds the engine on import; nothing here connects to it
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/unused")
+
+from app.cache.corpus import CorpusStore  # noqa: E402
+from app.cache.corpus_snapshot import read_snapshot, write_snapshot  # noqa: E402
+from app.schemas.epigram import EPIGRAM_READ_FIELDS  # noqa: E402
+from benchmarks.datagen import CorpusGenerator  # noqa: E402
+
+MB = 2**20
+
+
+def rss_bytes() -> int:
+    """Current resident set size, or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm", encoding="ascii") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        # ru_maxrss is kilobytes on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def generated_rows(count: int, users: int, seed: int) -> Iterator[tuple]:
+    """Approved rows in ID order: (id, text, author, user_id, created_at, updated_at)."""
+    generator = CorpusGenerator(users=users, epigrams=count, seed=seed)
+    for number in range(count):
+        created, updated = generator.timestamps()
+        owner = generator.rng.randrange(users) + 1
+        yield (
+            number + 1,
+            generator.text(number),
+            generator.author(),
+            owner,
+            created,
+            updated,
+        )
+
+
+def measure(label: str, build) -> object:
+    """Build a structure and print its RSS growth."""
+    gc.collect()
+    before = rss_bytes()
+    started = time.perf_counter()
+    result = build()
+    elapsed = time.perf_counter() - started
+    gc.collect()
+    grown = rss_bytes() - before
+    print(f"{label:<12} rss +{grown / MB:8.1f} MB   built in {elapsed:6.1f}s")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=20_000)
+    parser.add_argument("--compare-dicts", action="store_true")
+    args = parser.parse_args()
+
+    store = CorpusStore()
+    measure("corpus store", lambda: store.build(generated_rows(args.rows, args.users, args.seed)))
+    print(
+        f"{'':<12} columns {store.nbytes / MB:8.1f} MB   "
+        f"{store.nbytes / max(len(store), 1):6.1f} bytes/row over {len(store)} rows"
+    )
+
+    seconds = timeit.timeit(lambda: store.sample(20), number=args.iterations)
+    print(f"{'sample(20)':<12} {seconds / args.iterations * 1_000_000:8.1f} us/call")
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "corpus.snapshot")
+        started = time.perf_counter()
+        size = write_snapshot(path, store.columns, store.watermark)
+        written = time.perf_counter()
+        mapped = CorpusStore()
+        mapped.install(*read_snapshot(path))
+        mapped.sample(20)
+        print(
+            f"{'snapshot':<12} {size / MB:8.1f} MB   written in {written - started:6.2f}s, "
+            f"mapped and sampled in {(time.perf_counter() - written) * 1000:.1f} ms"
+        )
+        del mapped
+
+    if args.compare_dicts:
+        dicts = measure(
+            "dicts",
+            lambda: [
+                dict(zip(EPIGRAM_READ_FIELDS, row))
+                for row in generated_rows(args.rows, args.users, args.seed)
+            ],
+        )
+        print(f"{'':<12} {len(dicts)} rows")
+
+
+if __name__ == "__main__":
+    main()
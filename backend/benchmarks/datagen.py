@@ -0,0 +1,310 @@
+"""
+Synthetic data generator for scale testing.
+
+Bulk-loads N users, M epigrams and a ``user_settings`` row for most users
+into Postgres with ``COPY``. Epigram text is built from the seed corpus
+vocabulary with a similar length distribution, authors follow a Zipf-like
+distribution over a pool of names (about a fifth are anonymous), and
+epigrams per user are heavily skewed so a few users have long ``/mine``
+histories. Every generated user has the password ``GENERATED_PASSWORD``.
+
+Usage:
+    python benchmarks/datagen.py --users 50000 --epigrams 1000000 --truncate
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import random
+import string
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+import asyncpg
+
+# Add backend directory to sys.path so the app package can be imported
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(BACKEND_DIR)
+
+from sqlalchemy.engine import make_url  # noqa: E402
+
+from app.db import ASYNC_DATABASE_URL  # noqa: E402
+from app.fingerprint import author_key, fingerprint  # noqa: E402
+from app.models.epigram import EpigramStatus  # noqa: E402
+from app.services.auth import get_password_hash  # noqa: E402
+
+GENERATED_PASSWORD = "Generated-Passw0rd!"
+USERNAME_PREFIX = "gen_"
+COPY_CHUNK_ROWS = 100_000
+
+# Share of users that get a user_settings row; the rest exercise the missing-row path
+SETTINGS_COVERAGE = 0.95
+ANONYMOUS_SHARE = 0.2
+STATUS_WEIGHTS = (
+    (EpigramStatus.APPROVED, 90),
+    (EpigramStatus.PENDING, 7),
+    (EpigramStatus.REJECTED, 3),
+)
+HISTORY_DAYS = 730
+
+_FIRST_NAMES = (
+    "Ada", "Alan", "Barbara", "Brian", "Claude", "Donald", "Edsger", "Frances", "Grace",
+    "Guido", "Harold", "John", "Ken", "Linus", "Margaret", "Niklaus", "Radia", "Rob",
+    "Tim", "Tony", "Yukihiro", "Bjarne", "Dennis", "Fred", "Leslie", "Robin", "Sophie",
+)
+_LAST_NAMES = (
+    "Lovelace", "Turing", "Liskov", "Kernighan", "Shannon", "Knuth", "Dijkstra", "Allen",
+    "Hopper", "van Rossum", "Abelson", "McCarthy", "Thompson", "Torvalds", "Hamilton",
+    "Wirth", "Perlman", "Pike", "Peters", "Hoare", "Matsumoto", "Stroustrup", "Ritchie",
+    "Brooks", "Lamport", "Milner", "Wilson",
+)
+
+
+def database_dsn() -> str:
+    """asyncpg DSN for the configured database."""
+    url = make_url(ASYNC_DATABASE_URL)
+    if url.get_backend_name() != "postgresql":
+        raise SystemExit("The data generator needs a Postgres DATABASE_URL")
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+def load_seed_corpus() -> Tuple[List[str], List[int], List[str]]:
+    """Vocabulary, word counts per epigram and author names from the seed file."""
+    with open(os.path.join(BACKEND_DIR, "app", "seeds", "epigrams.json"), encoding="utf-8") as f:
+        seeds = json.load(f)
+    words: List[str] = []
+    lengths: List[int] = []
+    authors = []
+    for text, author in seeds:
+        tokens = text.rstrip(".!?").split()
+        words.extend(tokens)
+        lengths.append(len(tokens))
+        if author and author != "Unknown":
+            authors.append(author)
+    return words, lengths, authors
+
+
+def author_pool(seed_authors: Sequence[str], size: int, rng: random.Random) -> List[str]:
+    """Seed authors first, then synthetic names, ordered by popularity rank."""
+    pool = list(dict.fromkeys(seed_authors))
+    combinations = [f"{first} {last}" for first in _FIRST_NAMES for last in _LAST_NAMES]
+    rng.shuffle(combinations)
+    pool.extend(name for name in combinations if name not in pool)
+    return pool[:size]
+
+
+def zipf_weights(count: int, exponent: float) -> List[float]:
+    """Cumulative Zipf weights for ranks 1..count."""
+    return list(itertools.accumulate(1 / rank**exponent for rank in range(1, count + 1)))
+
+
+def unique_tag(number: int) -> str:
+    """Short lowercase word encoding ``number``, keeping generated texts unique."""
+    letters = string.ascii_lowercase
+    tag = ""
+    number += 26 * 26  # at least three letters so tags read as words
+    while number:
+        number, remainder = divmod(number, 26)
+        tag = letters[remainder] + tag
+    return tag
+
+
+class CorpusGenerator:
+    """Produces epigram, user and settings rows with realistic distributions."""
+
+    def __init__(self, users: int, epigrams: int, seed: int = 42):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.epigrams = epigrams
+        self.words, self.lengths, seed_authors = load_seed_corpus()
+        self.authors = author_pool(seed_authors, 500, self.rng)
+        self.author_weights = zipf_weights(len(self.authors), 1.1)
+        # Skewed ownership: user rank r owns roughly 1/r^0.8 of the corpus
+        self.owner_weights = zipf_weights(users, 0.8)
+        self.now = datetime.now(timezone.utc)
+
+    def text(self, number: int) -> str:
+        words = self.rng.choices(self.words, k=max(2, self.rng.choice(self.lengths) - 1))
+        tag = unique_tag(number)
+        # Keep the tag inside the 150 character limit
+        while len(words) > 1 and sum(len(word) + 1 for word in words) + len(tag) > 149:
+            words.pop()
+        return " ".join(words + [tag]).capitalize() + "."
+
+    def author(self) -> Optional[str]:
+        if self.rng.random() < ANONYMOUS_SHARE:
+            return None
+        return self.rng.choices(self.authors, cum_weights=self.author_weights)[0]
+
+    def timestamps(self) -> Tuple[datetime, datetime]:
+        created = self.now - timedelta(seconds=self.rng.uniform(0, HISTORY_DAYS * 86400))
+        updated = created
+        if self.rng.random() < 0.1:
+            updated = created + (self.now - created) * self.rng.random()
+        return created, updated
+
+    def user_rows(self, first_id: int, hashed_password: str) -> Iterator[tuple]:
+        for offset in range(self.users):
+            created, _ = self.timestamps()
+            user_id = first_id + offset
+            yield (user_id, f"{USERNAME_PREFIX}{user_id}", hashed_password, True, created)
+
+    def settings_rows(self, first_id: int) -> Iterator[tuple]:
+        for offset in range(self.users):
+            if self.rng.random() >= SETTINGS_COVERAGE:
+                continue
+            created, updated = self.timestamps()
+            enabled = self.rng.random() < 0.3
+            interval = self.rng.choice((1, 5, 5, 5, 10, 15, 30, 60, 240))
+            yield (first_id + offset, enabled, interval, created, updated)
+
+    def epigram_rows(self, first_user_id: int, first_tag: int) -> Iterator[tuple]:
+        statuses = [status for status, _ in STATUS_WEIGHTS]
+        status_weights = [weight for _, weight in STATUS_WEIGHTS]
+        for number in range(self.epigrams):
+            owner_rank = self.rng.choices(range(self.users), cum_weights=self.owner_weights)[0]
+            created, updated = self.timestamps()
+            text, author = self.text(first_tag + number), self.author()
+            yield (
+                text,
+                author,
+                # Unique: the tag in every text survives normalization
+                fingerprint(text, author),
+                author_key(author),
+                int(self.rng.choices(statuses, weights=status_weights)[0]),
+                first_user_id + owner_rank,
+                created,
+                updated,
+            )
+
+
+def chunks(rows: Iterator[tuple], size: int = COPY_CHUNK_ROWS) -> Iterator[List[tuple]]:
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def copy_rows(
+    connection: asyncpg.Connection, table: str, columns: Sequence[str], rows: Iterator[tuple]
+) -> int:
+    """COPY rows into a table in chunks, returning the number of rows loaded."""
+    total = 0
+    for chunk in chunks(rows):
+        await connection.copy_records_to_table(table, records=chunk, columns=list(columns))
+        total += len(chunk)
+        print(f"  {table}: {total:,} rows", file=sys.stderr)
+    return total
+
+
+async def generate(
+    users: int, epigrams: int, truncate: bool = False, seed: int = 42, dsn: Optional[str] = None
+) -> dict:
+    """Load generated data and return row counts and timings.
+
+    Args:
+        users: Number of users to create
+        epigrams: Number of epigrams to create
+        truncate: Empty users, settings and epigrams first
+        seed: Random seed, so runs are reproducible
+        dsn: asyncpg DSN, defaults to DATABASE_URL
+
+    Returns:
+        Summary with loaded row counts and elapsed seconds per table
+    """
+    generator = CorpusGenerator(users, epigrams, seed)
+    hashed_password = get_password_hash(GENERATED_PASSWORD)
+    connection = await asyncpg.connect(dsn or database_dsn())
+    timings = {}
+    try:
+        if truncate:
+            await connection.execute(
+                "TRUNCATE epigrams, user_settings, users RESTART IDENTITY CASCADE"
+            )
+        first_user_id = await connection.fetchval("SELECT coalesce(max(id), 0) + 1 FROM users")
+        first_tag = await connection.fetchval("SELECT coalesce(max(id), 0) FROM epigrams")
+
+        async with connection.transaction():
+            started = time.perf_counter()
+            await copy_rows(
+                connection,
+                "users",
+                ("id", "username", "hashed_password", "is_active", "created_at"),
+                generator.user_rows(first_user_id, hashed_password),
+            )
+            # Explicit IDs bypass the sequence, so move it past them
+            await connection.execute(
+                "SELECT setval(pg_get_serial_sequence('users', 'id'), "
+                "(SELECT max(id) FROM users))"
+            )
+            timings["users"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            settings_count = await copy_rows(
+                connection,
+                "user_settings",
+                (
+                    "user_id",
+                    "auto_reload_enabled",
+                    "auto_reload_interval_minutes",
+                    "created_at",
+                    "updated_at",
+                ),
+                generator.settings_rows(first_user_id),
+            )
+            timings["user_settings"] = time.perf_counter() - started
+
+            started = time.perf_counter()
+            await copy_rows(
+                connection,
+                "epigrams",
+                (
+                    "text",
+                    "author",
+                    "fingerprint",
+                    "author_key",
+                    "status",
+                    "user_id",
+                    "created_at",
+                    "updated_at",
+                ),
+                generator.epigram_rows(first_user_id, first_tag),
+            )
+            timings["epigrams"] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        await connection.execute("ANALYZE users, user_settings, epigrams")
+        timings["analyze"] = time.perf_counter() - started
+    finally:
+        await connection.close()
+
+    return {
+        "users": users,
+        "user_settings": settings_count,
+        "epigrams": epigrams,
+        "first_user_id": first_user_id,
+        "seconds": {name: round(value, 2) for name, value in timings.items()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-load synthetic users and epigrams.")
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--epigrams", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument(
+        "--truncate", action="store_true", help="Delete ALL users, settings and epigrams first"
+    )
+    args = parser.parse_args()
+
+    summary = asyncio.run(generate(args.users, args.epigrams, args.truncate, args.seed))
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
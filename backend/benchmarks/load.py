@@ -0,0 +1,369 @@
+"""
+End-to-end HTTP load benchmark for the API.
+
+Drives the real ASGI app either in-process (httpx ASGITransport) or over a
+local uvicorn, against the configured Postgres database or a throwaway SQLite
+stand-in. Each scenario runs a weighted mix of operations at one or more
+concurrency levels and reports throughput, latency percentiles and error
+rates as JSON, so runs on different commits can be compared with
+``benchmarks/compare.py``.
+
+Usage:
+    python benchmarks/load.py --sqlite --scenario mixed --concurrency 1,8,32
+    python benchmarks/load.py --mode uvicorn --workers 2 --output results.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.append(str(BACKEND_DIR))
+
+PASSWORD = "Bench-Passw0rd!"
+
+# Operation weights per scenario
+SCENARIOS: Dict[str, Dict[str, int]] = {
+    "mixed": {
+        "random_batch": 55,
+        "mine_page": 15,
+        "settings_get": 10,
+        "settings_put": 5,
+        "login": 5,
+        "create": 10,
+    },
+    "anonymous": {"random_batch": 100},
+    "history": {"mine_page": 100},
+    "settings": {"settings_get": 70, "settings_put": 30},
+    "login": {"login": 100},
+    "create": {"create": 100},
+}
+
+
+@dataclass
+class OperationStats:
+    """Latencies and error counts for one operation."""
+
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    def summary(self, elapsed: float) -> dict:
+        return summarize(self.latencies, self.errors, elapsed)
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies: List[float], errors: int, elapsed: float) -> dict:
+    """Throughput, error rate and latency percentiles in milliseconds."""
+    ordered = sorted(latencies)
+    total = len(ordered)
+    return {
+        "requests": total,
+        "errors": errors,
+        "error_rate": round(errors / total, 4) if total else 0.0,
+        "throughput_rps": round(total / elapsed, 1) if elapsed else 0.0,
+        "latency_ms": {
+            "mean": round(statistics.fmean(ordered) * 1000, 2) if ordered else 0.0,
+            "p50": round(percentile(ordered, 0.50) * 1000, 2),
+            "p95": round(percentile(ordered, 0.95) * 1000, 2),
+            "p99": round(percentile(ordered, 0.99) * 1000, 2),
+            "max": round(ordered[-1] * 1000, 2) if ordered else 0.0,
+        },
+    }
+
+
+class VirtualUser:
+    """One logged-in client issuing operations in a loop."""
+
+    def __init__(self, client: httpx.AsyncClient, username: str, run_id: str):
+        self.client = client
+        self.username = username
+        self.run_id = run_id
+        self.created = 0
+        self.pages = 1
+
+    async def random_batch(self) -> httpx.Response:
+        return await self.client.get("/api/epigrams/random/batch", params={"count": 5})
+
+    async def mine_page(self) -> httpx.Response:
+        page = random.randint(1, self.pages)
+        return await self.client.get("/api/epigrams/mine", params={"page": page, "limit": 10})
+
+    async def settings_get(self) -> httpx.Response:
+        return await self.client.get("/api/users/settings")
+
+    async def settings_put(self) -> httpx.Response:
+        return await self.client.put(
+            "/api/users/settings",
+            json={
+                "auto_reload_enabled": random.random() < 0.5,
+                "auto_reload_interval_minutes": random.randint(1, 240),
+            },
+        )
+
+    async def login(self) -> httpx.Response:
+        return await self.client.post(
+            "/api/auth/login", json={"username": self.username, "password": PASSWORD}
+        )
+
+    async def create(self) -> httpx.Response:
+        self.created += 1
+        return await self.client.post(
+            "/api/epigrams/",
+            json={
+                "text": f"bench {self.run_id} {self.username} #{self.created}",
+                "author": "bench",
+            },
+        )
+
+
+async def run_level(
+    users: List[VirtualUser], weights: Dict[str, int], duration: float
+) -> Tuple[dict, Dict[str, OperationStats]]:
+    """Run all virtual users concurrently for ``duration`` seconds."""
+    operations = list(weights)
+    weight_values = [weights[name] for name in operations]
+    per_operation: Dict[str, OperationStats] = {name: OperationStats() for name in operations}
+    deadline = time.perf_counter() + duration
+
+    async def drive(user: VirtualUser) -> None:
+        while time.perf_counter() < deadline:
+            name = random.choices(operations, weights=weight_values)[0]
+            stats = per_operation[name]
+            started = time.perf_counter()
+            try:
+                response = await getattr(user, name)()
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            stats.latencies.append(time.perf_counter() - started)
+            stats.errors += failed
+
+    started = time.perf_counter()
+    await asyncio.gather(*(drive(user) for user in users))
+    elapsed = time.perf_counter() - started
+
+    all_latencies = [value for stats in per_operation.values() for value in stats.latencies]
+    all_errors = sum(stats.errors for stats in per_operation.values())
+    return summarize(all_latencies, all_errors, elapsed), per_operation
+
+
+async def prepare_users(
+    make_client: Callable[[], httpx.AsyncClient], count: int, run_id: str, epigrams_each: int
+) -> List[VirtualUser]:
+    """Register users, give each some epigrams for paging, and keep them logged in."""
+    users = []
+    for index in range(count):
+        client = make_client()
+        user = VirtualUser(client, f"bench_{run_id}_{index}", run_id)
+        response = await client.post(
+            "/api/auth/register", json={"username": user.username, "password": PASSWORD}
+        )
+        response.raise_for_status()
+        for _ in range(epigrams_each):
+            await user.create()
+        user.pages = max(1, epigrams_each // 10)
+        users.append(user)
+    return users
+
+
+def setup_sqlite() -> str:
+    """Create a temporary SQLite database with the schema and seed epigrams."""
+    path = Path(tempfile.mkdtemp(prefix="isit-bench-")) / "bench.db"
+    url = f"sqlite+aiosqlite:///{path}"
+    os.environ["DATABASE_URL"] = url
+
+    # pylint: disable=import-outside-toplevel
+    from sqlalchemy import create_engine
+    from sqlmodel import Session, SQLModel
+
+    from app.fingerprint import author_key, fingerprint
+    from app.models import Epigram, User
+    from app.models.epigram import EpigramStatus
+
+    engine = create_engine(f"sqlite:///{path}")
+    SQLModel.metadata.create_all(engine)
+    seeds = json.loads((BACKEND_DIR / "app" / "seeds" / "epigrams.json").read_text())
+    with Session(engine) as session:
+        system = User(username="system", hashed_password="!", is_active=False)
+        session.add(system)
+        session.flush()
+        for text, author in seeds:
+            session.add(
+                Epigram(
+                    text=text,
+                    author=author,
+                    fingerprint=fingerprint(text, author),
+                    author_key=author_key(author),
+                    user_id=system.id,
+                    status=EpigramStatus.APPROVED,
+                )
+            )
+        session.commit()
+    engine.dispose()
+    return url
+
+
+async def wait_ready(client: httpx.AsyncClient, timeout: float = 60.0) -> None:
+    """Poll /ready until the app reports warm-up complete."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/ready")).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        await asyncio.sleep(0.2)
+    raise TimeoutError("App did not become ready")
+
+
+def git_revision() -> Optional[str]:
+    """Current commit hash, if run inside the repository."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=BACKEND_DIR, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_benchmark(args: argparse.Namespace) -> dict:
+    run_id = f"{int(time.time()) % 100000}{random.randint(0, 999):03d}"
+    levels = [int(level) for level in args.concurrency.split(",")]
+    scenarios = args.scenario.split(",")
+    limits = httpx.Limits(max_connections=max(levels) * 2)
+
+    server: Optional[subprocess.Popen] = None
+    if args.mode == "uvicorn":
+        base_url = f"http://127.0.0.1:{args.port}"
+        server = subprocess.Popen(  # pylint: disable=consider-using-with
+            [
+                sys.executable, "-m", "uvicorn", "app.main:app",
+                "--port", str(args.port), "--workers", str(args.workers), "--no-access-log",
+            ],
+            cwd=BACKEND_DIR,
+            env=os.environ.copy(),
+        )
+
+        def make_client() -> httpx.AsyncClient:
+            return httpx.AsyncClient(base_url=base_url, limits=limits, timeout=30.0)
+
+        lifespan = None
+    else:
+        from app.main import app  # pylint: disable=import-outside-toplevel
+
+        transport = httpx.ASGITransport(app=app)
+
+        def make_client() -> httpx.AsyncClient:
+            return httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=30.0)
+
+        lifespan = app.router.lifespan_context(app)
+
+    results = []
+    try:
+        if lifespan is not None:
+            await lifespan.__aenter__()  # pylint: disable=unnecessary-dunder-call
+        probe = make_client()
+        await wait_ready(probe)
+        await probe.aclose()
+
+        users = await prepare_users(make_client, max(levels), run_id, args.epigrams_per_user)
+        for scenario in scenarios:
+            weights = SCENARIOS[scenario]
+            for level in levels:
+                if args.warmup:
+                    await run_level(users[:level], weights, args.warmup)
+                overall, per_operation = await run_level(users[:level], weights, args.duration)
+                elapsed = args.duration
+                results.append(
+                    {
+                        "scenario": scenario,
+                        "concurrency": level,
+                        **overall,
+                        "operations": {
+                            name: stats.summary(elapsed)
+                            for name, stats in per_operation.items()
+                        },
+                    }
+                )
+                print(
+                    f"{scenario:<10} c={level:<4} {overall['throughput_rps']:>9} rps  "
+                    f"p50={overall['latency_ms']['p50']}ms p99={overall['latency_ms']['p99']}ms "
+                    f"errors={overall['errors']}",
+                    file=sys.stderr,
+                )
+        for user in users:
+            await user.client.aclose()
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+
+    return {
+        "meta": {
+            "commit": git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "mode": args.mode,
+            "workers": args.workers if args.mode == "uvicorn" else 1,
+            "database": "sqlite" if args.sqlite else "postgresql",
+            "duration_seconds": args.duration,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load benchmark for the Is It API.")
+    parser.add_argument("--mode", choices=("inprocess", "uvicorn"), default="inprocess")
+    parser.add_argument("--sqlite", action="store_true", help="Use a temporary SQLite database")
+    parser.add_argument(
+        "--scenario", default="mixed", help=f"Comma-separated, from: {', '.join(SCENARIOS)}"
+    )
+    parser.add_argument("--concurrency", default="1,8,32", help="Comma-separated levels")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per level")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Warm-up seconds per level")
+    parser.add_argument("--epigrams-per-user", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--output", help="Write JSON results here instead of stdout")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        setup_sqlite()
+    elif not os.getenv("DATABASE_URL"):
+        parser.error("DATABASE_URL is not set; pass --sqlite for a local stand-in")
+
+    report = asyncio.run(run_benchmark(args))
+    output = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(output + "\n", encoding="utf-8")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
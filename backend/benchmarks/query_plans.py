@@ -0,0 +1,432 @@
+"""
+Query-plan regression suite for the service layer.
+
+Generates data at each requested scale (see ``benchmarks/datagen.py``), runs
+every query-issuing method of ``EpigramService``, ``UserService`` and
+``UserSettingsService``, captures the SQL they execute and re-runs each
+statement under ``EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)``. Writes are
+executed inside savepoints that are rolled back, so the generated data stays
+intact between cases.
+
+The run fails (exit code 1) when a plan contains a sequential scan over a
+table larger than ``--seq-scan-min-rows``, unless the case is marked as an
+expected full scan.
+
+Usage:
+    python benchmarks/query_plans.py --scales 10k,1m,10m --yes --output plans.json
+    python benchmarks/query_plans.py --existing   # current data, no generation
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# Add backend directory to sys.path so the app package can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import text  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession  # noqa: E402
+
+from app.cache.approved_ids import approved_ids  # noqa: E402
+from app.cache.corpus import corpus_store  # noqa: E402
+from app.db import async_engine  # noqa: E402
+from app.query_stats import capture_queries, normalize_sql  # noqa: E402
+from app.schemas.epigram import EpigramCreate  # noqa: E402
+from app.schemas.user import UserCreate, UserSettingsCreate, UserSettingsUpdate  # noqa: E402
+from app.services.epigram import EpigramService  # noqa: E402
+from app.services.user import UserService  # noqa: E402
+from app.services.user_settings import UserSettingsService  # noqa: E402
+from benchmarks.datagen import GENERATED_PASSWORD, generate  # noqa: E402
+
+EXPLAINABLE = ("select", "insert", "update", "delete", "with")
+TABLES = ("users", "user_settings", "epigrams")
+
+
+@dataclass
+class Fixtures:
+    """Existing rows the cases operate on."""
+
+    heavy_user_id: int
+    heavy_username: str
+    heavy_user_total: int
+    epigram_id: int
+    epigram_text: str
+    epigram_author: Optional[str]
+    user_without_settings: int
+
+
+@dataclass
+class Case:
+    """One service call to capture and explain."""
+
+    name: str
+    run: Callable[[AsyncSession, Fixtures], Awaitable[Any]]
+    # Known full scans, e.g. the ORDER BY random() fallback
+    allow_seq_scan: bool = False
+
+
+async def _random_cold(session: AsyncSession, _fixtures: Fixtures) -> Any:
+    loaded, approved_ids.loaded = approved_ids.loaded, False
+    try:
+        return await EpigramService(session).get_random_approved(5)
+    finally:
+        approved_ids.loaded = loaded
+
+
+async def _corpus_catch_up(_session: AsyncSession, _fixtures: Fixtures) -> Any:
+    # Watermark at "now", so the range covers only the overlap window
+    watermark = corpus_store.watermark
+    corpus_store.watermark = int(time.time() * 1_000_000)
+    try:
+        return await corpus_store.refresh(catch_up=True)
+    finally:
+        corpus_store.watermark = watermark
+
+
+async def _duplicate_normalized(session: AsyncSession, fixtures: Fixtures) -> Any:
+    # Differs only in case and punctuation, so the fingerprint probe finds it
+    found = await EpigramService(session).find_duplicate(
+        f"  {fixtures.epigram_text.upper()}!! ", fixtures.epigram_author
+    )
+    if found is None:
+        raise LookupError("fingerprint probe missed the fixture epigram")
+    return found
+
+
+async def _duplicate_near(session: AsyncSession, fixtures: Fixtures) -> Any:
+    # One word more misses the fingerprint and goes to the trigram search
+    return await EpigramService(session).find_duplicate(
+        f"{fixtures.epigram_text} indeed", fixtures.epigram_author
+    )
+
+
+CASES = [
+    Case(
+        "EpigramService.get_random_approved",
+        lambda s, f: EpigramService(s).get_random_approved(5),
+    ),
+    Case("EpigramService.get_random_approved[cold]", _random_cold, allow_seq_scan=True),
+    Case("CorpusStore.refresh[catch_up]", _corpus_catch_up),
+    Case(
+        "EpigramService.get_user_epigrams[first]",
+        lambda s, f: EpigramService(s).get_user_epigrams(f.heavy_user_id, 1, 10),
+    ),
+    Case(
+        "EpigramService.get_user_epigrams[last]",
+        lambda s, f: EpigramService(s).get_user_epigrams(
+            f.heavy_user_id, max(1, -(-f.heavy_user_total // 10)), 10
+        ),
+    ),
+    Case(
+        "EpigramService.get_user_changes[since]",
+        lambda s, f: EpigramService(s).get_user_changes(
+            f.heavy_user_id, (datetime.now(timezone.utc) - timedelta(days=1), 0), 500
+        ),
+    ),
+    Case("EpigramService.compact_tombstones", lambda s, f: EpigramService(s).compact_tombstones()),
+    Case("EpigramService.get_most_shown", lambda s, f: EpigramService(s).get_most_shown(10)),
+    Case(
+        "EpigramService.find_duplicate",
+        lambda s, f: EpigramService(s).find_duplicate(f.epigram_text, f.epigram_author),
+    ),
+    Case("EpigramService.find_duplicate[normalized]", _duplicate_normalized),
+    Case("EpigramService.find_duplicate[near]", _duplicate_near),
+    Case(
+        "EpigramService.find_duplicate_excluding",
+        lambda s, f: EpigramService(s).find_duplicate_excluding(
+            f.epigram_text, f.epigram_author, f.epigram_id
+        ),
+    ),
+    Case(
+        "EpigramService.create_epigram",
+        lambda s, f: EpigramService(s).create_epigram(
+            EpigramCreate(text="Query plan suite probe epigram.", author="Plan Suite"),
+            f.heavy_user_id,
+        ),
+    ),
+    Case(
+        "EpigramService.update_epigram",
+        lambda s, f: EpigramService(s).update_epigram(
+            f.epigram_id,
+            EpigramCreate(text="Query plan suite updated epigram.", author="Plan Suite"),
+            f.heavy_user_id,
+        ),
+    ),
+    Case(
+        "EpigramService.delete_epigram",
+        lambda s, f: EpigramService(s).delete_epigram(f.epigram_id, f.heavy_user_id),
+    ),
+    Case(
+        "UserService.create_user",
+        lambda s, f: UserService.create_user(
+            s, UserCreate(username="plan_suite_probe", password=GENERATED_PASSWORD)
+        ),
+    ),
+    Case(
+        "UserService.get_user_by_username",
+        lambda s, f: UserService.get_user_by_username(s, f.heavy_username),
+    ),
+    Case(
+        "UserService.get_user_by_id",
+        lambda s, f: UserService.get_user_by_id(s, f.heavy_user_id),
+    ),
+    Case(
+        "UserService.authenticate_user",
+        lambda s, f: UserService.authenticate_user(s, f.heavy_username, GENERATED_PASSWORD),
+    ),
+    Case(
+        "UserSettingsService.get_user_settings",
+        lambda s, f: UserSettingsService.get_user_settings(s, f.heavy_user_id),
+    ),
+    Case(
+        "UserSettingsService.create_user_settings",
+        lambda s, f: UserSettingsService.create_user_settings(
+            s, f.user_without_settings, UserSettingsCreate()
+        ),
+    ),
+    Case(
+        "UserSettingsService.create_default_settings",
+        lambda s, f: UserSettingsService.create_default_settings(s, f.user_without_settings),
+    ),
+    Case(
+        "UserSettingsService.update_user_settings",
+        lambda s, f: UserSettingsService.update_user_settings(
+            s, f.heavy_user_id, UserSettingsUpdate(auto_reload_interval_minutes=15)
+        ),
+    ),
+    Case(
+        "UserSettingsService.delete_user_settings",
+        lambda s, f: UserSettingsService.delete_user_settings(s, f.heavy_user_id),
+    ),
+]
+
+
+def parse_scale(value: str) -> int:
+    """Parse row counts such as ``10k`` or ``1m``."""
+    value = value.strip().lower()
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:], 1)
+    return int(float(value.rstrip("km")) * multiplier)
+
+
+def plan_nodes(node: dict) -> List[dict]:
+    """Flatten an EXPLAIN JSON plan tree."""
+    nodes = [node]
+    for child in node.get("Plans", ()):
+        nodes.extend(plan_nodes(child))
+    return nodes
+
+
+async def load_fixtures(connection: AsyncConnection) -> Fixtures:
+    """Pick the busiest user, one of their epigrams and a user without settings."""
+    heavy = (
+        await connection.execute(
+            text(
+                "SELECT e.user_id, u.username, count(*) AS total "
+                "FROM epigrams e JOIN users u ON u.id = e.user_id "
+                "GROUP BY e.user_id, u.username ORDER BY total DESC LIMIT 1"
+            )
+        )
+    ).one()
+    epigram = (
+        await connection.execute(
+            text(
+                "SELECT id, text, author FROM epigrams "
+                "WHERE user_id = :user_id AND fingerprint IS NOT NULL LIMIT 1"
+            ),
+            {"user_id": heavy.user_id},
+        )
+    ).one()
+    without_settings = (
+        await connection.execute(
+            text(
+                "SELECT u.id FROM users u LEFT JOIN user_settings s ON s.user_id = u.id "
+                "WHERE s.id IS NULL LIMIT 1"
+            )
+        )
+    ).scalar()
+    return Fixtures(
+        heavy_user_id=heavy.user_id,
+        heavy_username=heavy.username,
+        heavy_user_total=heavy.total,
+        epigram_id=epigram.id,
+        epigram_text=epigram.text,
+        epigram_author=epigram.author,
+        # Fall back to a user that has settings; the create cases then report the conflict
+        user_without_settings=without_settings or heavy.user_id,
+    )
+
+
+async def table_sizes(connection: AsyncConnection) -> Dict[str, int]:
+    result = await connection.execute(
+        text("SELECT relname, reltuples::bigint FROM pg_class WHERE relname = ANY(:names)"),
+        {"names": list(TABLES)},
+    )
+    return {name: max(0, rows) for name, rows in result.tuples()}
+
+
+async def explain(connection: AsyncConnection, statement: str, parameters: Any) -> dict:
+    """Run one captured statement under EXPLAIN ANALYZE and roll its effects back."""
+    savepoint = await connection.begin_nested()
+    try:
+        result = await connection.exec_driver_sql(
+            f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}", parameters or ()
+        )
+        plan = result.scalar()
+    finally:
+        await savepoint.rollback()
+    return (json.loads(plan) if isinstance(plan, str) else plan)[0]
+
+
+async def run_case(
+    case: Case, fixtures: Fixtures, sizes: Dict[str, int], min_rows: int
+) -> dict:
+    """Capture the case's statements, then explain each of them."""
+    async with async_engine.connect() as connection:
+        transaction = await connection.begin()
+        try:
+            savepoint = await connection.begin_nested()
+            session = AsyncSession(
+                bind=connection, join_transaction_mode="create_savepoint", expire_on_commit=False
+            )
+            error = None
+            with capture_queries() as stats:
+                started = time.perf_counter()
+                try:
+                    await case.run(session, fixtures)
+                except Exception as exc:  # pylint: disable=broad-except
+                    error = f"{type(exc).__name__}: {exc}"
+                elapsed = time.perf_counter() - started
+            await session.close()
+            await savepoint.rollback()
+
+            statements = []
+            for statement, parameters in stats.statements:
+                if not statement.lstrip().lower().startswith(EXPLAINABLE):
+                    continue
+                if "pg_notify" in statement:
+                    continue
+                plan = await explain(connection, statement, parameters)
+                nodes = plan_nodes(plan["Plan"])
+                seq_scans = sorted(
+                    {
+                        node["Relation Name"]
+                        for node in nodes
+                        if node["Node Type"] == "Seq Scan"
+                        and sizes.get(node.get("Relation Name"), 0) >= min_rows
+                    }
+                )
+                statements.append(
+                    {
+                        "sql": normalize_sql(statement),
+                        "planning_ms": plan.get("Planning Time"),
+                        "execution_ms": plan.get("Execution Time"),
+                        "shared_hit_blocks": plan["Plan"].get("Shared Hit Blocks"),
+                        "shared_read_blocks": plan["Plan"].get("Shared Read Blocks"),
+                        "node_types": sorted({node["Node Type"] for node in nodes}),
+                        "seq_scans": seq_scans,
+                        "plan": plan,
+                    }
+                )
+        finally:
+            await transaction.rollback()
+
+    regressed = not case.allow_seq_scan and any(item["seq_scans"] for item in statements)
+    return {
+        "case": case.name,
+        "wall_ms": round(elapsed * 1000, 2),
+        "query_count": stats.count,
+        "error": error,
+        "allow_seq_scan": case.allow_seq_scan,
+        "regressed": regressed,
+        "statements": statements,
+    }
+
+
+async def run_scale(label: str, min_rows: int, selected: List[Case]) -> dict:
+    async with async_engine.connect() as connection:
+        fixtures = await load_fixtures(connection)
+        sizes = await table_sizes(connection)
+    await approved_ids.load()
+
+    results = []
+    for case in selected:
+        result = await run_case(case, fixtures, sizes, min_rows)
+        results.append(result)
+        slowest = max((item["execution_ms"] or 0 for item in result["statements"]), default=0)
+        flag = "SEQ SCAN" if result["regressed"] else ("error" if result["error"] else "ok")
+        print(
+            f"[{label}] {case.name:<48} {result['query_count']:>2} queries "
+            f"slowest={slowest:.2f}ms {flag}",
+            file=sys.stderr,
+        )
+    return {"scale": label, "table_rows": sizes, "cases": results}
+
+
+async def run_suite(args: argparse.Namespace) -> dict:
+    selected = [case for case in CASES if not args.case or args.case in case.name]
+    scales = []
+    try:
+        if args.existing:
+            scales.append(await run_scale("existing", args.seq_scan_min_rows, selected))
+        else:
+            for value in args.scales.split(","):
+                rows = parse_scale(value)
+                users = max(100, rows // args.epigrams_per_user)
+                print(f"Generating {users:,} users and {rows:,} epigrams", file=sys.stderr)
+                generated = await generate(users, rows, truncate=True, seed=args.seed)
+                scale = await run_scale(value, args.seq_scan_min_rows, selected)
+                scale["generated"] = generated
+                scales.append(scale)
+    finally:
+        await async_engine.dispose()
+    return {"seq_scan_min_rows": args.seq_scan_min_rows, "scales": scales}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="EXPLAIN ANALYZE every service query.")
+    parser.add_argument("--scales", default="10k,1m,10m", help="Epigram row counts")
+    parser.add_argument("--epigrams-per-user", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--existing", action="store_true", help="Use current data as is")
+    parser.add_argument(
+        "--yes", action="store_true", help="Confirm truncating all tables to generate data"
+    )
+    parser.add_argument("--case", help="Only run cases whose name contains this")
+    parser.add_argument(
+        "--seq-scan-min-rows",
+        type=int,
+        default=1000,
+        help="Ignore sequential scans over tables smaller than this",
+    )
+    parser.add_argument("--output", help="Write the JSON report here")
+    args = parser.parse_args()
+
+    if not args.existing and not args.yes:
+        parser.error("generating data truncates users, settings and epigrams; pass --yes")
+
+    report = asyncio.run(run_suite(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, default=str)
+
+    regressions = [
+        f"{scale['scale']}: {case['case']} -> {', '.join(statement['seq_scans'])}"
+        for scale in report["scales"]
+        for case in scale["cases"]
+        if case["regressed"]
+        for statement in case["statements"]
+        if statement["seq_scans"]
+    ]
+    for line in regressions:
+        print(f"Sequential scan regression {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
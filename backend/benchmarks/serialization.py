@@ -0,0 +1,119 @@
+"""
+Micro-benchmark for epigram response serialization.
+
+Compares the previous response path (ORM objects validated through
+``response_model``, ``jsonable_encoder`` and the stdlib JSON encoder) with
+the fast path (row tuples zipped into dicts and encoded with orjson) for the
+payload shapes of ``/random/batch`` and ``/mine?limit=100``.
+
+Usage:
+    python benchmarks/serialization.py [--iterations 2000]
+"""
+
+import argparse
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+# Add backend directory to sys.path so the app package can be imported
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from app.models.epigram import Epigram  # noqa: E402
+from app.responses import FastJSONResponse, rows_to_dicts  # noqa: E402
+from app.schemas.epigram import (  # noqa: E402
+    EPIGRAM_READ_FIELDS,
+    EpigramPaginatedResponse,
+    EpigramRead,
+)
+
+
+def make_rows(count: int) -> List[tuple]:
+    """Build row tuples shaped like the service's column selects."""
+    now = datetime.now(timezone.utc)
+    return [
+        (
+            i,
+            f"Epigram number {i} with a realistic amount of text in it.",
+            "Some Author" if i % 3 else None,
+            1,
+            now - timedelta(minutes=i),
+            now - timedelta(seconds=i),
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def to_orm(rows: List[tuple]) -> List[Epigram]:
+    """Build ORM instances equivalent to the given rows."""
+    return [Epigram(status=1, **dict(zip(EPIGRAM_READ_FIELDS, row))) for row in rows]
+
+
+def legacy_batch(epigrams: List[Epigram]) -> bytes:
+    """Previous /random/batch path: validate, encode, dump."""
+    validated = TypeAdapter(List[EpigramRead]).validate_python(
+        epigrams, from_attributes=True
+    )
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_batch(rows: List[tuple]) -> bytes:
+    """Fast /random/batch path."""
+    return FastJSONResponse(rows_to_dicts(EPIGRAM_READ_FIELDS, rows)).body
+
+
+def legacy_page(epigrams: List[Epigram]) -> bytes:
+    """Previous /mine path: build the model, validate it again, encode, dump."""
+    page = EpigramPaginatedResponse(
+        items=epigrams, total=1000, page=1, size=100, pages=10, has_next=True, has_prev=False
+    )
+    validated = EpigramPaginatedResponse.model_validate(page.model_dump())
+    return JSONResponse(jsonable_encoder(validated)).body
+
+
+def fast_page(rows: List[tuple]) -> bytes:
+    """Fast /mine path."""
+    return FastJSONResponse(
+        {
+            "items": rows_to_dicts(EPIGRAM_READ_FIELDS, rows),
+            "total": 1000,
+            "page": 1,
+            "size": 100,
+            "pages": 10,
+            "has_next": True,
+            "has_prev": False,
+        }
+    ).body
+
+
+def bench(label: str, func, arg, iterations: int) -> float:
+    """Time func(arg) and print microseconds per call."""
+    seconds = timeit.timeit(lambda: func(arg), number=iterations)
+    per_call = seconds / iterations * 1_000_000
+    print(f"  {label:<8} {per_call:10.1f} us/call")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    for name, count, legacy, fast in (
+        ("/random/batch?count=20", 20, legacy_batch, fast_batch),
+        ("/mine?limit=100", 100, legacy_page, fast_page),
+    ):
+        rows = make_rows(count)
+        print(name)
+        before = bench("before", legacy, to_orm(rows), args.iterations)
+        after = bench("after", fast, rows, args.iterations)
+        print(f"  speedup  {before / after:10.1f}x")
+
+
+if __name__ == "__main__":
+    main()
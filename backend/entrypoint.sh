@@ -13,8 +13,14 @@ set -e
 #         time.sleep(1)
 # PY
 
-# run migrations idempotently
-alembic -c /app/alembic.ini upgrade head
+# drop per-worker metrics snapshots left over from a previous run
+if [ -n "${METRICS_MULTIPROC_DIR:-}" ]; then
+  mkdir -p "$METRICS_MULTIPROC_DIR"
+  rm -f "$METRICS_MULTIPROC_DIR"/*.json
+fi
+
+# run migrations only when the database is behind head
+python -m app.cli.migrate
 
 # start the app
 exec "$@"
\ No newline at end of file
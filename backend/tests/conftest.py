@@ -0,0 +1,66 @@
+"""
+Shared fixtures: the app on a throwaway SQLite database, driven in-process.
+
+The environment is set before anything under ``app`` is imported, since
+configuration is read at import time.
+"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import pytest
+
+_DATABASE_DIR = tempfile.mkdtemp(prefix="isit-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{Path(_DATABASE_DIR) / 'test.db'}"
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+# Cheapest parameters passlib accepts; tests only need hashes to round-trip
+os.environ.setdefault("ARGON2_MEMORY_KIB", "8")
+os.environ.setdefault("ARGON2_TIME_COST", "1")
+os.environ.setdefault("ARGON2_PARALLELISM", "1")
+
+import httpx  # noqa: E402
+from sqlmodel import SQLModel  # noqa: E402
+
+import app.models  # noqa: E402,F401
+from app.db import async_engine  # noqa: E402
+from app.main import app as fastapi_app  # noqa: E402
+
+PASSWORD = "Passw0rd!"
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture(scope="session")
+async def app():
+    """The application with its lifespan running, once warm-up has finished."""
+    async with async_engine.begin() as connection:
+        await connection.run_sync(SQLModel.metadata.create_all)
+    async with fastapi_app.router.lifespan_context(fastapi_app):
+        while not getattr(fastapi_app.state, "ready", False):
+            await asyncio.sleep(0.05)
+        yield fastapi_app
+
+
+@pytest.fixture
+async def anonymous(app):
+    """Client without a session."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        yield client
+
+
+@pytest.fixture
+async def client(anonymous):
+    """Client logged in as a newly registered user."""
+    response = await anonymous.post(
+        "/api/auth/register",
+        json={"username": f"user-{uuid.uuid4().hex[:12]}", "password": PASSWORD},
+    )
+    assert response.status_code == 201, response.text
+    yield anonymous
@@ -0,0 +1,27 @@
+"""
+Content-coding negotiation.
+"""
+
+import pytest
+
+from app.middleware.compression import negotiate_encoding
+
+
+@pytest.mark.parametrize(
+    "header, brotli_enabled, expected",
+    [
+        (None, True, None),
+        (b"gzip, deflate, br", True, "br"),
+        (b"gzip, br", False, "gzip"),
+        (b"gzip;q=1.0, br;q=0.1", True, "gzip"),
+        (b"gzip, br;q=0.5", True, "gzip"),
+        (b"br;q=0.9, gzip;q=0.8", True, "br"),
+        (b"br;q=0, gzip;q=0", True, None),
+        (b"*", True, "br"),
+        (b"*;q=0.5, gzip;q=0", True, "br"),
+        (b"identity, gzip;q=0.5", True, None),
+        (b"identity", True, None),
+    ],
+)
+def test_negotiate_encoding(header, brotli_enabled, expected):
+    assert negotiate_encoding(header, brotli_enabled) == expected
@@ -0,0 +1,69 @@
+"""
+ETag validation on the bucket endpoint and ETags on compressed responses.
+"""
+
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import Response
+from starlette.routing import Route
+
+from app.middleware.compression import CompressionMiddleware
+from app.responses import etag_matches
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.mark.parametrize(
+    "header, etag, expected",
+    [
+        (None, '"a"', False),
+        ('"a"', '"a"', True),
+        ('W/"a"', '"a"', True),
+        ('"a"', 'W/"a"', True),
+        ('"b", W/"a"', 'W/"a"', True),
+        ('"ab"', '"a"', False),
+        ('"x,a"', '"a"', False),
+        ("*", 'W/"a"', True),
+        ('"b"', '"a"', False),
+    ],
+)
+def test_etag_matches(header, etag, expected):
+    assert etag_matches(header, etag) is expected
+
+
+async def test_bucket_not_modified(client):
+    response = await client.post("/api/epigrams/", json={"text": "Bucket validation epigram."})
+    assert response.status_code == 201, response.text
+
+    response = await client.get("/api/epigrams/bucket?interval=240")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+    assert etag.startswith('W/"')
+
+    for header in (etag, etag.removeprefix("W/"), f'"other", {etag}', "*"):
+        response = await client.get(
+            "/api/epigrams/bucket?interval=240", headers={"If-None-Match": header}
+        )
+        assert response.status_code == 304, header
+        assert response.headers["etag"] == etag
+
+    response = await client.get(
+        "/api/epigrams/bucket?interval=240", headers={"If-None-Match": '"other"'}
+    )
+    assert response.status_code == 200
+
+
+async def test_compression_weakens_strong_etag():
+    async def large(_request):
+        return Response(b"x" * 4096, media_type="text/plain", headers={"ETag": '"big"'})
+
+    app = CompressionMiddleware(Starlette(routes=[Route("/", large)]), minimum_size=1024)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        compressed = await client.get("/", headers={"Accept-Encoding": "gzip"})
+        identity = await client.get("/", headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert compressed.headers["etag"] == 'W/"big"'
+    assert identity.headers["etag"] == '"big"'
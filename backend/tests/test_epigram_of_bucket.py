@@ -0,0 +1,68 @@
+"""
+The bucket pick stays put while other epigrams are approved.
+"""
+
+import uuid
+
+import anyio
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.cache.approved_ids import approved_ids
+from app.cache.invalidation import EPIGRAM, publish
+from app.db import async_engine
+from app.fingerprint import fingerprint
+from app.models.epigram import Epigram, EpigramStatus
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_approval_keeps_bucket_pick(client):
+    for _ in range(3):
+        response = await client.post(
+            "/api/epigrams/", json={"text": f"Bucket pick epigram {uuid.uuid4().hex}."}
+        )
+        assert response.status_code == 201, response.text
+    user_id = response.json()["user_id"]
+
+    # A submission waiting for moderation
+    text, author = f"Pending bucket epigram {uuid.uuid4().hex}.", None
+    async with AsyncSession(async_engine) as session:
+        pending = Epigram(
+            text=text,
+            author=author,
+            fingerprint=fingerprint(text, author),
+            user_id=user_id,
+            status=EpigramStatus.PENDING,
+        )
+        session.add(pending)
+        await session.flush()
+        pending_id = pending.id
+        await session.commit()
+
+    # Long intervals, so no bucket ends during the test
+    urls = [f"/api/epigrams/bucket?interval={interval}" for interval in range(60, 241, 4)]
+    before = [await client.get(url) for url in urls]
+    assert all(response.status_code == 200 for response in before)
+
+    async with AsyncSession(async_engine) as session:
+        epigram = await session.get(Epigram, pending_id)
+        epigram.status = EpigramStatus.APPROVED
+        session.add(epigram)
+        publish(session, EPIGRAM, pending_id)
+        await session.commit()
+    with anyio.fail_after(5):
+        while pending_id not in approved_ids.ids:
+            await anyio.sleep(0.01)
+
+    unchanged = 0
+    for url, previous in zip(urls, before):
+        response = await client.get(url)
+        assert response.status_code == 200
+        # Only the new epigram itself can take over a bucket
+        if response.json()["id"] == pending_id:
+            continue
+        assert response.content == previous.content, url
+        assert response.headers["etag"] == previous.headers["etag"], url
+        unchanged += 1
+    assert unchanged
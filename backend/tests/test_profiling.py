@@ -0,0 +1,46 @@
+"""
+Request profiling stays off the event loop.
+"""
+
+import threading
+
+import anyio
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse
+from starlette.routing import Route
+
+from app.middleware import profiling
+from app.middleware.profiling import ProfilingMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sampler_joined_off_the_loop(tmp_path, monkeypatch):
+    loop_thread = threading.get_ident()
+    joined_on = []
+    join = profiling.TaskSampler.join
+
+    def record_join(sampler):
+        joined_on.append(threading.get_ident())
+        join(sampler)
+
+    monkeypatch.setattr(profiling.TaskSampler, "join", record_join)
+
+    async def slow(_request):
+        await anyio.sleep(0.02)
+        return PlainTextResponse("ok")
+
+    app = ProfilingMiddleware(
+        Starlette(routes=[Route("/slow", slow)]), str(tmp_path), sample_rate=1.0
+    )
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        response = await client.get("/slow")
+    assert response.status_code == 200
+
+    with anyio.fail_after(5):
+        while not list(tmp_path.glob("*.folded")):
+            await anyio.sleep(0.01)
+    assert joined_on and loop_thread not in joined_on
@@ -0,0 +1,44 @@
+"""
+Per-endpoint query budgets: each hot endpoint runs at most a fixed number of
+SQL statements, so an extra round trip fails here instead of in production.
+"""
+
+import uuid
+
+import pytest
+
+from app.query_stats import assert_max_queries
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_register_user(anonymous):
+    # Username check, user and settings (each inserted and refreshed), refresh token
+    with assert_max_queries(6):
+        response = await anonymous.post(
+            "/api/auth/register",
+            json={"username": f"user-{uuid.uuid4().hex[:12]}", "password": PASSWORD},
+        )
+    assert response.status_code == 201
+
+
+async def test_list_my_epigrams(client):
+    for number in range(3):
+        response = await client.post(
+            "/api/epigrams/", json={"text": f"Budget epigram {uuid.uuid4().hex} {number}"}
+        )
+        assert response.status_code == 201, response.text
+
+    # User lookup for the session, count, page
+    with assert_max_queries(3):
+        response = await client.get("/api/epigrams/mine?limit=2&page=2")
+    assert response.status_code == 200
+    assert response.json()["total"] == 3
+
+
+async def test_random_batch(client):
+    # Served from the corpus store once warm-up has loaded it
+    with assert_max_queries(0):
+        response = await client.get("/api/epigrams/random/batch?count=5")
+    assert response.status_code == 200
@@ -0,0 +1,146 @@
+"""
+Refresh-token rotation, reuse detection and revocation.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlmodel import select
+
+from app.db import async_engine
+from app.models.user import RefreshToken, User
+from app.services.auth import hash_refresh_token
+from tests.conftest import PASSWORD
+
+pytestmark = pytest.mark.anyio
+
+
+async def _refresh_with(app, token: str) -> httpx.Response:
+    """POST /auth/refresh from a separate client presenting ``token``."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as other:
+        other.cookies.set("refresh_token", token, path="/api/auth")
+        return await other.post("/api/auth/refresh")
+
+
+async def _stored(token: str) -> RefreshToken:
+    async with AsyncSession(async_engine) as session:
+        return (
+            await session.execute(
+                select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token))
+            )
+        ).scalar_one()
+
+
+async def _family(token: str) -> list:
+    stored = await _stored(token)
+    async with AsyncSession(async_engine) as session:
+        result = await session.execute(
+            select(RefreshToken).where(RefreshToken.family_id == stored.family_id)
+        )
+        return list(result.scalars())
+
+
+async def _update(token: str, **values) -> None:
+    async with AsyncSession(async_engine) as session:
+        await session.execute(
+            update(RefreshToken)
+            .where(RefreshToken.token_hash == hash_refresh_token(token))
+            .values(**values)
+        )
+        await session.commit()
+
+
+async def test_rotation_issues_new_token(client):
+    old = client.cookies.get("refresh_token")
+
+    response = await client.post("/api/auth/refresh")
+
+    assert response.status_code == 200
+    new = client.cookies.get("refresh_token")
+    assert new and new != old
+    assert (await _stored(old)).rotated_at is not None
+    assert (await client.get("/api/auth/me")).status_code == 200
+    # The new token rotates in turn
+    assert (await client.post("/api/auth/refresh")).status_code == 200
+
+
+async def test_reuse_within_grace_is_refused_without_revoking(app, client):
+    old = client.cookies.get("refresh_token")
+    assert (await client.post("/api/auth/refresh")).status_code == 200
+
+    response = await _refresh_with(app, old)
+
+    assert response.status_code == 401
+    assert all(token.revoked_at is None for token in await _family(old))
+    assert (await client.post("/api/auth/refresh")).status_code == 200
+
+
+async def test_reuse_after_grace_revokes_family(app, client):
+    old = client.cookies.get("refresh_token")
+    assert (await client.post("/api/auth/refresh")).status_code == 200
+    await _update(old, rotated_at=datetime.now(timezone.utc) - timedelta(minutes=5))
+
+    response = await _refresh_with(app, old)
+
+    assert response.status_code == 401
+    assert all(token.revoked_at is not None for token in await _family(old))
+    # The legitimate holder's current token is revoked too
+    assert (await client.post("/api/auth/refresh")).status_code == 401
+
+
+async def test_logout_revokes_session(app, client):
+    token = client.cookies.get("refresh_token")
+
+    response = await client.post("/api/auth/logout")
+
+    assert response.status_code == 200
+    assert (await _stored(token)).revoked_at is not None
+    assert (await _refresh_with(app, token)).status_code == 401
+
+
+async def test_logout_all_revokes_every_session(app, client):
+    first = client.cookies.get("refresh_token")
+    me = (await client.get("/api/auth/me")).json()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as other:
+        response = await other.post(
+            "/api/auth/login", json={"username": me["username"], "password": PASSWORD}
+        )
+        assert response.status_code == 200
+        second = other.cookies.get("refresh_token")
+
+    response = await client.post("/api/auth/logout-all")
+
+    assert response.status_code == 200
+    assert response.json()["revoked"] == 2
+    for token in (first, second):
+        assert (await _stored(token)).revoked_at is not None
+        assert (await _refresh_with(app, token)).status_code == 401
+
+
+async def test_expired_token_is_refused(client):
+    token = client.cookies.get("refresh_token")
+    await _update(token, expires_at=datetime.now(timezone.utc) - timedelta(seconds=1))
+
+    assert (await client.post("/api/auth/refresh")).status_code == 401
+
+
+async def test_inactive_user_is_refused(client):
+    token = client.cookies.get("refresh_token")
+    stored = await _stored(token)
+    async with AsyncSession(async_engine) as session:
+        await session.execute(
+            update(User).where(User.id == stored.user_id).values(is_active=False)
+        )
+        await session.commit()
+
+    assert (await client.post("/api/auth/refresh")).status_code == 401
+
+
+async def test_missing_or_unknown_token_is_refused(app, anonymous):
+    assert (await anonymous.post("/api/auth/refresh")).status_code == 401
+    assert (await _refresh_with(app, "not-a-token")).status_code == 401
@@ -7,9 +7,10 @@ import type { UserCreate, UserLogin, UserRead } from "@/types/auth";
 class AuthService extends BaseApiService {
   /**
    * Register a new user
+   * Auth responses embed the user's settings to save a settings request
    */
   async register(userData: UserCreate): Promise<UserRead> {
-    return this.post<UserRead>("/auth/register", userData);
+    return this.post<UserRead>("/auth/register?include_settings=true", userData);
   }
 
   /**
@@ -17,22 +18,30 @@ class AuthService extends BaseApiService {
    * The backend will set HTTP-only cookies for authentication
    */
   async login(credentials: UserLogin): Promise<UserRead> {
-    return this.post<UserRead>("/auth/login", credentials);
+    return this.post<UserRead>("/auth/login?include_settings=true", credentials);
   }
 
   /**
    * Log out the current user
-   * The backend will clear the HTTP-only cookie
+   * The backend revokes the session and clears the HTTP-only cookies
    */
   async logout(): Promise<{ message: string }> {
     return this.post<{ message: string }>("/auth/logout");
   }
 
+  /**
+   * Log out of every session of the current user
+   * The backend revokes all refresh tokens and clears this browser's cookies
+   */
+  async logoutAll(): Promise<{ message: string; revoked: number }> {
+    return this.post<{ message: string; revoked: number }>("/auth/logout-all");
+  }
+
   /**
    * Get the current authenticated user
    */
   async getCurrentUser(): Promise<UserRead> {
-    return this.get<UserRead>("/auth/me");
+    return this.get<UserRead>("/auth/me?include_settings=true");
   }
 
   /**
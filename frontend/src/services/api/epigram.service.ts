@@ -1,5 +1,10 @@
 import { BaseApiService } from "../core/base-api.service";
-import type { EpigramRead, EpigramCreate } from "@/types/epigram";
+import type {
+  EpigramRead,
+  EpigramCreate,
+  EpigramChanges,
+  EpigramImpressions,
+} from "@/types/epigram";
 import type { PaginatedResponse } from "@/types/api";
 
 /**
@@ -26,6 +31,30 @@ class EpigramService extends BaseApiService {
     return this.get<EpigramRead[]>(`/epigrams/random/batch?${params}`);
   }
 
+  /**
+   * Get approved epigrams by ID, in request order (missing IDs are skipped)
+   * @param ids Up to 100 epigram IDs
+   */
+  async getEpigramsByIds(ids: number[]): Promise<EpigramRead[]> {
+    return this.get<EpigramRead[]>(`/epigrams?ids=${ids.join(",")}`);
+  }
+
+  /**
+   * Get the shared epigram for the current time bucket (HTTP cacheable)
+   * @param intervalMinutes Rotation interval, usually the auto-reload interval
+   */
+  async getBucketEpigram(intervalMinutes: number = 5): Promise<EpigramRead> {
+    return this.get<EpigramRead>(`/epigrams/bucket?interval=${intervalMinutes}`);
+  }
+
+  /**
+   * Get the approved epigrams served most often (counts lag by a flush interval)
+   * @param limit Number of epigrams, at most 100
+   */
+  async getTopEpigrams(limit: number = 10): Promise<EpigramImpressions[]> {
+    return this.get<EpigramImpressions[]>(`/epigrams/top?limit=${limit}`);
+  }
+
   /**
    * Create a new epigram
    */
@@ -46,6 +75,18 @@ class EpigramService extends BaseApiService {
     return this.get(`/epigrams/mine?${params}`);
   }
 
+  /**
+   * Get the current user's epigrams created, updated or deleted since a cursor
+   * @param since Cursor from the previous call; omit for a full sync
+   */
+  async getMyEpigramChanges(since?: string): Promise<EpigramChanges> {
+    const params = new URLSearchParams();
+    if (since) {
+      params.append("since", since);
+    }
+    return this.get(`/epigrams/mine/changes?${params}`);
+  }
+
   /**
    * Update an existing epigram
    */
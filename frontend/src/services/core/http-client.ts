@@ -1,15 +1,31 @@
 import axios from "axios";
-import type { AxiosInstance, AxiosRequestConfig, AxiosResponse } from "axios";
+import type {
+  AxiosInstance,
+  AxiosRequestConfig,
+  AxiosResponse,
+  InternalAxiosRequestConfig,
+} from "axios";
 import type { ApiError } from "@/types/api";
 
+// Auth endpoints whose 401 must not trigger a refresh
+const NO_REFRESH_ENDPOINTS = ["/auth/login", "/auth/register", "/auth/refresh", "/auth/logout"];
+
+/**
+ * In-flight refresh shared by every client, so concurrent 401s rotate the
+ * refresh token once
+ */
+let refreshing: Promise<boolean> | null = null;
+
 /**
  * Base HTTP client that handles API requests and responses
  * Uses Axios for HTTP operations with configured interceptors
  */
 export class HttpClient {
   private client: AxiosInstance;
+  private baseURL: string;
 
   constructor(baseURL: string) {
+    this.baseURL = baseURL;
     this.client = axios.create({
       baseURL,
       timeout: 10000,
@@ -40,6 +56,22 @@ export class HttpClient {
       },
       async (error) => {
         if (error.response) {
+          // Renew an expired access token once, then retry the request
+          const config = error.config as
+            | (InternalAxiosRequestConfig & { _refreshed?: boolean })
+            | undefined;
+          if (
+            error.response.status === 401 &&
+            config &&
+            !config._refreshed &&
+            !NO_REFRESH_ENDPOINTS.some((endpoint) => config.url?.startsWith(endpoint))
+          ) {
+            config._refreshed = true;
+            if (await this.refreshSession()) {
+              return this.client.request(config);
+            }
+          }
+
           // Handle 401 Unauthorized - session expired
           if (error.response.status === 401) {
             // Import needed at runtime to avoid circular dependency
@@ -86,6 +118,23 @@ export class HttpClient {
     );
   }
 
+  /**
+   * Exchange the refresh token cookie for a new access token
+   * Resolves to whether the session could be renewed
+   */
+  private refreshSession(): Promise<boolean> {
+    if (!refreshing) {
+      refreshing = axios
+        .post(`${this.baseURL}/auth/refresh`, undefined, { withCredentials: true })
+        .then(() => true)
+        .catch(() => false)
+        .finally(() => {
+          refreshing = null;
+        });
+    }
+    return refreshing;
+  }
+
   /**
    * Perform a GET request
    */
@@ -7,6 +7,7 @@ import {
   type UserCreate,
   type UserLogin,
 } from "@/services";
+import { queryClient } from "@/lib/query-client";
 
 export const useAuthStore = defineStore("auth", () => {
   // State
@@ -29,6 +30,11 @@ export const useAuthStore = defineStore("auth", () => {
 
   const setUser = (userData: UserRead | null) => {
     user.value = userData;
+
+    // Seed the settings query so it does not refetch right after auth
+    if (userData?.settings) {
+      queryClient.setQueryData(["userSettings", userData.id], userData.settings);
+    }
   };
 
   const initializeAuth = async () => {
@@ -2,6 +2,8 @@
  * Authentication related types
  */
 
+import type { UserSettings } from "../settings";
+
 /**
  * User creation data
  */
@@ -26,6 +28,8 @@ export interface UserRead {
   username: string;
   is_active: boolean;
   created_at: string;
+  /** Present when requested with include_settings=true */
+  settings?: UserSettings;
 }
 
 /**
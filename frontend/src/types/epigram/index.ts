@@ -35,6 +35,24 @@ export interface EpigramRead {
   updated_at: string;
 }
 
+/**
+ * Epigram with how often /random/batch has served it
+ */
+export interface EpigramImpressions extends EpigramRead {
+  impressions: number;
+}
+
+/**
+ * Page of the current user's epigram change feed
+ */
+export interface EpigramChanges {
+  changed: EpigramRead[];
+  deleted: number[];
+  cursor: string;
+  has_more: boolean;
+  reset: boolean;
+}
+
 /**
  * Epigram status enum
  */